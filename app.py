@@ -1,19 +1,33 @@
+import streamlit as st
 import os
 import re
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 import sys
 import hybrid_search
 
+# 재실행 시간 측정 시작 (Streamlit은 상호작용마다 이 스크립트 전체를 다시 실행합니다)
+rerun_started = time.perf_counter()
+
 # 환경 변수 로드
 load_dotenv()
 
-# 페이지 설정
+# 페이지 설정 (다른 어떤 Streamlit 명령보다 먼저 호출해야 합니다)
 st.set_page_config(
     page_title="S.I.Village: Brand Agent 검색 시스템",
     page_icon="🔍",
     layout="wide"
 )
 
+# 검색 엔진은 모든 세션이 공유합니다. (클라이언트, 인덱스 핸들, 연결 풀을 재사용)
+# 캐시 미스 때 표시되는 스피너도 페이지 요소이므로 끕니다.
+@st.cache_resource(show_spinner=False)
+def get_search_engine():
+    return hybrid_search.get_engine()
+
+hybrid_search.use_engine(get_search_engine())
+
 # CSS 스타일 추가
 st.markdown("""
 <style>
@@ -121,41 +135,49 @@ st.markdown("""
 이를 통해 고객에게 개인 맞춤형 추천 경험을 제공하며, AI 기반 쇼핑 경험을 한층 더 향상시킵니다.
 """)
 
-# 샘플 쿼리 파일에서 쿼리 로드
-def load_sample_queries():
+SAMPLE_QUERIES_PATH = 'sample_queries.md'
+
+# 세션별로 만들어 둔 결과 카드 내용을 보관할 최근 쿼리 수
+RENDER_CACHE_QUERIES = int(os.getenv("APP_RENDER_CACHE_QUERIES", "20"))
+
+# 샘플 쿼리 파일 파싱 (파일 수정 시각이 같으면 캐시된 결과를 재사용)
+@st.cache_data(show_spinner=False)
+def parse_sample_queries(path, mtime):
     queries_by_category = {}
     current_category = None
     current_subcategory = None
     
-    try:
-        with open('sample_queries.md', 'r', encoding='utf-8') as file:
-            lines = file.readlines()
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            
+            # 대분류 (##로 시작)
+            if line.startswith('## '):
+                current_category = line[3:]
+                queries_by_category[current_category] = {}
+                current_subcategory = None
+            
+            # 소분류 (###로 시작)
+            elif line.startswith('### '):
+                if current_category:
+                    current_subcategory = line[4:]
+                    queries_by_category[current_category][current_subcategory] = []
             
-            for line in lines:
-                line = line.strip()
-                
-                # 대분류 (##로 시작)
-                if line.startswith('## '):
-                    current_category = line[3:]
-                    queries_by_category[current_category] = {}
-                    current_subcategory = None
-                
-                # 소분류 (###로 시작)
-                elif line.startswith('### '):
-                    if current_category:
-                        current_subcategory = line[4:]
-                        queries_by_category[current_category][current_subcategory] = []
-                
-                # 쿼리 항목 (-로 시작)
-                elif line.startswith('- ') and current_category and current_subcategory:
-                    query = line[2:]
-                    queries_by_category[current_category][current_subcategory].append(query)
+            # 쿼리 항목 (-로 시작)
+            elif line.startswith('- ') and current_category and current_subcategory:
+                query = line[2:]
+                queries_by_category[current_category][current_subcategory].append(query)
     
+    return queries_by_category
+
+# 샘플 쿼리 파일에서 쿼리 로드
+def load_sample_queries():
+    try:
+        mtime = os.stat(SAMPLE_QUERIES_PATH).st_mtime_ns
+        return parse_sample_queries(SAMPLE_QUERIES_PATH, mtime)
     except FileNotFoundError:
         st.sidebar.warning("sample_queries.md 파일을 찾을 수 없습니다.")
         return {}
-    
-    return queries_by_category
 
 # 세션 상태 초기화
 if 'query' not in st.session_state:
@@ -166,7 +188,12 @@ if 'active_tab' not in st.session_state:
     st.session_state.active_tab = "검색"
 
 # 메인 화면에 검색 유형 카드 표시 (검색 탭이 활성화된 경우에만)
-if st.session_state.active_tab == "검색" and not ((st.session_state.run_search or 'search_button_clicked' in st.session_state) and st.session_state.query):
+showing_results = st.session_state.query and (
+    st.session_state.run_search
+    or 'search_button_clicked' in st.session_state
+    or st.session_state.get('results_query') == st.session_state.query
+)
+if st.session_state.active_tab == "검색" and not showing_results:
     # 검색 유형 설명 카드
     st.markdown("## 다양한 검색 유형")
     
@@ -306,6 +333,9 @@ st.markdown("</div>", unsafe_allow_html=True)
 
 # 사이드바 - 검색 예시
 with st.sidebar:
+    # 디버그 모드 (검색 단계별 실행 시간 표시)
+    show_trace = st.checkbox("🐞 디버그 모드 (검색 추적 표시)", key="show_trace")
+    
     st.header("💡 검색 예시")
     
     # 샘플 쿼리 로드
@@ -338,20 +368,138 @@ with st.sidebar:
         - 나이키와 유사한 운동화
         """)
 
-# 결과 표시
-if (search_button or st.session_state.run_search) and st.session_state.query:
-    # 현재 검색어 저장
-    current_query = st.session_state.query
-    
-    # 탭을 검색 결과로 변경
-    st.session_state.active_tab = "검색 결과"
-    
-    with st.spinner("검색 중..."):
-        search_results = hybrid_search(current_query)
+# 검색 결과 카드 내용 만들기 (화면 요소를 그리는 데 필요한 문자열만 준비)
+def build_card_markup(i, result, query_type):
+    metadata = result['metadata']
+    product_name = metadata.get('product_name', 'Unknown Product')
+    brand = metadata.get('brand', 'Unknown Brand')
+    price = metadata.get('price', 'N/A')
+    product_url = metadata.get('product_url', '')
+
+    card = {
+        'image_url': metadata.get('image_url', '') or "https://via.placeholder.com/200?text=No+Image",
+        'title': f"### {i+1}. {product_name}",
+        'brand': brand,
+        'brand_line': f"**브랜드:** {brand}",
+        'price_line': f"**가격:** {price}",
+        # 점수 정보
+        'scores': f"""
+        <div style="background-color: #f0f9ff; padding: 10px; border-radius: 5px; margin-top: 10px;">
+            <strong>관련성 점수:</strong> {result['score']:.4f}
+            <div style="display: flex; margin-top: 5px;">
+                <div style="flex: 1; padding-right: 10px;">
+                    <div style="font-size: 0.9rem;"><strong>벡터 유사도:</strong> {result['vector_score']:.4f}</div>
+                </div>
+                <div style="flex: 1;">
+                    <div style="font-size: 0.9rem;"><strong>키워드 매칭:</strong> {result['keyword_score']:.2f}</div>
+                </div>
+            </div>
+        </div>
+        """,
+        'query_brand': None,
+        # 제품 URL이 있는 경우 링크 제공
+        'product_link': f"[제품 상세 페이지 보기]({product_url})" if product_url else None
+    }
+
+    # 브랜드 중심 쿼리인 경우 쿼리 브랜드 표시
+    if query_type == 'brand_centric' and 'query_brand' in result:
+        card['query_brand'] = f"""
+            <div style="background-color: #fff7ed; padding: 10px; border-radius: 5px; margin-top: 10px;">
+                <strong>쿼리 브랜드:</strong> {result['query_brand']}
+            </div>
+            """
+    return card
+
+# 쿼리별 결과 카드 내용 (세션에 최근 쿼리만 보관하고, 결과가 바뀌었으면 다시 만듦)
+def get_card_markups(current_query, search_results):
+    if 'rendered_cards' not in st.session_state:
+        st.session_state.rendered_cards = OrderedDict()
+    rendered_cards = st.session_state.rendered_cards
+
+    result_ids = tuple(result['id'] for result in search_results['results'])
+    cached = rendered_cards.get(current_query)
+    if cached is not None and cached[0] == result_ids:
+        rendered_cards.move_to_end(current_query)
+        return cached[1]
+
+    cards = [
+        build_card_markup(i, result, search_results['query_type'])
+        for i, result in enumerate(search_results['results'])
+    ]
+    rendered_cards[current_query] = (result_ids, cards)
+    while len(rendered_cards) > RENDER_CACHE_QUERIES:
+        rendered_cards.popitem(last=False)
+    return cards
+
+# 검색 결과 카드 표시 (브랜드 정보 영역은 나중에 채울 수 있도록 빈 자리를 반환)
+def render_result_card(card, brand_info=None):
+    st.markdown(f"<div class='result-card'>", unsafe_allow_html=True)
+    col1, col2 = st.columns([1, 2])
+
+    # 제품 이미지
+    with col1:
+        st.image(card['image_url'], width=200)
+
+    # 제품 정보
+    with col2:
+        st.markdown(card['title'])
+        st.markdown(card['brand_line'])
+        st.markdown(card['price_line'])
+        st.markdown(card['scores'], unsafe_allow_html=True)
+        if card['query_brand']:
+            st.markdown(card['query_brand'], unsafe_allow_html=True)
+        if card['product_link']:
+            st.markdown(card['product_link'])
     
-    # 세션 상태 초기화 (run_search만 초기화하고 query는 유지)
-    st.session_state.run_search = False
+    # 브랜드 정보 확장 섹션 (스트리밍 중에는 브랜드 정보가 준비되면 채움)
+    brand_slot = st.empty()
+    if brand_info is not None:
+        render_brand_info(brand_slot, brand_info, card['brand'])
     
+    st.markdown("</div>", unsafe_allow_html=True)
+    return brand_slot
+
+# 브랜드 정보 확장 섹션 표시
+def render_brand_info(slot, brand_info, brand):
+    with slot.container():
+        with st.expander("브랜드 정보 더 보기"):
+            # 브랜드 기본 정보
+            brand_name_en = brand_info.get('brand_name_en', brand)
+            brand_name_ko = brand_info.get('brand_name_ko', 'N/A')
+            country = brand_info.get('country_of_origin', 'N/A')
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.markdown(f"**브랜드:** {brand_name_en} ({brand_name_ko})")
+                st.markdown(f"**원산지:** {country}")
+
+            with col2:
+                # 브랜드 카테고리
+                main_category = brand_info.get('main_category', 'N/A')
+                sub_category = brand_info.get('sub_category', 'N/A')
+
+                st.markdown(f"**카테고리:** {main_category} > {sub_category}")
+
+                # 가격대
+                price_range = brand_info.get('price_range', 'N/A')
+                if price_range != 'N/A':
+                    st.markdown(f"**가격대:** {price_range}")
+
+            # 브랜드 설명
+            description = brand_info.get('brand_description', 'N/A')
+            if description != 'N/A':
+                st.markdown("**설명:**")
+                st.markdown(f"<div style='background-color: #f8f9fa; padding: 10px; border-radius: 5px;'>{description}</div>", unsafe_allow_html=True)
+
+            # 타겟 고객층
+            target = brand_info.get('target_customers', 'N/A')
+            if target != 'N/A':
+                st.markdown("**타겟 고객층:**")
+                st.markdown(f"<div style='background-color: #f8f9fa; padding: 10px; border-radius: 5px;'>{target}</div>", unsafe_allow_html=True)
+
+# 검색 결과 머리글 (검색어, 검색 유형, 결과 개수) 표시
+def render_results_header(current_query, search_results):
     # 검색 쿼리 표시
     st.markdown(f"## 검색어: \"{current_query}\"")
     
@@ -374,100 +522,73 @@ if (search_button or st.session_state.run_search) and st.session_state.query:
     
     # 결과 개수
     st.markdown(f"### 검색 결과: {len(search_results['results'])}개")
+
+# 결과 표시
+current_query = st.session_state.query
+search_results = None
+searched = False
+if (search_button or st.session_state.run_search) and current_query:
+    # 탭을 검색 결과로 변경
+    st.session_state.active_tab = "검색 결과"
     
-    # 결과 표시
-    for i, result in enumerate(search_results['results']):
-        st.markdown(f"<div class='result-card'>", unsafe_allow_html=True)
-        col1, col2 = st.columns([1, 2])
-        
-        # 제품 이미지 (이미지 URL이 있는 경우)
-        with col1:
-            image_url = result['metadata'].get('image_url', '')
-            if image_url:
-                st.image(image_url, width=200)
-            else:
-                st.image("https://via.placeholder.com/200?text=No+Image", width=200)
-        
-        # 제품 정보
-        with col2:
-            product_name = result['metadata'].get('product_name', 'Unknown Product')
-            brand = result['metadata'].get('brand', 'Unknown Brand')
-            price = result['metadata'].get('price', 'N/A')
-            product_url = result['metadata'].get('product_url', '')
-            
-            st.markdown(f"### {i+1}. {product_name}")
-            st.markdown(f"**브랜드:** {brand}")
-            st.markdown(f"**가격:** {price}")
-            
-            # 점수 정보
-            st.markdown(f"""
-            <div style="background-color: #f0f9ff; padding: 10px; border-radius: 5px; margin-top: 10px;">
-                <strong>관련성 점수:</strong> {result['score']:.4f}
-                <div style="display: flex; margin-top: 5px;">
-                    <div style="flex: 1; padding-right: 10px;">
-                        <div style="font-size: 0.9rem;"><strong>벡터 유사도:</strong> {result['vector_score']:.4f}</div>
-                    </div>
-                    <div style="flex: 1;">
-                        <div style="font-size: 0.9rem;"><strong>키워드 매칭:</strong> {result['keyword_score']:.2f}</div>
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # 브랜드 중심 쿼리인 경우 쿼리 브랜드 표시
-            if search_results['query_type'] == 'brand_centric' and 'query_brand' in result:
-                st.markdown(f"""
-                <div style="background-color: #fff7ed; padding: 10px; border-radius: 5px; margin-top: 10px;">
-                    <strong>쿼리 브랜드:</strong> {result['query_brand']}
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # 제품 URL이 있는 경우 링크 제공
-            if product_url:
-                st.markdown(f"[제품 상세 페이지 보기]({product_url})")
-        
-        # 브랜드 정보 확장 섹션
-        if 'brand_info' in result:
-            with st.expander("브랜드 정보 더 보기"):
-                brand_info = result['brand_info']
-                
-                # 브랜드 기본 정보
-                brand_name_en = brand_info.get('brand_name_en', brand)
-                brand_name_ko = brand_info.get('brand_name_ko', 'N/A')
-                country = brand_info.get('country_of_origin', 'N/A')
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown(f"**브랜드:** {brand_name_en} ({brand_name_ko})")
-                    st.markdown(f"**원산지:** {country}")
-                
-                with col2:
-                    # 브랜드 카테고리
-                    main_category = brand_info.get('main_category', 'N/A')
-                    sub_category = brand_info.get('sub_category', 'N/A')
-                    
-                    st.markdown(f"**카테고리:** {main_category} > {sub_category}")
-                    
-                    # 가격대
-                    price_range = brand_info.get('price_range', 'N/A')
-                    if price_range != 'N/A':
-                        st.markdown(f"**가격대:** {price_range}")
-                
-                # 브랜드 설명
-                description = brand_info.get('brand_description', 'N/A')
-                if description != 'N/A':
-                    st.markdown("**설명:**")
-                    st.markdown(f"<div style='background-color: #f8f9fa; padding: 10px; border-radius: 5px;'>{description}</div>", unsafe_allow_html=True)
-                
-                # 타겟 고객층
-                target = brand_info.get('target_customers', 'N/A')
-                if target != 'N/A':
-                    st.markdown("**타겟 고객층:**")
-                    st.markdown(f"<div style='background-color: #f8f9fa; padding: 10px; border-radius: 5px;'>{target}</div>", unsafe_allow_html=True)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+    # 스트리밍 검색: 순위가 정해지는 즉시 결과 카드를 표시하고, 브랜드 정보는 준비되는 대로 채움
+    status = st.empty()
+    status.info("검색 중...")
+    brand_slots = []
+    for event in hybrid_search.hybrid_search_stream(current_query):
+        if event['type'] == 'results':
+            status.info("브랜드 정보를 불러오는 중...")
+            search_results = event['search_results']
+            render_results_header(current_query, search_results)
+            brand_slots = [
+                render_result_card(card, result.get('brand_info'))
+                for card, result in zip(get_card_markups(current_query, search_results), search_results['results'])
+            ]
+        elif event['type'] == 'brand_info':
+            position = event['position']
+            brand = search_results['results'][position]['metadata'].get('brand', 'Unknown Brand')
+            render_brand_info(brand_slots[position], event['brand_info'], brand)
+        elif event['type'] == 'done':
+            search_results = event['search_results']
+    status.empty()
+    
+    # 세션 상태 초기화 (run_search만 초기화하고 query는 유지)
+    st.session_state.run_search = False
+    
+    # 결과를 세션에 저장해, 이후 재실행(브랜드 정보 펼치기, 디버그 모드 전환 등)에서는 다시 검색하지 않음
+    st.session_state.search_results = search_results
+    st.session_state.results_query = current_query
+    searched = True
+elif current_query and st.session_state.get('results_query') == current_query:
+    # 같은 쿼리의 재실행: 세션에 저장된 결과와 카드 내용으로 바로 다시 그림
+    search_results = st.session_state.search_results
+    render_results_header(current_query, search_results)
+    for card, result in zip(get_card_markups(current_query, search_results), search_results['results']):
+        render_result_card(card, result.get('brand_info'))
+
+# 디버그 패널 (검색 추적 정보)
+if show_trace and search_results and 'trace' in search_results:
+    trace = search_results['trace']
+    with st.expander(f"🐞 검색 추적 정보 (총 {trace['total_ms']:.1f}ms, 전송 {trace.get('payload_bytes', 0):,}바이트)", expanded=True):
+        st.markdown("**단계별 요약**")
+        st.table([
+            {'단계': name, '호출 수': stage['calls'], '누적 시간(ms)': stage['total_ms'], '전송 크기(바이트)': stage.get('payload_bytes', '')}
+            for name, stage in sorted(trace['summary'].items(), key=lambda item: -item[1]['total_ms'])
+        ])
+        st.markdown("**구간 트리**")
+        st.json(trace['spans'], expanded=False)
 
 # 푸터
 st.markdown("---")
-st.markdown("© 2025 Super Shopping Agent") 
\ No newline at end of file
+st.markdown("© 2025 Super Shopping Agent")
+
+# 디버그 푸터 (이번 재실행에 걸린 시간과 검색 실행 여부)
+if show_trace:
+    rerun_ms = (time.perf_counter() - rerun_started) * 1000
+    if searched:
+        search_state = "검색 실행"
+    elif search_results is not None:
+        search_state = "세션 결과 재사용"
+    else:
+        search_state = "검색 없음"
+    st.caption(f"🐞 재실행 시간: {rerun_ms:.1f}ms ({search_state})")
@@ -0,0 +1,594 @@
+"""외부 서비스 없이 hybrid_search 성능을 측정하는 오프라인 벤치마크입니다.
+
+임베딩/LLM/인덱스를 지연 시간과 실패율을 조절할 수 있는 가짜 백엔드로 교체하고,
+README.md의 샘플 쿼리를 실행해 지연 시간 분포와 외부 호출 수를 JSON으로 기록합니다.
+
+사용 예:
+    python benchmark.py --repeat 3 --concurrency 4 --output bench.json
+    python benchmark.py --repeat 10 --batch-size 64 --concurrency 8   # 일괄 검색
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import asyncio
+import threading
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from vector_store import LocalVectorIndex
+from keyword_index import tokenize
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from result_cache import ResultCache
+from semantic_cache import SemanticCache
+from brand_graph import BrandGraphStore
+
+# 가짜 카탈로그에 사용할 브랜드 (영문명, 한글명, 원산지, 대분류, 소분류, 가격대)
+SAMPLE_BRANDS = [
+    ("Balenciaga", "발렌시아가", "프랑스", "패션", "럭셔리", "고가"),
+    ("Gucci", "구찌", "이탈리아", "패션", "럭셔리", "고가"),
+    ("Chanel", "샤넬", "프랑스", "패션", "럭셔리", "고가"),
+    ("Prada", "프라다", "이탈리아", "패션", "럭셔리", "고가"),
+    ("Hermes", "에르메스", "프랑스", "패션", "럭셔리", "고가"),
+    ("Nike", "나이키", "미국", "스포츠", "스포츠웨어", "중가"),
+    ("Adidas", "아디다스", "독일", "스포츠", "스포츠웨어", "중가"),
+    ("Under Armour", "언더아머", "미국", "스포츠", "기능성 의류", "중가"),
+    ("New Balance", "뉴발란스", "미국", "스포츠", "러닝화", "중가"),
+    ("The North Face", "노스페이스", "미국", "아웃도어", "아웃도어", "중가"),
+    ("Zara", "자라", "스페인", "패션", "SPA", "저가"),
+    ("COS", "코스", "스웨덴", "패션", "컨템포러리", "중가"),
+    ("Maison Margiela", "메종 마르지엘라", "프랑스", "패션", "컨템포러리", "고가"),
+    ("Acne Studios", "아크네 스튜디오", "스웨덴", "패션", "컨템포러리", "고가"),
+    ("A.P.C.", "아페쎄", "프랑스", "패션", "컨템포러리", "중가"),
+]
+
+# 가짜 상품 이름을 만들 때 사용할 속성과 상품 유형
+PRODUCT_ATTRIBUTES = ["여성용", "남성", "가벼운", "방수", "클래식한", "미니멀", "빈티지", "캐주얼", "고급", "여름"]
+PRODUCT_TYPES = ["가죽 가방", "운동화", "셔츠", "손목시계", "지갑", "스카프", "코트", "샌들", "선글라스", "청바지", "러닝화", "패딩 자켓"]
+
+
+class LatencyModel:
+    """로그정규분포 지연 시간과 실패율을 주입합니다."""
+
+    def __init__(self, median_ms=0.0, p95_ms=None, failure_rate=0.0, seed=None):
+        self.median_ms = median_ms
+        self.p95_ms = p95_ms if p95_ms is not None else median_ms
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec, failure_rate=0.0, seed=None):
+        """'중앙값,p95' 형식(ms)의 문자열로 만듭니다. 예: '80,250'"""
+        values = [float(value) for value in str(spec).split(',') if value.strip()]
+        median_ms = values[0] if values else 0.0
+        p95_ms = values[1] if len(values) > 1 else median_ms
+        return cls(median_ms, p95_ms, failure_rate, seed)
+
+    def sample(self):
+        """(지연 시간(초), 실패 여부)를 뽑습니다."""
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            if self.median_ms <= 0:
+                return 0.0, failed
+            mu = math.log(self.median_ms)
+            sigma = max(math.log(max(self.p95_ms, self.median_ms)) - mu, 0.0) / 1.645
+            return self._random.lognormvariate(mu, sigma) / 1000, failed
+
+    def wait(self, name):
+        """지연 시간만큼 기다리고, 실패가 뽑히면 예외를 발생시킵니다."""
+        delay, failed = self.sample()
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise ConnectionError(f"{name}: 주입된 실패")
+
+    async def wait_async(self, name):
+        """`wait`의 비동기 버전입니다."""
+        delay, failed = self.sample()
+        if delay:
+            await asyncio.sleep(delay)
+        if failed:
+            raise ConnectionError(f"{name}: 주입된 실패")
+
+
+class CallCounter:
+    """외부 호출 수를 이름별로 셉니다.
+
+    `scope()` 안에서 (공유 스레드 풀로 넘어간 작업 포함) 발생한 호출은 전체 수와 함께 범위별 딕셔너리에도 더해져,
+    쿼리 하나가 실제로 보낸 외부 호출 수를 같은 기준으로 셀 수 있습니다.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._scope = contextvars.ContextVar("benchmark_call_scope", default=None)
+
+    def add(self, name, value=1):
+        scope = self._scope.get()
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+            if scope is not None:
+                scope[name] = scope.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def scope(self):
+        """블록 안에서 발생한 호출 수를 담을 딕셔너리를 반환합니다."""
+        counts = {}
+        token = self._scope.set(counts)
+        try:
+            yield counts
+        finally:
+            self._scope.reset(token)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class FakeEmbeddings:
+    """토큰별 해시 벡터의 합으로 결정적인 임베딩을 만드는 가짜 임베딩 모델입니다."""
+
+    def __init__(self, dimension=256, latency=None, counter=None):
+        self.model = "fake-embedding"
+        self.dimension = dimension
+        self.latency = latency or LatencyModel()
+        self.counter = counter or CallCounter()
+        self._token_vectors = {}
+
+    def _token_vector(self, token):
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            seed = int(hashlib.md5(token.encode('utf-8')).hexdigest()[:8], 16)
+            vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            self._token_vectors[token] = vector
+        return vector
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in tokenize(text):
+            vector += self._token_vector(token)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_query(self, text):
+        self.counter.add('embedding.requests')
+        self.latency.wait('embedding')
+        return self._embed(text)
+
+    async def aembed_query(self, text):
+        self.counter.add('embedding.requests')
+        await self.latency.wait_async('embedding')
+        return self._embed(text)
+
+    def embed_documents(self, texts):
+        self.counter.add('embedding.requests')
+        self.counter.add('embedding.documents', len(texts))
+        self.latency.wait('embedding')
+        return [self._embed(text) for text in texts]
+
+
+class FakeMessage:
+    """LLM 응답 메시지 형태의 객체입니다."""
+
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    """메시지에서 알려진 브랜드 이름을 찾아 돌려주는 가짜 LLM입니다."""
+
+    def __init__(self, brand_names=(), latency=None, counter=None):
+        self.model_name = "fake-llm"
+        self.brand_names = sorted(brand_names, key=len, reverse=True)
+        self.latency = latency or LatencyModel()
+        self.counter = counter or CallCounter()
+
+    def _answer(self, messages):
+        text = " ".join(
+            str(message[1] if isinstance(message, tuple) else getattr(message, 'content', message))
+            for message in messages
+        )
+        query = text.split("쿼리:")[-1].lower()
+        for name in self.brand_names:
+            if name.lower() in query:
+                return FakeMessage(name)
+        return FakeMessage("")
+
+    def invoke(self, messages, **kwargs):
+        self.counter.add('llm.requests')
+        self.latency.wait('llm')
+        return self._answer(messages)
+
+    async def ainvoke(self, messages, **kwargs):
+        self.counter.add('llm.requests')
+        await self.latency.wait_async('llm')
+        return self._answer(messages)
+
+
+class FakeIndex:
+    """로컬 인덱스에 지연 시간과 호출 수 기록을 더한 가짜 Pinecone 인덱스입니다."""
+
+    def __init__(self, name, local_index, latency=None, counter=None):
+        self.name = name
+        self.local_index = local_index
+        self.latency = latency or LatencyModel()
+        self.counter = counter or CallCounter()
+
+    def query(self, **kwargs):
+        self.counter.add(f'{self.name}.query')
+        self.latency.wait(f'{self.name}.query')
+        return self.local_index.query(**kwargs)
+
+    def fetch(self, ids, **kwargs):
+        self.counter.add(f'{self.name}.fetch')
+        self.latency.wait(f'{self.name}.fetch')
+        return self.local_index.fetch(ids, **kwargs)
+
+    def upsert(self, vectors, **kwargs):
+        self.counter.add(f'{self.name}.upsert')
+        self.latency.wait(f'{self.name}.upsert')
+        return self.local_index.upsert(vectors, **kwargs)
+
+    def delete(self, **kwargs):
+        self.counter.add(f'{self.name}.delete')
+        return self.local_index.delete(**kwargs)
+
+    def records(self):
+        return self.local_index.records()
+
+    @property
+    def version(self):
+        return self.local_index.version
+
+    def describe_index_stats(self, **kwargs):
+        return self.local_index.describe_index_stats()
+
+
+def build_sample_catalog(embedding_model, products_per_brand=40, seed=0):
+    """가짜 브랜드/상품 카탈로그로 로컬 인덱스를 만듭니다."""
+    rng = random.Random(seed)
+    brands_index = LocalVectorIndex("sample-brands")
+    products_index = LocalVectorIndex("sample-products")
+
+    brand_records = []
+    for i, (name_en, name_ko, country, main_category, sub_category, price_range) in enumerate(SAMPLE_BRANDS):
+        competing = [brand[0] for brand in SAMPLE_BRANDS if brand[4] == sub_category and brand[0] != name_en]
+        brand_records.append((f"brand-{i}", {
+            'brand_name_en': name_en,
+            'brand_name_ko': name_ko,
+            'country_of_origin': country,
+            'main_category': main_category,
+            'sub_category': sub_category,
+            'price_range': price_range,
+            'competing_brands': ", ".join(competing[:3]) or 'Unknown',
+            'brand_description': f"{country}의 {sub_category} 브랜드",
+            'target_customers': "20-40대"
+        }))
+
+    brand_texts = [f"{meta['brand_name_en']} {meta['brand_name_ko']} {meta['main_category']} {meta['sub_category']} {meta['price_range']}" for _, meta in brand_records]
+    brands_index.upsert([
+        (brand_id, vector, metadata)
+        for (brand_id, metadata), vector in zip(brand_records, embedding_model.embed_documents(brand_texts))
+    ])
+
+    product_records = []
+    for brand_id, brand in brand_records:
+        for j in range(products_per_brand):
+            product_name = f"{rng.choice(PRODUCT_ATTRIBUTES)} {rng.choice(PRODUCT_TYPES)}"
+            product_records.append((f"{brand_id}-product-{j}", {
+                'product_name': product_name,
+                'brand': brand['brand_name_en'],
+                'description': f"{brand['country_of_origin']} {brand['sub_category']} {product_name}",
+                'price': rng.randrange(3, 300) * 10000,
+                'search_weight': 1.0
+            }))
+
+    product_texts = [f"{meta['brand']} {meta['product_name']} {meta['description']}" for _, meta in product_records]
+    products_index.upsert([
+        (product_id, vector, metadata)
+        for (product_id, metadata), vector in zip(product_records, embedding_model.embed_documents(product_texts))
+    ])
+
+    return products_index, brands_index
+
+
+def load_readme_queries(path="README.md"):
+    """README.md의 샘플 쿼리를 (카테고리, 쿼리) 목록으로 읽습니다.
+
+    첫 번째 최상위 제목(`# `) 아래의 샘플 쿼리만 읽고, 다음 최상위 제목(실행 방법과 설정)부터는 읽지 않습니다.
+    """
+    queries = []
+    category = None
+    titles = 0
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith('# '):
+                titles += 1
+                if titles > 1:
+                    break
+            elif line.startswith('## '):
+                category = line[3:]
+            elif line.startswith('- ') and category:
+                queries.append((category, line[2:]))
+    return queries
+
+
+def percentiles(values):
+    """지연 시간 목록의 p50/p95/p99/평균/최대값(ms)을 계산합니다."""
+    if not values:
+        return {'count': 0}
+    array = np.asarray(values, dtype=np.float64)
+    return {
+        'count': len(values),
+        'mean_ms': round(float(array.mean()), 3),
+        'p50_ms': round(float(np.percentile(array, 50)), 3),
+        'p95_ms': round(float(np.percentile(array, 95)), 3),
+        'p99_ms': round(float(np.percentile(array, 99)), 3),
+        'max_ms': round(float(array.max()), 3)
+    }
+
+
+def is_failed_run(run):
+    """쿼리 하나의 실행이 실패했는지 판단합니다. (예외, 대체 결과, 빈 결과)"""
+    return bool(run['error']) or run['degraded'] or not run['results']
+
+
+def install_fake_backends(embedding_latency="0", index_latency="0", llm_latency="0", failure_rate=0.0,
+                          seed=0, dimension=256, products_per_brand=40, embedding_cache_size=10000):
+    """hybrid_search의 임베딩/LLM/인덱스를 가짜 백엔드로 교체하고 외부 호출 카운터를 반환합니다.
+
+    지연 시간은 '중앙값,p95' 형식(ms)의 문자열입니다.
+    """
+    import hybrid_search
+
+    counter = CallCounter()
+    embedding_latency = LatencyModel.parse(embedding_latency, failure_rate, seed)
+    index_latency = LatencyModel.parse(index_latency, failure_rate, seed + 1)
+    llm_latency = LatencyModel.parse(llm_latency, failure_rate, seed + 2)
+
+    # 카탈로그는 지연 없이 만든 뒤, 검색에 사용할 모델에만 지연을 주입합니다.
+    catalog_model = FakeEmbeddings(dimension=dimension)
+    products_index, brands_index = build_sample_catalog(catalog_model, products_per_brand, seed)
+
+    fake_embeddings = FakeEmbeddings(dimension=dimension, latency=embedding_latency, counter=counter)
+    fake_llm = FakeLLM([name for brand in SAMPLE_BRANDS for name in brand[:2]], latency=llm_latency, counter=counter)
+    indexes = {
+        hybrid_search.PRODUCTS_INDEX_NAME: FakeIndex('products', products_index, index_latency, counter),
+        hybrid_search.BRANDS_INDEX_NAME: FakeIndex('brands', brands_index, index_latency, counter)
+    }
+
+    hybrid_search.set_backends(
+        embedding_model=CachedEmbeddings(fake_embeddings, EmbeddingCache(None, max_entries=embedding_cache_size)),
+        chat_model=fake_llm,
+        index_factory=lambda name: indexes[name]
+    )
+    # 가짜 카탈로그의 브랜드 그래프는 디스크에 저장하지 않고 메모리에서만 만듭니다.
+    hybrid_search.brand_graph_store = BrandGraphStore(None, knn_size=hybrid_search.BRAND_GRAPH_KNN)
+    return counter
+
+
+def run_benchmark(args):
+    """가짜 백엔드를 설정하고 샘플 쿼리를 실행해 결과 딕셔너리를 반환합니다."""
+    import hybrid_search
+
+    counter = install_fake_backends(
+        embedding_latency=args.embedding_latency,
+        index_latency=args.index_latency,
+        llm_latency=args.llm_latency,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+        dimension=args.dimension,
+        products_per_brand=args.products_per_brand,
+        embedding_cache_size=args.embedding_cache_size
+    )
+
+    # 결과 캐시와 의미 캐시는 기본적으로 끄고 검색 파이프라인 자체를 측정합니다.
+    hybrid_search.result_cache = ResultCache(max_entries=args.result_cache_size, ttl_seconds=0)
+    hybrid_search.semantic_cache = SemanticCache(
+        max_entries=args.semantic_cache_size,
+        threshold=args.semantic_cache_threshold,
+        ttl_seconds=0
+    )
+
+    queries = load_readme_queries(args.queries) * args.repeat
+
+    hybrid_search.BRAND_GRAPH_AUTO_BUILD = not args.no_brand_graph
+    hybrid_search.RETRIEVAL_MODE = args.retrieval_mode
+    hybrid_search.TWO_STAGE_METADATA_SOURCE = args.metadata_source
+
+    # 키워드 색인, 브랜드 디렉터리, 브랜드 그래프를 미리 만들어 첫 쿼리 측정에 포함되지 않게 합니다.
+    hybrid_search.get_keyword_index()
+    hybrid_search.get_brand_directory()
+    if not args.no_brand_graph:
+        try:
+            hybrid_search.rebuild_brand_graph()
+        except Exception as e:
+            print(f"브랜드 그래프를 만들지 못했습니다: {str(e)}", file=sys.stderr)
+    warm_up_counts = counter.snapshot()
+    hybrid_search.reset_retrieval_stats()
+    hybrid_search.reset_resilience_stats()
+    hybrid_search.metrics.reset()
+
+    def run_one(item):
+        category, query = item
+        started = time.perf_counter()
+        with counter.scope() as calls:
+            try:
+                result = hybrid_search.hybrid_search(query, top_k=args.top_k)
+                error = None
+            except Exception as e:
+                result = {'query_type': 'error', 'results': []}
+                error = str(e)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        summary = result.get('trace', {}).get('summary', {})
+        return {
+            'category': category,
+            'query': query,
+            'query_type': result['query_type'],
+            'latency_ms': elapsed_ms,
+            'results': len(result['results']),
+            'degraded': any(hit.get('degraded') for hit in result['results']),
+            'stage_calls': {name: stage['calls'] for name, stage in summary.items()},
+            'external_calls': calls,
+            'payload_bytes': result.get('trace', {}).get('payload_bytes', 0),
+            'error': error
+        }
+
+    def run_batch():
+        # 일괄 검색에서는 배치 시작부터 각 결과가 나올 때까지의 시간을 지연 시간으로 기록합니다.
+        # 임베딩 요청을 여러 쿼리가 나눠 쓰므로 쿼리별 외부 호출 수는 기록하지 않습니다.
+        runs = [None] * len(queries)
+        batch_started = time.perf_counter()
+        for position, result in hybrid_search.hybrid_search_batch(
+            [query for _, query in queries],
+            top_k=args.top_k,
+            embed_batch_size=args.batch_size,
+            max_in_flight=max(args.concurrency, 1)
+        ):
+            category, query = queries[position]
+            summary = result.get('trace', {}).get('summary', {})
+            runs[position] = {
+                'category': category,
+                'query': query,
+                'query_type': result['query_type'],
+                'latency_ms': (time.perf_counter() - batch_started) * 1000,
+                'results': len(result['results']),
+                'degraded': any(hit.get('degraded') for hit in result['results']),
+                'stage_calls': {name: stage['calls'] for name, stage in summary.items()},
+                'external_calls': None,
+                'payload_bytes': result.get('trace', {}).get('payload_bytes', 0),
+                'error': None
+            }
+        return runs
+
+    output = sys.stdout if args.verbose else io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        if args.batch_size > 0:
+            runs = run_batch()
+        elif args.concurrency > 1:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                runs = list(executor.map(run_one, queries))
+        else:
+            runs = [run_one(item) for item in queries]
+    wall_seconds = time.perf_counter() - started
+
+    counts = counter.snapshot()
+    external_calls = {name: counts.get(name, 0) - warm_up_counts.get(name, 0) for name in counts}
+
+    by_query_type = {}
+    failed_runs = [run for run in runs if is_failed_run(run)]
+    for query_type in sorted({run['query_type'] for run in runs}):
+        type_runs = [run for run in runs if run['query_type'] == query_type]
+        stages = sorted({stage for run in type_runs for stage in run['stage_calls']})
+        by_query_type[query_type] = {
+            'latency': percentiles([run['latency_ms'] for run in type_runs]),
+            'failures': sum(1 for run in type_runs if is_failed_run(run)),
+            'avg_payload_bytes': round(sum(run['payload_bytes'] for run in type_runs) / len(type_runs), 1),
+            # 트레이스 스팬 수 (캐시 적중도 포함)
+            'avg_stage_calls': {
+                stage: round(sum(run['stage_calls'].get(stage, 0) for run in type_runs) / len(type_runs), 3)
+                for stage in stages
+            }
+        }
+        if args.batch_size <= 0:
+            # 전체 외부 호출 수와 같은 카운터로 센 실제 외부 호출 수
+            type_calls = {}
+            for run in type_runs:
+                for name, count in run['external_calls'].items():
+                    type_calls[name] = type_calls.get(name, 0) + count
+            by_query_type[query_type]['external_calls'] = dict(sorted(type_calls.items()))
+            by_query_type[query_type]['external_calls_per_query'] = {
+                name: round(count / len(type_runs), 3) for name, count in sorted(type_calls.items())
+            }
+
+    if args.metrics_file:
+        hybrid_search.metrics.write_textfile(args.metrics_file)
+
+    return {
+        'config': vars(args),
+        'overall': {
+            'queries': len(runs),
+            'wall_seconds': round(wall_seconds, 3),
+            'throughput_qps': round(len(runs) / wall_seconds, 3) if wall_seconds else None,
+            'latency': percentiles([run['latency_ms'] for run in runs]),
+            'errors': sum(1 for run in runs if run['error']),
+            'degraded': sum(1 for run in runs if run['degraded']),
+            'empty_results': sum(1 for run in runs if not run['results']),
+            # 예외, 대체 결과, 빈 결과를 모두 실패로 셉니다.
+            'failures': len(failed_runs),
+            'failure_rate': round(len(failed_runs) / len(runs), 4) if runs else None,
+            'avg_payload_bytes': round(sum(run['payload_bytes'] for run in runs) / len(runs), 1) if runs else None
+        },
+        'by_query_type': by_query_type,
+        'external_calls': external_calls,
+        'external_calls_per_query': {
+            name: round(count / len(runs), 3) for name, count in external_calls.items()
+        } if runs else {},
+        'embedding_cache': hybrid_search.get_embeddings().cache.get_stats(),
+        'result_cache': dict(hybrid_search.result_cache.get_stats(), **hybrid_search.result_cache.memory_usage()),
+        'result_records': {
+            'products': hybrid_search.product_records.get_stats(),
+            'brands': hybrid_search.brand_records.get_stats()
+        },
+        'semantic_cache': hybrid_search.semantic_cache.get_stats(),
+        'retrieval': hybrid_search.get_retrieval_stats(),
+        'brand_graph': hybrid_search.brand_graph_store.get_stats(),
+        'resilience': hybrid_search.get_resilience_stats(),
+        'runs': [dict(run, latency_ms=round(run['latency_ms'], 3)) for run in runs] if args.include_runs else []
+    }
+
+
+def main():
+    """명령행 인자를 읽어 벤치마크를 실행합니다."""
+    parser = argparse.ArgumentParser(description="hybrid_search 오프라인 벤치마크")
+    parser.add_argument("--queries", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "README.md"), help="샘플 쿼리 마크다운 파일")
+    parser.add_argument("--repeat", type=int, default=1, help="쿼리 세트 반복 횟수")
+    parser.add_argument("--concurrency", type=int, default=1, help="동시에 실행할 쿼리 수")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=0, help="0보다 크면 hybrid_search_batch로 실행 (embed_documents 묶음 크기)")
+    parser.add_argument("--products-per-brand", type=int, default=40)
+    parser.add_argument("--dimension", type=int, default=256, help="가짜 임베딩 차원")
+    parser.add_argument("--embedding-latency", default="80,250", help="임베딩 지연 시간 '중앙값,p95' (ms)")
+    parser.add_argument("--index-latency", default="40,120", help="인덱스 지연 시간 '중앙값,p95' (ms)")
+    parser.add_argument("--llm-latency", default="800,2000", help="LLM 지연 시간 '중앙값,p95' (ms)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="외부 호출 실패 확률")
+    parser.add_argument("--embedding-cache-size", type=int, default=10000)
+    parser.add_argument("--result-cache-size", type=int, default=0, help="결과 캐시 크기 (0이면 사용하지 않음)")
+    parser.add_argument("--semantic-cache-size", type=int, default=0, help="의미 캐시 크기 (0이면 사용하지 않음)")
+    parser.add_argument("--semantic-cache-threshold", type=float, default=0.98, help="의미 캐시 코사인 유사도 임계값")
+    parser.add_argument("--retrieval-mode", choices=["full", "two_stage"], default="full", help="후보 검색 방식")
+    parser.add_argument("--metadata-source", choices=["local", "fetch"], default="local", help="2단계 검색에서 상위 결과 메타데이터를 가져올 곳")
+    parser.add_argument("--no-brand-graph", action="store_true", help="브랜드 그래프 없이 유사 브랜드를 매번 벡터 검색으로 찾음")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--include-runs", action="store_true", help="쿼리별 측정값도 출력에 포함")
+    parser.add_argument("--output", default="-", help="결과 JSON 파일 경로 ('-'는 표준 출력)")
+    parser.add_argument("--metrics-file", default="", help="실행 후 Prometheus 텍스트 형식 지표를 쓸 파일")
+    parser.add_argument("--verbose", action="store_true", help="검색 중 출력되는 로그 표시")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+        overall = report['overall']
+        print(f"{overall['queries']}개 쿼리, p50 {overall['latency']['p50_ms']}ms, "
+              f"p95 {overall['latency']['p95_ms']}ms, {overall['throughput_qps']} qps, 실패 {overall['failures']}개 -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
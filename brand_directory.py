@@ -0,0 +1,141 @@
+import re
+import time
+import threading
+import unicodedata
+
+NAME_FIELDS = ('brand_name_en', 'brand_name_ko')
+ALIAS_FIELD = 'aliases'
+
+NON_NAME_PATTERN = re.compile(r"[^0-9a-z가-힣]+")
+
+
+def normalize_brand_name(name):
+    """브랜드 이름을 비교용 키로 정규화합니다. (소문자, 공백/기호 제거)"""
+    name = unicodedata.normalize("NFKC", str(name)).lower()
+    return NON_NAME_PATTERN.sub("", name)
+
+
+def brand_names(metadata):
+    """브랜드 메타데이터에서 (이름, 대표 이름 여부) 목록을 추출합니다."""
+    names = []
+    for field in NAME_FIELDS:
+        value = metadata.get(field)
+        if value and value != 'Unknown':
+            names.append((value, True))
+
+    aliases = metadata.get(ALIAS_FIELD) or []
+    if isinstance(aliases, str):
+        aliases = aliases.split(',')
+    for alias in aliases:
+        alias = alias.strip()
+        if alias:
+            names.append((alias, False))
+    return names
+
+
+class BrandDirectory:
+    """브랜드 이름으로 브랜드 메타데이터를 바로 찾는 디렉터리입니다.
+
+    조회는 잠금 없이 딕셔너리 한 번으로 끝나며, 갱신 시에는 복사본을 수정한 뒤
+    참조를 교체하므로 여러 세션이 동시에 읽어도 안전합니다.
+    반환되는 메타데이터는 공유 객체이므로 수정하지 않아야 합니다.
+    """
+
+    def __init__(self, records=()):
+        self._entries = {}
+        self._lookup = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self.updated_at = None
+        if records:
+            self.refresh(records)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return normalize_brand_name(name) in self._lookup
+
+    def lookup(self, name):
+        """브랜드 이름(영문/한글/별칭)으로 메타데이터를 찾습니다. 없으면 None을 반환합니다."""
+        brand_id = self._lookup.get(normalize_brand_name(name))
+        if brand_id is None:
+            return None
+        return self._entries.get(brand_id)
+
+    def items(self):
+        """(브랜드 ID, 메타데이터) 목록을 반환합니다."""
+        return list(self._entries.items())
+
+    def names(self):
+        """정규화된 이름 -> 브랜드 ID 딕셔너리를 반환합니다."""
+        return self._lookup
+
+    def refresh(self, records, deleted_ids=()):
+        """변경된 브랜드만 반영합니다.
+
+        `records`는 새로 추가되거나 바뀐 (브랜드 ID, 메타데이터) 쌍이고,
+        `deleted_ids`는 삭제된 브랜드 ID입니다.
+        """
+        with self._lock:
+            entries = dict(self._entries)
+            lookup = dict(self._lookup)
+            records = list(records)
+
+            # 바뀌거나 삭제된 브랜드의 기존 이름을 먼저 제거합니다.
+            stale_ids = set(deleted_ids) | {brand_id for brand_id, _ in records}
+            for brand_id in stale_ids:
+                old = entries.pop(brand_id, None)
+                if old is None:
+                    continue
+                for name, _ in brand_names(old):
+                    key = normalize_brand_name(name)
+                    if lookup.get(key) == brand_id:
+                        del lookup[key]
+
+            for brand_id, metadata in records:
+                metadata = metadata or {}
+                entries[brand_id] = metadata
+                for name, is_primary in brand_names(metadata):
+                    key = normalize_brand_name(name)
+                    if not key:
+                        continue
+                    # 대표 이름이 별칭보다 우선합니다.
+                    if is_primary or key not in lookup:
+                        lookup[key] = brand_id
+
+            self._entries = entries
+            self._lookup = lookup
+            self.version += 1
+            self.updated_at = time.time()
+
+    def sync(self, records):
+        """전체 브랜드 목록과 비교해 추가/변경/삭제된 항목만 반영합니다."""
+        records = list(records)
+        current = self._entries
+        changed = [(brand_id, metadata) for brand_id, metadata in records if current.get(brand_id) != metadata]
+        seen = {brand_id for brand_id, _ in records}
+        deleted = [brand_id for brand_id in current if brand_id not in seen]
+        if changed or deleted:
+            self.refresh(changed, deleted)
+        else:
+            self.updated_at = time.time()
+        return len(changed), len(deleted)
+
+
+def load_brand_records(index, batch_size=100):
+    """브랜드 인덱스에서 (ID, 메타데이터) 목록을 가져옵니다.
+
+    로컬 인덱스는 `records()`를 사용하고, Pinecone 인덱스는 `list()`와 `fetch()`로 가져옵니다.
+    """
+    if hasattr(index, 'records'):
+        return index.records()
+
+    records = []
+    for id_batch in index.list():
+        for start in range(0, len(id_batch), batch_size):
+            response = index.fetch(ids=id_batch[start:start + batch_size])
+            records.extend(
+                (brand_id, vector.metadata or {}) for brand_id, vector in response.vectors.items()
+            )
+    return records
@@ -0,0 +1,502 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+import numpy as np
+
+from brand_directory import brand_names, normalize_brand_name
+
+GRAPH_FILE = "graph.json"
+INDPTR_FILE = "indptr.npy"
+INDICES_FILE = "indices.npy"
+SCORES_FILE = "scores.npy"
+KINDS_FILE = "kinds.npy"
+TEXT_VECTORS_FILE = "text_vectors.npy"
+
+# 간선 종류 (competing_brands 메타데이터 / 카테고리 최근접 이웃)
+EDGE_COMPETING = 0
+EDGE_KNN = 1
+
+CATEGORY_FIELDS = ('main_category', 'sub_category', 'price_range')
+
+
+def category_text(metadata):
+    """유사 브랜드 검색에 사용하는 "대분류 소분류 가격대" 텍스트를 만듭니다. 필드가 없으면 None입니다."""
+    if not all(field in metadata for field in CATEGORY_FIELDS):
+        return None
+    return " ".join(str(metadata[field]) for field in CATEGORY_FIELDS)
+
+
+def competing_brand_names(metadata):
+    """`competing_brands` 메타데이터를 브랜드 이름 목록으로 나눕니다."""
+    value = metadata.get('competing_brands')
+    if not value or value == 'Unknown':
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip() for name in value if name and name.strip()]
+
+
+def record_hash(metadata):
+    """브랜드 메타데이터의 해시입니다. (증분 재구성 시 변경 여부 판단)"""
+    payload = json.dumps(metadata, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def catalog_fingerprint(records, index_version=None):
+    """브랜드 카탈로그 내용의 해시입니다. 프로세스가 바뀌어도 같은 카탈로그이면 같은 값입니다."""
+    digest = hashlib.sha1(json.dumps(index_version, default=str).encode('utf-8'))
+    for brand_id, metadata in sorted(records, key=lambda record: str(record[0])):
+        digest.update(f"\n{brand_id}\t{record_hash(metadata or {})}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def vector_hash(vector):
+    """브랜드 벡터의 해시입니다."""
+    return hashlib.sha1(np.asarray(vector, dtype=np.float32).tobytes()).hexdigest()
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class BrandGraph:
+    """브랜드 유사도 그래프입니다.
+
+    노드는 카탈로그 브랜드와 `competing_brands`에만 나오는 외부 브랜드 이름이고,
+    각 노드의 이웃 목록은 CSR 형식의 배열(`indptr`, `indices`, `scores`, `kinds`)에 저장됩니다.
+    한 행에는 경쟁 브랜드 간선이 메타데이터 순서대로, 그 뒤에 카테고리 텍스트의 최근접 브랜드가 유사도 순서로 놓입니다.
+    조회는 이름 -> 노드 딕셔너리와 배열 슬라이스만 사용하므로 검색 호출 없이 끝납니다.
+    """
+
+    def __init__(self, nodes, indptr, indices, scores, kinds, texts=(), text_vectors=None, knn_size=8, built_at=None,
+                 source_version=None):
+        self.nodes = nodes
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+        self.kinds = kinds
+        self.texts = list(texts)
+        self.text_vectors = text_vectors
+        self.knn_size = knn_size
+        self.built_at = built_at or time.time()
+        # 그래프를 만든 브랜드 카탈로그의 버전 (`catalog_fingerprint`)
+        self.source_version = source_version
+        self._lookup = {}
+        for node, entry in enumerate(nodes):
+            # 카탈로그 브랜드 이름이 외부 이름보다 우선합니다.
+            for key in entry.get('keys', ()):
+                if entry.get('id') is not None or key not in self._lookup:
+                    self._lookup[key] = node
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        return int(len(self.indices))
+
+    @property
+    def nbytes(self):
+        """인접 배열이 차지하는 바이트 수입니다."""
+        return int(self.indptr.nbytes + self.indices.nbytes + self.scores.nbytes + self.kinds.nbytes)
+
+    def node_for(self, brand_name):
+        """브랜드 이름(영문/한글/별칭)에 해당하는 노드 번호를 반환합니다. 없으면 None입니다."""
+        return self._lookup.get(normalize_brand_name(brand_name))
+
+    def neighbors(self, node):
+        """노드의 이웃을 (이름, 점수, 간선 종류) 목록으로 반환합니다."""
+        start, end = int(self.indptr[node]), int(self.indptr[node + 1])
+        return [
+            (self.nodes[int(neighbor)]['name'], float(score), int(kind))
+            for neighbor, score, kind in zip(self.indices[start:end], self.scores[start:end], self.kinds[start:end])
+        ]
+
+    def similar_brands(self, brand_name, top_k=3):
+        """유사 브랜드 이름 목록을 반환합니다. 그래프에 없는 브랜드이면 None을 반환합니다."""
+        node = self.node_for(brand_name)
+        if node is None or self.nodes[node].get('id') is None:
+            return None
+
+        similar = []
+        start, end = int(self.indptr[node]), int(self.indptr[node + 1])
+        for neighbor, kind in zip(self.indices[start:end], self.kinds[start:end]):
+            name = self.nodes[int(neighbor)]['name']
+            # 최근접 이웃에서는 자기 자신과 이미 넣은 브랜드를 건너뜁니다.
+            if kind == EDGE_KNN and (int(neighbor) == node or name in similar):
+                continue
+            similar.append(name)
+            if len(similar) >= top_k:
+                break
+        return similar
+
+    def get_stats(self):
+        """노드/간선 수와 메모리 사용량을 반환합니다."""
+        return {
+            'nodes': len(self.nodes),
+            'brands': sum(1 for entry in self.nodes if entry.get('id') is not None),
+            'edges': self.edge_count,
+            'competing_edges': int(np.count_nonzero(self.kinds == EDGE_COMPETING)),
+            'knn_size': self.knn_size,
+            'adjacency_bytes': self.nbytes,
+            'built_at': self.built_at
+        }
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """디스크에 저장된 그래프를 불러옵니다. 파일이 없으면 None을 반환합니다."""
+        graph_path = os.path.join(path, GRAPH_FILE)
+        if not os.path.exists(graph_path):
+            return None
+
+        with open(graph_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+
+        mmap_mode = 'r' if mmap else None
+        text_vectors = None
+        if data.get('texts'):
+            text_vectors = np.load(os.path.join(path, TEXT_VECTORS_FILE), mmap_mode=mmap_mode)
+        return cls(
+            data['nodes'],
+            np.load(os.path.join(path, INDPTR_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, INDICES_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, SCORES_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, KINDS_FILE), mmap_mode=mmap_mode),
+            texts=data.get('texts', []),
+            text_vectors=text_vectors,
+            knn_size=data.get('knn_size', 8),
+            built_at=data.get('built_at'),
+            source_version=data.get('source_version')
+        )
+
+    def save(self, path):
+        """그래프를 디스크에 저장합니다. 임시 파일에 쓴 뒤 교체하며, graph.json을 마지막에 교체합니다."""
+        os.makedirs(path, exist_ok=True)
+        arrays = [
+            (INDPTR_FILE, self.indptr),
+            (INDICES_FILE, self.indices),
+            (SCORES_FILE, self.scores),
+            (KINDS_FILE, self.kinds)
+        ]
+        if self.text_vectors is not None:
+            arrays.append((TEXT_VECTORS_FILE, self.text_vectors))
+
+        replacements = []
+        for file_name, array in arrays:
+            target = os.path.join(path, file_name)
+            with open(target + ".tmp", 'wb') as file:
+                np.save(file, np.ascontiguousarray(array))
+            replacements.append((target + ".tmp", target))
+
+        graph_path = os.path.join(path, GRAPH_FILE)
+        with open(graph_path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump({
+                'nodes': self.nodes,
+                'texts': self.texts,
+                'knn_size': self.knn_size,
+                'built_at': self.built_at,
+                'source_version': self.source_version
+            }, file, ensure_ascii=False)
+        replacements.append((graph_path + ".tmp", graph_path))
+
+        for source, target in replacements:
+            os.replace(source, target)
+
+    def catalog_rows(self):
+        """카탈로그 브랜드별로 (노드 정보, 최근접 이웃 [(브랜드 ID, 유사도)]) 딕셔너리를 반환합니다."""
+        rows = {}
+        for node, entry in enumerate(self.nodes):
+            if entry.get('id') is None:
+                continue
+            start, end = int(self.indptr[node]), int(self.indptr[node + 1])
+            knn = [
+                (self.nodes[int(neighbor)]['id'], float(score))
+                for neighbor, score, kind in zip(self.indices[start:end], self.scores[start:end], self.kinds[start:end])
+                if kind == EDGE_KNN
+            ]
+            rows[entry['id']] = (entry, knn)
+        return rows
+
+    def text_vector_map(self):
+        """카테고리 텍스트 -> 임베딩 딕셔너리를 반환합니다."""
+        if self.text_vectors is None:
+            return {}
+        return {text: np.asarray(self.text_vectors[i]) for i, text in enumerate(self.texts)}
+
+
+def _nearest_brands(text_vectors, brand_matrix, brand_ids, knn_size):
+    """카테고리 텍스트 벡터마다 가장 가까운 브랜드 `knn_size`개를 [(브랜드 ID, 유사도)]로 찾습니다."""
+    if len(brand_ids) == 0 or len(text_vectors) == 0:
+        return [[] for _ in range(len(text_vectors))]
+
+    similarities = _normalize_rows(np.asarray(text_vectors, dtype=np.float32)) @ brand_matrix.T
+    k = min(knn_size, len(brand_ids))
+    results = []
+    for row in similarities:
+        top = np.argpartition(-row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+        top = top[np.argsort(-row[top], kind='stable')]
+        results.append([(brand_ids[i], float(row[i])) for i in top])
+    return results
+
+
+def build_brand_graph(records, vectors, embed_texts, knn_size=8, previous=None):
+    """브랜드 레코드와 벡터로 유사도 그래프를 만듭니다.
+
+    `records`는 (브랜드 ID, 메타데이터) 목록, `vectors`는 브랜드 ID -> 벡터 딕셔너리,
+    `embed_texts`는 텍스트 목록을 받아 임베딩 목록을 반환하는 함수입니다.
+    `previous` 그래프가 있으면 카테고리 텍스트 임베딩을 재사용하고,
+    브랜드 벡터가 그대로이면 바뀐 브랜드의 행만 다시 계산합니다.
+    반환값은 (그래프, 통계 딕셔너리)입니다.
+    """
+    records = [(brand_id, metadata or {}) for brand_id, metadata in records]
+    stats = {'brands': len(records), 'changed': 0, 'deleted': 0, 'embedded_texts': 0, 'recomputed_rows': 0, 'reused': False}
+
+    brand_ids = [brand_id for brand_id, _ in records if brand_id in vectors]
+    brand_matrix = _normalize_rows(np.asarray([vectors[brand_id] for brand_id in brand_ids], dtype=np.float32)) if brand_ids else np.zeros((0, 0), dtype=np.float32)
+    vector_hashes = {brand_id: vector_hash(vectors[brand_id]) for brand_id in brand_ids}
+
+    previous_rows = previous.catalog_rows() if previous is not None else {}
+    current_ids = {brand_id for brand_id, _ in records}
+    changed = {
+        brand_id for brand_id, metadata in records
+        if brand_id not in previous_rows
+        or previous_rows[brand_id][0].get('hash') != record_hash(metadata)
+        or previous_rows[brand_id][0].get('vector_hash') != vector_hashes.get(brand_id)
+    }
+    deleted = set(previous_rows) - current_ids
+    stats['changed'] = len(changed)
+    stats['deleted'] = len(deleted)
+
+    if previous is not None and not changed and not deleted and previous.knn_size == knn_size:
+        stats['reused'] = True
+        return previous, stats
+
+    # 브랜드 벡터 집합이 그대로이면 바뀌지 않은 브랜드의 최근접 이웃은 이전 결과와 같습니다.
+    vectors_unchanged = (
+        previous is not None and previous.knn_size == knn_size
+        and not deleted and all(brand_id in previous_rows for brand_id in brand_ids)
+        and all(previous_rows[brand_id][0].get('vector_hash') == vector_hashes[brand_id] for brand_id in brand_ids)
+    )
+
+    # 카테고리 텍스트 임베딩 (새 텍스트만 요청)
+    text_vectors = previous.text_vector_map() if previous is not None else {}
+    texts = []
+    for _, metadata in records:
+        text = category_text(metadata)
+        if text is not None and text not in texts:
+            texts.append(text)
+    missing = [text for text in texts if text not in text_vectors]
+    if missing:
+        for text, vector in zip(missing, embed_texts(missing)):
+            text_vectors[text] = np.asarray(vector, dtype=np.float32)
+        stats['embedded_texts'] = len(missing)
+
+    # 다시 계산할 텍스트의 최근접 이웃
+    knn_by_text = {}
+    if vectors_unchanged:
+        for brand_id, metadata in records:
+            text = category_text(metadata)
+            if brand_id not in changed and text is not None:
+                knn_by_text.setdefault(text, previous_rows[brand_id][1])
+    pending = [text for text in texts if text not in knn_by_text]
+    # 자기 자신이 포함될 수 있으므로 한 개 더 찾습니다.
+    for text, knn in zip(pending, _nearest_brands([text_vectors[text] for text in pending], brand_matrix, brand_ids, knn_size + 1)):
+        knn_by_text[text] = knn
+    stats['recomputed_rows'] = sum(1 for _, metadata in records if category_text(metadata) in pending)
+
+    # 노드: 카탈로그 브랜드, 그 뒤에 경쟁 브랜드로만 등장하는 외부 이름
+    nodes = []
+    node_by_id = {}
+    for brand_id, metadata in records:
+        keys = []
+        for name, _ in brand_names(metadata):
+            key = normalize_brand_name(name)
+            if key and key not in keys:
+                keys.append(key)
+        node_by_id[brand_id] = len(nodes)
+        nodes.append({
+            'id': brand_id,
+            'name': metadata.get('brand_name_en') or metadata.get('brand_name_ko') or brand_id,
+            'keys': keys,
+            'hash': record_hash(metadata),
+            'vector_hash': vector_hashes.get(brand_id),
+            'text': category_text(metadata)
+        })
+
+    node_by_key = {}
+    for node, entry in enumerate(nodes):
+        for key in entry['keys']:
+            node_by_key.setdefault(key, node)
+
+    rows = []
+    for brand_id, metadata in records:
+        row = []
+        for name in competing_brand_names(metadata):
+            key = normalize_brand_name(name)
+            node = node_by_key.get(key)
+            if node is None:
+                node = len(nodes)
+                nodes.append({'id': None, 'name': name, 'keys': [key] if key else []})
+                node_by_key[key] = node
+            row.append((node, 1.0, EDGE_COMPETING))
+        text = category_text(metadata)
+        if text is not None:
+            row.extend(
+                (node_by_id[neighbor_id], score, EDGE_KNN)
+                for neighbor_id, score in knn_by_text[text][:knn_size + 1]
+                if neighbor_id in node_by_id
+            )
+        rows.append(row)
+    # 외부 이름 노드는 이웃이 없습니다.
+    rows.extend([] for _ in range(len(nodes) - len(records)))
+
+    indptr = np.zeros(len(rows) + 1, dtype=np.int32)
+    indptr[1:] = np.cumsum([len(row) for row in rows])
+    edges = [edge for row in rows for edge in row]
+    indices = np.asarray([edge[0] for edge in edges], dtype=np.int32)
+    scores = np.asarray([edge[1] for edge in edges], dtype=np.float32)
+    kinds = np.asarray([edge[2] for edge in edges], dtype=np.int8)
+
+    dimension = len(next(iter(text_vectors.values()))) if text_vectors else 0
+    stored_vectors = np.asarray([text_vectors[text] for text in texts], dtype=np.float32).reshape(len(texts), dimension)
+
+    graph = BrandGraph(nodes, indptr, indices, scores, kinds, texts=texts, text_vectors=stored_vectors, knn_size=knn_size)
+    return graph, stats
+
+
+def load_brand_vectors(fetch, ids, batch_size=100):
+    """`fetch(ids)` 함수로 브랜드 인덱스에서 ID별 벡터를 가져옵니다."""
+    vectors = {}
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        response = fetch(ids[start:start + batch_size])
+        for brand_id, vector in response.vectors.items():
+            if vector.values is not None and len(vector.values):
+                vectors[brand_id] = vector.values
+    return vectors
+
+
+class BrandGraphStore:
+    """현재 브랜드 그래프를 보관하고, 브랜드 카탈로그가 바뀌면 증분 재구성합니다.
+
+    읽기는 참조 하나만 가져오므로 잠금이 없고, 재구성은 한 번에 하나만 실행한 뒤 참조를 교체합니다.
+    `path`가 비어 있으면 디스크에 저장하지 않습니다.
+    """
+
+    def __init__(self, path=None, knn_size=8):
+        self.path = path
+        self.knn_size = knn_size
+        self.graph = None
+        self.source_version = None
+        self.last_build = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        graph = None
+        if self.path:
+            try:
+                graph = BrandGraph.load(self.path)
+            except Exception as e:
+                print(f"브랜드 그래프를 불러오는 중 오류가 발생했습니다: {str(e)}")
+        self.graph = graph
+        # 저장된 그래프가 반영한 카탈로그 버전을 그대로 사용해, 카탈로그가 같으면 다시 만들지 않습니다.
+        self.source_version = graph.source_version if graph is not None else None
+        self._loaded = True
+        return graph
+
+    def load(self):
+        """디스크에 저장된 그래프를 (다시) 불러와 현재 그래프로 사용하고 반환합니다."""
+        with self._lock:
+            return self._load()
+
+    def get(self):
+        """현재 그래프를 반환합니다. 처음 호출할 때 디스크에서 불러옵니다."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+        return self.graph
+
+    def is_current(self, source_version):
+        return self.graph is not None and self.source_version == source_version
+
+    @property
+    def rebuilding(self):
+        """재구성이 진행 중인지 여부입니다."""
+        return self._lock.locked()
+
+    def rebuild(self, records, load_vectors, embed_texts, source_version=None, blocking=True, full=False):
+        """브랜드 레코드로 그래프를 증분 재구성합니다. 다른 재구성이 진행 중이고 `blocking`이 False이면 건너뜁니다.
+
+        `full`이면 이전 그래프(메모리, 디스크)를 재사용하지 않고 전체를 다시 계산합니다.
+        """
+        if not self._lock.acquire(blocking=blocking):
+            return None
+        try:
+            if not self._loaded and not full:
+                self._load()
+            self._loaded = True
+            records = list(records)
+            started = time.perf_counter()
+            vectors = load_vectors([brand_id for brand_id, _ in records])
+            previous = None if full else self.graph
+            graph, stats = build_brand_graph(records, vectors, embed_texts, self.knn_size, previous=previous)
+            if self.path and (not stats['reused'] or graph.source_version != source_version):
+                graph.source_version = source_version
+                graph.save(self.path)
+            graph.source_version = source_version
+            self.graph = graph
+            self.source_version = source_version
+            stats['seconds'] = round(time.perf_counter() - started, 3)
+            self.last_build = stats
+            return stats
+        finally:
+            self._lock.release()
+
+    def mark_stale(self):
+        """브랜드 카탈로그가 바뀌었음을 표시합니다. 다음 재구성까지는 기존 그래프를 그대로 사용합니다."""
+        self.source_version = None
+
+    def clear(self):
+        """메모리의 그래프 참조를 버립니다. (디스크 파일은 다음 조회 때 다시 불러옵니다)"""
+        with self._lock:
+            self.graph = None
+            self.source_version = None
+            self._loaded = False
+
+    def get_stats(self):
+        stats = self.graph.get_stats() if self.graph is not None else {}
+        stats['last_build'] = self.last_build
+        return stats
+
+
+def main():
+    """브랜드 인덱스로 유사 브랜드 그래프를 만들거나 갱신합니다."""
+    import argparse
+    import hybrid_search
+
+    parser = argparse.ArgumentParser(description="브랜드 유사도 그래프 생성")
+    parser.add_argument(
+        "--path",
+        default=hybrid_search.BRAND_GRAPH_DIR or None,
+        required=not hybrid_search.BRAND_GRAPH_DIR,
+        help="그래프 저장 디렉터리 (기본값: BRAND_GRAPH_DIR)"
+    )
+    parser.add_argument("--knn", type=int, default=hybrid_search.BRAND_GRAPH_KNN, help="브랜드별 최근접 이웃 수")
+    parser.add_argument("--full", action="store_true", help="이전 그래프를 무시하고 전체를 다시 계산")
+    args = parser.parse_args()
+
+    hybrid_search.brand_graph_store = BrandGraphStore(args.path, knn_size=args.knn)
+    stats = hybrid_search.rebuild_brand_graph(full=args.full)
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+    print(json.dumps(hybrid_search.brand_graph_store.get_stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
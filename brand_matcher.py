@@ -0,0 +1,175 @@
+import re
+from collections import deque
+
+from brand_directory import brand_names
+
+ASCII_WORD_PATTERN = re.compile(r"[0-9a-z]")
+WORD_CHAR_PATTERN = re.compile(r"[0-9a-z가-힣]")
+
+
+class AhoCorasick:
+    """여러 패턴을 한 번의 텍스트 순회로 찾는 Aho-Corasick 오토마톤입니다."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        self._built = False
+
+    def add(self, pattern, value=None):
+        """패턴과 매칭 시 반환할 값을 추가합니다."""
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append((len(pattern), pattern if value is None else value))
+        self._built = False
+
+    def build(self):
+        """실패 링크를 계산합니다."""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+        self._built = True
+
+    def iter_matches(self, text):
+        """텍스트에서 매칭되는 모든 (시작, 끝, 값)을 반환합니다."""
+        if not self._built:
+            self.build()
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._outputs[node]:
+                yield i - length + 1, i + 1, value
+
+
+class BrandSpan:
+    """쿼리에서 찾은 브랜드 위치와 대표 이름입니다."""
+    __slots__ = ('start', 'end', 'text', 'canonical')
+
+    def __init__(self, start, end, text, canonical):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.canonical = canonical
+
+    def __repr__(self):
+        return f"BrandSpan({self.start}, {self.end}, {self.text!r}, {self.canonical!r})"
+
+
+def _is_boundary(text, start, end, pattern):
+    """브랜드 이름이 다른 단어의 일부로 매칭된 경우를 걸러냅니다.
+
+    영문 이름은 앞뒤 모두 단어 경계여야 하고, 한글 이름은 조사가 붙을 수 있으므로
+    앞쪽만 단어 경계인지 확인합니다.
+    """
+    if start > 0 and WORD_CHAR_PATTERN.match(text[start - 1]):
+        return False
+    if ASCII_WORD_PATTERN.match(pattern[-1]) and end < len(text) and ASCII_WORD_PATTERN.match(text[end]):
+        return False
+    return True
+
+
+def select_spans(matches):
+    """겹치는 매칭 중 가장 왼쪽, 가장 긴 것을 고릅니다."""
+    selected = []
+    last_end = -1
+    for start, end, value in sorted(matches, key=lambda match: (match[0], -(match[1] - match[0]))):
+        if start >= last_end:
+            selected.append((start, end, value))
+            last_end = end
+    return selected
+
+
+class BrandMatcher:
+    """브랜드 이름/별칭 사전으로 쿼리에서 브랜드를 찾는 매처입니다."""
+
+    def __init__(self, names=()):
+        self._automaton = AhoCorasick()
+        self.size = 0
+        for name, canonical in names:
+            self.add(name, canonical)
+        self._automaton.build()
+
+    def add(self, name, canonical):
+        """브랜드 이름을 추가합니다. 공백이 있는 이름은 공백 없는 형태도 함께 추가합니다."""
+        pattern = str(name).strip().lower()
+        if not pattern:
+            return
+        self._automaton.add(pattern, canonical)
+        self.size += 1
+        compact = pattern.replace(" ", "")
+        if compact != pattern:
+            self._automaton.add(compact, canonical)
+
+    @classmethod
+    def from_directory(cls, directory):
+        """브랜드 디렉터리의 영문/한글 이름과 별칭으로 매처를 만듭니다."""
+        names = []
+        for _, metadata in directory.items():
+            canonical = metadata.get('brand_name_en') or metadata.get('brand_name_ko')
+            if not canonical:
+                continue
+            names.extend((name, canonical) for name, _ in brand_names(metadata))
+        return cls(names)
+
+    def find(self, query):
+        """쿼리에서 찾은 브랜드 목록을 위치 순서대로 반환합니다."""
+        text = query.lower()
+        matches = [
+            (start, end, canonical)
+            for start, end, canonical in self._automaton.iter_matches(text)
+            if _is_boundary(text, start, end, text[start:end])
+        ]
+        return [
+            BrandSpan(start, end, query[start:end], canonical)
+            for start, end, canonical in select_spans(matches)
+        ]
+
+    def first(self, query):
+        """쿼리에서 처음 등장하는 브랜드를 반환합니다. 없으면 None을 반환합니다."""
+        spans = self.find(query)
+        return spans[0] if spans else None
+
+
+def build_phrase_automaton(phrases):
+    """고정 표현 목록으로 오토마톤을 만듭니다."""
+    automaton = AhoCorasick()
+    for phrase in phrases:
+        automaton.add(phrase.lower())
+    automaton.build()
+    return automaton
+
+
+def remove_spans(text, spans):
+    """텍스트에서 (시작, 끝) 구간들을 지우고 공백을 정리합니다."""
+    pieces = []
+    position = 0
+    for start, end in sorted(spans):
+        if start < position:
+            start = position
+        if start >= end:
+            continue
+        pieces.append(text[position:start])
+        position = end
+    pieces.append(text[position:])
+    return " ".join("".join(pieces).split())
@@ -0,0 +1,174 @@
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 모든 병렬 호출이 공유하는 스레드 풀 크기
+EXECUTOR_MAX_WORKERS = 32
+# 공유 스레드 풀의 작업이 다시 병렬 작업을 나눌 때 사용하는 스레드 풀 크기
+NESTED_EXECUTOR_MAX_WORKERS = 32
+
+_executor = None
+_nested_executor = None
+_executor_lock = threading.Lock()
+# 현재 스레드가 어느 스레드 풀의 작업자인지 기록합니다. (None, 'shared', 'nested')
+_pool_thread = threading.local()
+
+
+def _initializer(level):
+    def initialize():
+        _pool_thread.level = level
+    return initialize
+
+
+def get_executor():
+    """공유 스레드 풀을 반환합니다. 처음 호출될 때 만듭니다."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=EXECUTOR_MAX_WORKERS,
+                    thread_name_prefix="hybrid-search",
+                    initializer=_initializer('shared')
+                )
+    return _executor
+
+
+def get_nested_executor():
+    """공유 스레드 풀의 작업이 나눈 하위 작업을 실행하는 스레드 풀을 반환합니다."""
+    global _nested_executor
+    if _nested_executor is None:
+        with _executor_lock:
+            if _nested_executor is None:
+                _nested_executor = ThreadPoolExecutor(
+                    max_workers=NESTED_EXECUTOR_MAX_WORKERS,
+                    thread_name_prefix="hybrid-search-nested",
+                    initializer=_initializer('nested')
+                )
+    return _nested_executor
+
+
+def _run_inline(context, func, *args, **kwargs):
+    # 하위 스레드 풀의 작업이 다시 나눈 작업은 현재 스레드에서 바로 실행해 완료된 Future로 반환합니다.
+    future = Future()
+    try:
+        future.set_result(context.run(func, *args, **kwargs))
+    except BaseException as e:
+        future.set_exception(e)
+    return future
+
+
+def submit(func, *args, **kwargs):
+    """현재 컨텍스트(contextvars)를 유지한 채 공유 스레드 풀에서 함수를 실행합니다.
+
+    공유 스레드 풀의 작업 안에서 호출하면 하위 작업용 스레드 풀을 사용하고, 그 안에서 다시 호출하면
+    현재 스레드에서 바로 실행합니다. 바깥 작업이 스레드를 모두 차지한 채 안쪽 작업을 기다리며
+    서로 막히는 일(중첩 팬아웃 교착)을 막기 위해서입니다.
+    """
+    context = contextvars.copy_context()
+    level = getattr(_pool_thread, 'level', None)
+    if level == 'nested':
+        return _run_inline(context, func, *args, **kwargs)
+    executor = get_nested_executor() if level == 'shared' else get_executor()
+    return executor.submit(context.run, func, *args, **kwargs)
+
+
+def run_parallel(func, items, max_workers=8, timeout=None, default=None):
+    """`items` 각각에 `func`를 병렬로 적용하고 입력 순서대로 결과를 반환합니다.
+
+    스레드 풀에는 한 번에 `max_workers`개까지만 넣고, 하나가 끝나면 다음 항목을 넣습니다.
+    `timeout`은 호출 하나당 시간(초)으로, 스레드 풀에 넣은 시점부터 잽니다.
+    시간 안에 끝나지 않거나 예외가 발생한 호출은 `default`를 결과로 사용합니다.
+    이미 실행 중인 호출은 멈출 수 없으므로 결과는 버리지만, 끝날 때까지 `max_workers` 자리를 계속 차지합니다.
+    버린 호출들이 모든 자리를 차지한 채 `timeout` 동안 하나도 끝나지 않으면 남은 항목은 실행하지 않고
+    `default`를 사용합니다. (함수가 반환한 뒤에도 버린 호출은 끝날 때까지 실행됩니다.)
+    """
+    items = list(items)
+    if not items:
+        return []
+    if len(items) == 1 and timeout is None:
+        try:
+            return [func(items[0])]
+        except Exception as e:
+            print(f"병렬 작업 중 오류가 발생했습니다: {str(e)}")
+            return [default]
+
+    max_workers = max(max_workers, 1)
+    results = [default] * len(items)
+    running = {}
+    # 시간 초과로 결과를 버렸지만 아직 실행 중인 호출
+    abandoned = set()
+    next_position = 0
+    while next_position < len(items) or running:
+        while next_position < len(items) and len(running) + len(abandoned) < max_workers:
+            future = submit(func, items[next_position])
+            ends_at = None if timeout is None else time.monotonic() + timeout
+            running[future] = (next_position, ends_at)
+            next_position += 1
+
+        if not running:
+            # 모든 자리를 버린 호출이 차지하고 있으면 하나가 끝나기를 최대 `timeout`만큼 기다립니다.
+            done, _ = wait(abandoned, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                print(f"버린 병렬 작업이 끝나지 않아 남은 {len(items) - next_position}개 작업을 건너뜁니다.")
+                break
+            abandoned -= done
+            continue
+
+        wait_seconds = None
+        if timeout is not None:
+            wait_seconds = max(min(ends_at for _, ends_at in running.values()) - time.monotonic(), 0.0)
+        done, _ = wait(list(running) + list(abandoned), timeout=wait_seconds, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            if future in abandoned:
+                abandoned.discard(future)
+                continue
+            position, _ = running.pop(future)
+            try:
+                results[position] = future.result()
+            except Exception as e:
+                print(f"병렬 작업 중 오류가 발생했습니다: {str(e)}")
+
+        if timeout is not None:
+            now = time.monotonic()
+            for future, (position, ends_at) in list(running.items()):
+                if ends_at <= now:
+                    print(f"병렬 작업이 시간 내에 끝나지 않았습니다: {items[position]!r}")
+                    del running[future]
+                    if not future.cancel():
+                        abandoned.add(future)
+    return results
+
+
+async def gather_limited(coroutine_factories, max_concurrency=8, timeout=None, default=None):
+    """코루틴들을 최대 `max_concurrency`개씩 동시에 실행하고 입력 순서대로 결과를 반환합니다.
+
+    `coroutine_factories`는 인자 없이 코루틴을 만드는 함수 목록입니다.
+    시간 초과나 예외가 발생한 작업은 `default`를 결과로 사용합니다.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(factory):
+        async with semaphore:
+            try:
+                if timeout is None:
+                    return await factory()
+                return await asyncio.wait_for(factory(), timeout)
+            except asyncio.TimeoutError:
+                print("비동기 작업이 시간 내에 끝나지 않았습니다.")
+                return default
+            except Exception as e:
+                print(f"비동기 작업 중 오류가 발생했습니다: {str(e)}")
+                return default
+
+    return await asyncio.gather(*(run(factory) for factory in coroutine_factories))
+
+
+def run_in_thread(func, *args, **kwargs):
+    """동기 함수를 공유 스레드 풀에서 실행하는 코루틴을 반환합니다."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return loop.run_in_executor(get_executor(), lambda: context.run(func, *args, **kwargs))
@@ -0,0 +1,284 @@
+import os
+import re
+import time
+import atexit
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """캐시 키를 만들기 위해 유니코드 정규화 및 공백 정리를 합니다."""
+    text = unicodedata.normalize("NFC", str(text))
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def make_cache_key(model, text):
+    """모델 이름과 정규화된 텍스트로 캐시 키를 만듭니다."""
+    return hashlib.sha1(f"{model}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """메모리 LRU와 SQLite 디스크 저장소로 구성된 2단계 임베딩 캐시입니다.
+
+    벡터는 `dtype`(기본 float16)으로 압축해 저장하며,
+    디스크 저장소는 프로세스가 재시작되어도 유지됩니다.
+
+    디스크 쓰기와 마지막 사용 시각 갱신은 모아 두었다가 `flush_entries`개가 쌓이거나
+    `flush_seconds`가 지나면 한 트랜잭션으로 기록합니다. SQLite 입출력은 메모리 LRU 잠금 밖에서 하므로
+    디스크를 읽고 쓰는 동안에도 메모리 적중은 기다리지 않습니다.
+    디스크 항목이 `max_disk_entries`를 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다.
+    """
+
+    def __init__(self, path=None, max_entries=10000, dtype="float16", max_disk_entries=None,
+                 flush_entries=64, flush_seconds=5.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.flush_entries = flush_entries
+        self.flush_seconds = flush_seconds
+        self.dtype = np.dtype(dtype)
+        self._memory = OrderedDict()
+        # 메모리 LRU, 대기 중인 쓰기, 통계는 _lock으로, SQLite 연결은 _disk_lock으로 보호합니다.
+        # 두 잠금을 함께 잡을 때는 항상 _disk_lock을 먼저 잡습니다.
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._connection = None
+        self._pending_writes = {}
+        self._pending_access = set()
+        self._last_flush = time.monotonic()
+        self._disk_entries = 0
+        self.stats = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'writes': 0,
+            'flushes': 0,
+            'disk_evictions': 0
+        }
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, dtype TEXT NOT NULL, vector BLOB NOT NULL, "
+                "last_access REAL NOT NULL DEFAULT (julianday('now')))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)"
+            )
+            self._connection.commit()
+            self._disk_entries = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            # 종료할 때 대기 중인 쓰기를 기록합니다.
+            atexit.register(self.close)
+
+    def _remember(self, key, vector):
+        """메모리 LRU에 벡터를 넣고, 용량을 넘으면 가장 오래된 항목을 제거합니다."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _flush_due(self):
+        pending = len(self._pending_writes) + len(self._pending_access)
+        return pending >= self.flush_entries or (
+            pending and time.monotonic() - self._last_flush >= self.flush_seconds
+        )
+
+    def get(self, key):
+        """캐시에서 벡터를 찾습니다. 없으면 None을 반환합니다."""
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats['hits'] += 1
+                return vector
+            # 메모리에서는 밀려났지만 아직 디스크에 기록되지 않은 벡터
+            row = self._pending_writes.get(key)
+            if row is None and self._connection is None:
+                self.stats['misses'] += 1
+                return None
+
+        if row is None:
+            # 대기 중인 쓰기는 flush가 _disk_lock을 잡은 채로 기록하므로 여기서 놓치지 않습니다.
+            with self._disk_lock:
+                if self._connection is not None:
+                    row = self._connection.execute(
+                        "SELECT dtype, vector FROM embeddings WHERE key = ?", (key,)
+                    ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            vector = np.frombuffer(row[1], dtype=row[0])
+            self._remember(key, vector)
+            if key not in self._pending_writes:
+                self._pending_access.add(key)
+            self.stats['disk_hits'] += 1
+            flush = self._flush_due()
+
+        if flush:
+            self.flush()
+        return vector
+
+    def put(self, key, values):
+        """벡터를 메모리에 저장하고 디스크 쓰기를 예약합니다."""
+        vector = np.asarray(values, dtype=self.dtype)
+        with self._lock:
+            self._remember(key, vector)
+            if self._connection is not None:
+                self._pending_writes[key] = (self.dtype.str, vector.tobytes())
+                self._pending_access.discard(key)
+            self.stats['writes'] += 1
+            flush = self._connection is not None and self._flush_due()
+
+        if flush:
+            self.flush()
+        return vector
+
+    def flush(self):
+        """대기 중인 쓰기와 마지막 사용 시각 갱신을 한 트랜잭션으로 기록하고, 용량을 넘으면 오래된 항목을 삭제합니다."""
+        with self._disk_lock:
+            with self._lock:
+                writes, self._pending_writes = self._pending_writes, {}
+                accessed, self._pending_access = self._pending_access, set()
+                self._last_flush = time.monotonic()
+            if self._connection is None or not (writes or accessed):
+                return 0
+
+            evicted = 0
+            with self._connection:
+                if writes:
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, dtype, vector, last_access) "
+                        "VALUES (?, ?, ?, julianday('now'))",
+                        [(key, dtype, blob) for key, (dtype, blob) in writes.items()]
+                    )
+                    self._disk_entries += len(writes)
+                if accessed:
+                    self._connection.executemany(
+                        "UPDATE embeddings SET last_access = julianday('now') WHERE key = ?",
+                        [(key,) for key in accessed]
+                    )
+                if self.max_disk_entries is not None and self._disk_entries > self.max_disk_entries:
+                    # 덮어쓴 항목도 더했으므로 실제 개수를 다시 센 뒤 초과분만 삭제합니다.
+                    self._disk_entries = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                    excess = self._disk_entries - self.max_disk_entries
+                    if excess > 0:
+                        evicted = self._connection.execute(
+                            "DELETE FROM embeddings WHERE key IN "
+                            "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                            (excess,)
+                        ).rowcount
+                        self._disk_entries -= evicted
+
+        with self._lock:
+            self.stats['flushes'] += 1
+            self.stats['disk_evictions'] += evicted
+        return len(writes) + len(accessed)
+
+    def warm_up(self, limit=None):
+        """최근에 사용된 벡터를 디스크에서 메모리로 미리 불러옵니다."""
+        if self._connection is None:
+            return 0
+
+        limit = self.max_entries if limit is None else min(limit, self.max_entries)
+        with self._disk_lock:
+            rows = self._connection.execute(
+                "SELECT key, dtype, vector FROM embeddings ORDER BY last_access DESC LIMIT ?", (limit,)
+            ).fetchall()
+        with self._lock:
+            # 이미 메모리에 있는 항목보다 앞쪽에, 최근 항목이 뒤쪽에 오도록 최근 순서대로 앞에 넣습니다.
+            for key, dtype, blob in rows:
+                if key not in self._memory:
+                    self._memory[key] = np.frombuffer(blob, dtype=dtype)
+                    self._memory.move_to_end(key, last=False)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return len(rows)
+
+    def get_stats(self):
+        """캐시 적중/실패/제거 통계를 반환합니다."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['pending_writes'] = len(self._pending_writes)
+            stats['disk_entries'] = self._disk_entries
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        """대기 중인 쓰기를 기록하고 디스크 저장소 연결을 닫습니다."""
+        self.flush()
+        with self._disk_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class CachedEmbeddings:
+    """임베딩 모델을 감싸 `embed_query`/`embed_documents` 결과를 캐시합니다."""
+
+    def __init__(self, embeddings, cache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = getattr(embeddings, 'model', None) or embeddings.__class__.__name__
+
+    def embed_query(self, text, call=None):
+        """캐시를 먼저 확인하고, 없으면 모델로 임베딩을 생성합니다.
+
+        `call`을 주면 모델 호출을 `call(함수, 인자)`로 실행합니다. (제한 시간/재시도 등을 적용할 때)
+        """
+        key = make_cache_key(self.model, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            values = call(self.embeddings.embed_query, text) if call else self.embeddings.embed_query(text)
+            vector = self.cache.put(key, values)
+        return vector.astype(np.float32).tolist()
+
+    async def aembed_query(self, text, call=None):
+        """`embed_query`의 비동기 버전입니다. 모델의 비동기 API를 사용하며, `call`은 비동기 함수입니다."""
+        key = make_cache_key(self.model, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            if hasattr(self.embeddings, 'aembed_query'):
+                model_call = self.embeddings.aembed_query
+            else:
+                async def model_call(text):
+                    return await asyncio.to_thread(self.embeddings.embed_query, text)
+            values = await (call(model_call, text) if call else model_call(text))
+            vector = self.cache.put(key, values)
+        return vector.astype(np.float32).tolist()
+
+    def embed_documents(self, texts, call=None):
+        """여러 텍스트를 임베딩합니다. 캐시에 없는 텍스트만 한 번에 모델에 요청합니다."""
+        keys = [make_cache_key(self.model, text) for text in texts]
+        vectors = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            if call:
+                new_vectors = call(self.embeddings.embed_documents, missing_texts)
+            else:
+                new_vectors = self.embeddings.embed_documents(missing_texts)
+            for i, values in zip(missing, new_vectors):
+                vectors[i] = self.cache.put(keys[i], values)
+
+        return [vector.astype(np.float32).tolist() for vector in vectors]
@@ -0,0 +1,75 @@
+import numpy as np
+
+# 기본 결합 방식과 RRF 상수
+DEFAULT_STRATEGY = "linear"
+RRF_K = 60
+
+
+def _as_arrays(score_arrays):
+    """점수 목록을 같은 길이의 float32 배열 목록으로 변환합니다."""
+    arrays = [np.asarray(scores, dtype=np.float32) for scores in score_arrays]
+    if len({len(scores) for scores in arrays}) > 1:
+        raise ValueError("모든 점수 배열의 길이가 같아야 합니다.")
+    return arrays
+
+
+def linear_fusion(score_arrays, weights, **kwargs):
+    """점수에 가중치를 곱해 더합니다. (기존 `벡터 + 키워드 * 0.1` 방식)"""
+    fused = np.zeros(len(score_arrays[0]), dtype=np.float32)
+    for scores, weight in zip(score_arrays, weights):
+        fused += weight * scores
+    return fused
+
+
+def minmax_fusion(score_arrays, weights, **kwargs):
+    """각 점수를 후보 내에서 0~1로 정규화한 뒤 가중합합니다."""
+    fused = np.zeros(len(score_arrays[0]), dtype=np.float32)
+    for scores, weight in zip(score_arrays, weights):
+        low = scores.min()
+        span = scores.max() - low
+        if span > 0:
+            fused += weight * (scores - low) / span
+    return fused
+
+
+def rrf_fusion(score_arrays, weights, rrf_k=RRF_K, **kwargs):
+    """순위 역수 결합(Reciprocal Rank Fusion)입니다.
+
+    점수가 0 이하인 후보는 해당 검색기에서 찾지 못한 것으로 보고 점수를 더하지 않습니다.
+    """
+    fused = np.zeros(len(score_arrays[0]), dtype=np.float32)
+    for scores, weight in zip(score_arrays, weights):
+        order = np.argsort(-scores, kind='stable')
+        ranks = np.empty(len(scores), dtype=np.float32)
+        ranks[order] = np.arange(1, len(scores) + 1, dtype=np.float32)
+        fused += np.where(scores > 0, weight / (rrf_k + ranks), 0.0).astype(np.float32)
+    return fused
+
+
+FUSION_STRATEGIES = {
+    'linear': linear_fusion,
+    'minmax': minmax_fusion,
+    'rrf': rrf_fusion
+}
+
+
+def fuse_scores(score_arrays, weights, strategy=DEFAULT_STRATEGY, **kwargs):
+    """여러 검색기의 점수 배열을 선택한 방식으로 결합합니다."""
+    if strategy not in FUSION_STRATEGIES:
+        raise ValueError(f"지원하지 않는 결합 방식입니다: {strategy}")
+    arrays = _as_arrays(score_arrays)
+    if len(arrays[0]) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return FUSION_STRATEGIES[strategy](arrays, weights, **kwargs)
+
+
+def top_k_indices(scores, top_k):
+    """점수가 높은 상위 k개의 위치를 점수 내림차순으로 반환합니다."""
+    scores = np.asarray(scores)
+    if top_k is None or top_k >= len(scores):
+        positions = np.arange(len(scores))
+    elif top_k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    else:
+        positions = np.argpartition(-scores, top_k - 1)[:top_k]
+    return positions[np.argsort(-scores[positions], kind='stable')]
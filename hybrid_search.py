@@ -1,108 +1,988 @@
-import streamlit as st
 import os
+import copy
 import json
+import math
+import time
+import inspect
+import asyncio
+import threading
+import contextvars
+from contextlib import ExitStack
+import numpy as np
+from concurrent.futures import wait, as_completed, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
+from keyword_index import KeywordIndex, load_records_jsonl
+from brand_directory import BrandDirectory, load_brand_records, brand_names, normalize_brand_name
+from brand_graph import BrandGraphStore, load_brand_vectors, catalog_fingerprint
+from brand_matcher import BrandMatcher, build_phrase_automaton, remove_spans
+from fusion import fuse_scores, top_k_indices
+from concurrency import run_parallel, gather_limited, run_in_thread, submit, get_executor
+from tracing import start_trace, span, traced, current_span, is_tracing
+from search_engine import SearchEngine
+from result_cache import ResultCache, make_result_key
+from semantic_cache import SemanticCache
+from query_parser import parse_query, brands_from_countries, combine_filters
+from vector_store import matches_filter
+from resilience import ResiliencePolicy, CircuitBreaker, deadline
+from metrics import MetricsRegistry
+from result_model import ProductHit, ResultPage, RecordInterner, PRODUCT_DISPLAY_FIELDS, BRAND_DISPLAY_FIELDS
 
 # 환경 변수 로드
 load_dotenv()
 
-# Pinecone 설정
-PINECONE_API_KEY = st.secrets["PINECONE_API_KEY"]
-OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
-
-
 # 인덱스 이름 설정
 PRODUCTS_INDEX_NAME = "sivillage-products"
 BRANDS_INDEX_NAME = "sivillage-brands"
 
-# Pinecone 클라이언트 초기화
-pc = Pinecone(api_key=PINECONE_API_KEY)
+# 벡터 인덱스 백엔드 설정 ("pinecone" 또는 "local")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+
+# 점수 결합 설정 (결합 방식: linear, minmax, rrf)
+FUSION_STRATEGY = os.getenv("FUSION_STRATEGY", "linear")
+VECTOR_SCORE_WEIGHT = float(os.getenv("VECTOR_SCORE_WEIGHT", "1.0"))
+KEYWORD_SCORE_WEIGHT = float(os.getenv("KEYWORD_SCORE_WEIGHT", "0.1"))
+
+# 적응형 후보 검색 설정 (처음 후보 수 = top_k + 여유분, 최대 후보 수 = top_k * 배수)
+ADAPTIVE_RETRIEVAL = os.getenv("ADAPTIVE_RETRIEVAL", "1") not in ("0", "false", "False")
+CANDIDATE_WINDOW_MARGIN = int(os.getenv("CANDIDATE_WINDOW_MARGIN", "2"))
+CANDIDATE_WINDOW_MAX_FACTOR = int(os.getenv("CANDIDATE_WINDOW_MAX_FACTOR", "3"))
+CANDIDATE_WINDOW_GROWTH = int(os.getenv("CANDIDATE_WINDOW_GROWTH", "3"))
+# 상품 메타데이터 search_weight의 최대값 (창 밖 상품의 점수 상한 계산에 사용)
+SEARCH_WEIGHT_MAX = float(os.getenv("SEARCH_WEIGHT_MAX", "1.0"))
+retrieval_stats = {'searches': 0, 'settled': 0, 'max_window': 0, 'widenings': 0, 'total_window': 0}
+_retrieval_stats_lock = threading.Lock()
+
+# 후보 검색 방식
+# - "full": 후보 검색에서 모든 후보의 메타데이터 전체를 받음
+# - "two_stage": 후보는 ID와 점수만 받고, 점수 계산에 필요한 필드는 로컬 메타데이터 저장소(키워드 색인)에서 읽은 뒤
+#   상위 top_k개의 표시용 메타데이터만 가져옴 (로컬 저장소가 없으면 "full"로 동작)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "full")
+# 2단계 검색에서 상위 결과 메타데이터를 가져올 곳 ("local": 로컬 메타데이터 저장소, "fetch": 인덱스 fetch 한 번)
+TWO_STAGE_METADATA_SOURCE = os.getenv("TWO_STAGE_METADATA_SOURCE", "local")
+
+# 쿼리 조건을 인덱스 필터로 적용할 상품 메타데이터 필드 (price, brand, category, gender, age_group)
+PRODUCT_FILTER_FIELDS = [field.strip() for field in os.getenv("PRODUCT_FILTER_FIELDS", "price,brand").split(",") if field.strip()]
+
+# Pinecone 백엔드에서 키워드 색인을 만들 상품 카탈로그 파일 (JSONL)
+PRODUCTS_CATALOG_PATH = os.getenv("PRODUCTS_CATALOG_PATH", "")
+_keyword_index = None
+
+# 브랜드 디렉터리 설정 (브랜드 이름 -> 브랜드 메타데이터)
+BRANDS_CATALOG_PATH = os.getenv("BRANDS_CATALOG_PATH", "")
+BRAND_DIRECTORY_REFRESH_SECONDS = int(os.getenv("BRAND_DIRECTORY_REFRESH_SECONDS", "3600"))
+brand_directory = BrandDirectory()
+_brand_directory_lock = threading.Lock()
+
+# 브랜드 유사도 그래프 설정 (저장 디렉터리가 비어 있으면 메모리에만 보관)
+# 그래프는 `python brand_graph.py --path <디렉터리>`로 미리 만들어 두고 같은 디렉터리를 지정합니다.
+BRAND_GRAPH_DIR = os.getenv("BRAND_GRAPH_DIR", "")
+BRAND_GRAPH_KNN = int(os.getenv("BRAND_GRAPH_KNN", "8"))
+# 켜면 브랜드 카탈로그가 바뀔 때 검색 중에 백그라운드에서 그래프를 다시 만듭니다.
+# (브랜드 인덱스의 벡터를 모두 가져오므로 기본으로 끕니다.)
+BRAND_GRAPH_AUTO_BUILD = os.getenv("BRAND_GRAPH_AUTO_BUILD", "0") in ("1", "true", "True")
+brand_graph_store = BrandGraphStore(BRAND_GRAPH_DIR, knn_size=BRAND_GRAPH_KNN)
+_brand_graph_requested_version = None
+_brand_graph_schedule_lock = threading.Lock()
+# (디렉터리/인덱스의 프로세스 내 버전, 카탈로그 해시): 카탈로그가 바뀌지 않았으면 해시를 다시 계산하지 않음
+_brand_graph_source_version = None
+
+# 브랜드 중심 쿼리 패턴
+BRAND_CENTRIC_PATTERNS = [
+    "와 비슷한", "와 같은", "와 유사한", "스타일의", "같은 스타일", 
+    "like", "similar to", "same as", "style of", "similar brand"
+]
+
+# 상품 유형을 추출할 때 쿼리에서 지울 연결 표현
+BRAND_PHRASE_PATTERNS = ["와 비슷한", "와 같은", "와 유사한", "스타일의", "같은 스타일"]
+
+_brand_centric_automaton = build_phrase_automaton(BRAND_CENTRIC_PATTERNS)
+_brand_phrase_automaton = build_phrase_automaton(BRAND_PHRASE_PATTERNS)
+
+# 브랜드 매처는 브랜드 디렉터리 버전이 바뀔 때만 다시 만듭니다.
+_brand_matcher = None
+_brand_matcher_version = None
+
+# 병렬 실행 설정 (동시 호출 수, 호출당 제한 시간)
+MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", "8"))
+CALL_TIMEOUT_SECONDS = float(os.getenv("SEARCH_CALL_TIMEOUT", "10"))
+
+# 외부 호출 복원력 설정 (요청 전체 마감 시간, 재시도 횟수, 헤지 요청 기준 분위수, 서킷 브레이커)
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "20"))
+CALL_RETRIES = int(os.getenv("SEARCH_CALL_RETRIES", "2"))
+HEDGE_QUANTILE = float(os.getenv("SEARCH_HEDGE_QUANTILE", "0.95"))
+# LLM 호출은 비용이 크므로 기본적으로 헤지 요청을 보내지 않습니다.
+HEDGE_LLM = os.getenv("SEARCH_HEDGE_LLM", "0") not in ("0", "false", "False")
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+_policies = {}
+_policies_lock = threading.Lock()
+
+# 일괄 검색 설정 (한 번의 embed_documents 요청에 넣을 쿼리 수)
+BATCH_EMBED_SIZE = int(os.getenv("SEARCH_BATCH_EMBED_SIZE", "256"))
+
+# 임베딩 캐시 설정 (메모리 LRU + 디스크 저장소)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+# 디스크 저장소에 보관할 최대 벡터 수 (넘으면 가장 오래 사용하지 않은 항목부터 삭제)
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_DISK_ENTRIES", "200000"))
+
+# 검색 결과 캐시 설정 (쿼리, top_k, 인덱스 버전이 같으면 결과를 재사용)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1000"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "600"))
+result_cache = ResultCache(max_entries=RESULT_CACHE_SIZE, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+
+# 결과 모델 설정 (결과에는 화면에 표시하는 필드만 남기고, 같은 상품/브랜드 레코드는 하나의 객체로 공유)
+# 쉼표로 구분한 필드 목록이며, 비워 두면 메타데이터 전체를 남깁니다.
+RESULT_PRODUCT_FIELDS = [field.strip() for field in os.getenv("RESULT_PRODUCT_FIELDS", ",".join(PRODUCT_DISPLAY_FIELDS)).split(",") if field.strip()]
+RESULT_BRAND_FIELDS = [field.strip() for field in os.getenv("RESULT_BRAND_FIELDS", ",".join(BRAND_DISPLAY_FIELDS)).split(",") if field.strip()]
+RECORD_INTERN_SIZE = int(os.getenv("RECORD_INTERN_SIZE", "100000"))
+product_records = RecordInterner(RESULT_PRODUCT_FIELDS, max_entries=RECORD_INTERN_SIZE)
+brand_records = RecordInterner(RESULT_BRAND_FIELDS, max_entries=RECORD_INTERN_SIZE)
+
+# 의미 캐시 설정 (쿼리 임베딩의 코사인 유사도가 임계값 이상이면 상품 검색 후보를 재사용)
+# 임베딩 유사도는 상위 구간에 몰려 있어 성별/속성만 다른 쿼리도 임계값을 넘을 수 있으므로 기본으로 끕니다.
+# 켜더라도 가격/국가/카테고리/성별/연령 조건과 쿼리의 브랜드가 같은 쿼리끼리만 재사용합니다.
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "0"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.98"))
+semantic_cache = SemanticCache(
+    max_entries=SEMANTIC_CACHE_SIZE,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS
+)
+
+# 지표 설정 (외부 호출 수/토큰/읽기 단위, 캐시 적중률, 쿼리 유형별 지연 시간을 Prometheus 텍스트 형식으로 집계)
+# 값을 지정하면 검색이 끝날 때마다 지표를 이 파일에 씁니다. (server.py의 GET /metrics로도 조회 가능)
+# 여러 워커 프로세스를 쓸 때는 "{pid}"를 넣어 워커별 파일로 나눕니다. (예: metrics/search-{pid}.prom)
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_FILE_INTERVAL_SECONDS = float(os.getenv("METRICS_FILE_INTERVAL_SECONDS", "10"))
+# 토큰 수 추정에 사용할 tiktoken 인코딩 이름 (비워 두면 UTF-8 바이트 수로 대략 추정)
+METRICS_TOKENIZER = os.getenv("METRICS_TOKENIZER", "")
+metrics = MetricsRegistry()
+embedding_requests = metrics.counter(
+    "search_embedding_requests_total", "임베딩 모델 호출 수 (캐시에 없는 텍스트만, 재시도/헤징 포함)", ("operation",)
+)
+embedding_texts = metrics.counter("search_embedding_texts_total", "임베딩 모델에 보낸 텍스트 수", ("operation",))
+embedding_tokens = metrics.counter("search_embedding_tokens_total", "임베딩 모델에 보낸 토큰 수 (추정)", ("operation",))
+llm_requests = metrics.counter("search_llm_requests_total", "LLM 호출 수 (재시도/헤징 포함)", ("operation", "model"))
+llm_tokens = metrics.counter(
+    "search_llm_tokens_total", "LLM 입력/출력 토큰 수 (응답에 사용량이 없으면 추정)", ("operation", "model", "direction")
+)
+index_requests = metrics.counter("search_index_requests_total", "벡터 인덱스 요청 수 (재시도/헤징 포함)", ("index", "operation"))
+index_read_units = metrics.counter(
+    "search_index_read_units_total", "벡터 인덱스가 응답에 보고한 읽기 단위 (로컬 인덱스는 보고하지 않음)", ("index", "operation")
+)
+search_requests = metrics.counter("search_requests_total", "검색 요청 수", ("query_type", "source", "degraded"))
+search_latency = metrics.histogram("search_request_duration_seconds", "검색 요청 처리 시간 (초)", ("query_type", "source"))
+_metrics_file_written_at = 0.0
+
+# 검색 엔진 (외부 클라이언트와 인덱스 핸들을 소유하며 처음 사용할 때 생성)
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """기본 검색 엔진을 반환합니다."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SearchEngine(
+                    vector_backend=VECTOR_BACKEND,
+                    local_index_dir=LOCAL_INDEX_DIR,
+                    embedding_cache_path=EMBEDDING_CACHE_PATH,
+                    embedding_cache_size=EMBEDDING_CACHE_SIZE,
+                    embedding_cache_disk_entries=EMBEDDING_CACHE_DISK_ENTRIES
+                )
+    return _engine
+
+def reset_derived_state():
+    """인덱스가 바뀌었을 때 키워드 색인과 브랜드 디렉터리를 다음 검색 때 다시 만들고, 결과 캐시를 비웁니다."""
+    global _keyword_index, _brand_graph_requested_version
+    _keyword_index = None
+    brand_directory.updated_at = None
+    brand_graph_store.mark_stale()
+    _brand_graph_requested_version = None
+    result_cache.invalidate()
+    semantic_cache.invalidate()
+
+def invalidate_catalog(index_name=None):
+    """카탈로그를 다시 적재한 뒤 호출합니다. 인덱스 버전을 올리고 캐시된 결과를 버립니다."""
+    get_engine().invalidate_index(index_name)
+    reset_derived_state()
+
+def use_engine(engine):
+    """기본 검색 엔진을 교체합니다. (예: Streamlit `st.cache_resource`로 공유하는 엔진)"""
+    global _engine
+    if engine is not _engine:
+        _engine = engine
+        reset_derived_state()
+    return engine
+
+def get_embeddings():
+    """캐시가 적용된 임베딩 모델을 반환합니다."""
+    return get_engine().embeddings
+
+def get_llm():
+    """LLM 모델을 반환합니다."""
+    return get_engine().llm
+
+def set_backends(embedding_model=None, chat_model=None, index_factory=None):
+    """임베딩 모델, LLM, 인덱스 백엔드를 교체합니다. (오프라인 벤치마크, 테스트용)
+
+    `index_factory`는 인덱스 이름을 받아 Pinecone Index와 같은 형태의 객체를 반환하는 함수입니다.
+    인덱스가 바뀌면 키워드 색인과 브랜드 디렉터리는 다음 검색 때 다시 만들어집니다.
+    """
+    get_engine().configure(embedding_model=embedding_model, chat_model=chat_model, index_factory=index_factory)
+    # 지연 시간 기록과 서킷 상태는 이전 백엔드의 것이므로 버립니다.
+    reset_resilience_stats()
+    if index_factory is not None:
+        reset_derived_state()
+
+def get_index(index_name):
+    """설정된 백엔드의 인덱스 핸들을 반환합니다."""
+    return get_engine().index(index_name)
+
+def get_policy(name):
+    """외부 호출 정책을 반환합니다. (embedding, embedding.batch, llm, index:<인덱스 이름>)
+
+    같은 서비스를 호출하는 정책은 서킷 브레이커를 공유합니다. (embedding과 embedding.batch)
+    """
+    policy = _policies.get(name)
+    if policy is not None:
+        return policy
+
+    service = name.split('.')[0]
+    if service != name:
+        breaker = get_policy(service).breaker
+    else:
+        breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+    with _policies_lock:
+        if name not in _policies:
+            _policies[name] = ResiliencePolicy(
+                name,
+                timeout=CALL_TIMEOUT_SECONDS,
+                retries=CALL_RETRIES,
+                hedge=name not in ('embedding.batch', 'llm') or (name == 'llm' and HEDGE_LLM),
+                hedge_quantile=HEDGE_QUANTILE,
+                breaker=breaker
+            )
+        return _policies[name]
+
+def get_resilience_stats():
+    """외부 호출 정책별 재시도/헤징/서킷 브레이커 통계를 반환합니다."""
+    return {name: policy.get_stats() for name, policy in sorted(_policies.items())}
+
+def reset_resilience_stats():
+    """외부 호출 정책(통계, 지연 시간 기록, 서킷 상태)을 초기화합니다."""
+    with _policies_lock:
+        _policies.clear()
+
+def estimate_payload_bytes(matches):
+    """검색/조회 결과의 대략적인 전송 크기(바이트)를 계산합니다. (ID, 점수, 벡터 float32, 메타데이터 JSON)"""
+    total = 0
+    for match in matches:
+        total += len(str(match.id).encode('utf-8')) + 4
+        values = getattr(match, 'values', None)
+        if values is not None:
+            total += 4 * len(values)
+        metadata = getattr(match, 'metadata', None)
+        if metadata:
+            total += len(json.dumps(metadata, ensure_ascii=False).encode('utf-8'))
+    return total
+
+_token_encoder = None
+_token_encoder_checked = False
 
-# OpenAI 임베딩 및 LLM 모델 초기화
-embeddings = OpenAIEmbeddings()
-llm = ChatOpenAI(temperature=0.2, model="gpt-4o")
+def get_token_encoder():
+    """`METRICS_TOKENIZER`에 지정한 tiktoken 인코딩을 반환합니다. 지정하지 않았거나 불러올 수 없으면 None입니다."""
+    global _token_encoder, _token_encoder_checked
+    if not _token_encoder_checked:
+        if METRICS_TOKENIZER:
+            try:
+                import tiktoken
+                _token_encoder = tiktoken.get_encoding(METRICS_TOKENIZER)
+            except Exception as e:
+                print(f"토큰 인코딩을 불러오지 못해 추정값을 사용합니다: {str(e)}")
+        _token_encoder_checked = True
+    return _token_encoder
 
-def search_products(query, top_k=5):
-    """상품 DB에서 상품을 검색합니다."""
+def count_tokens(text):
+    """텍스트의 토큰 수를 계산합니다. 인코더가 없으면 UTF-8 3바이트당 1토큰으로 추정합니다."""
+    text = str(text or '')
+    encoder = get_token_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return math.ceil(len(text.encode('utf-8')) / 3)
+
+def metered(func, record):
+    """외부 호출 함수를 감싸 호출할 때마다(재시도/헤징 포함) `record(인자, 결과)`로 지표를 기록합니다.
+
+    결과를 받기 전에 실패하면 결과는 None으로 기록합니다. 비동기 함수도 지원합니다.
+    """
+    if inspect.iscoroutinefunction(func):
+        async def async_wrapper(*args, **kwargs):
+            response = None
+            try:
+                response = await func(*args, **kwargs)
+                return response
+            finally:
+                record(args, kwargs, response)
+        return async_wrapper
+
+    def wrapper(*args, **kwargs):
+        response = None
+        try:
+            response = func(*args, **kwargs)
+            return response
+        finally:
+            record(args, kwargs, response)
+    return wrapper
+
+def embedding_call(policy_call, operation):
+    """임베딩 캐시가 모델을 호출할 때 쓰는 `call` 함수를 만듭니다. (정책 적용 + 호출 수/토큰 기록)"""
+    def record(args, kwargs, response):
+        texts = [args[0]] if isinstance(args[0], str) else args[0]
+        embedding_requests.inc(operation=operation)
+        embedding_texts.inc(len(texts), operation=operation)
+        embedding_tokens.inc(sum(count_tokens(text) for text in texts), operation=operation)
+
+    def call(func, *args):
+        return policy_call(metered(func, record), *args)
+    return call
+
+def embed_query(text):
+    """쿼리 임베딩을 생성합니다. (캐시에 없을 때만 제한 시간/재시도/헤징을 적용해 모델 호출)"""
+    with span("embed_query", chars=len(text)):
+        return get_embeddings().embed_query(text, call=embedding_call(get_policy('embedding').call, 'query'))
+
+def embed_documents(texts):
+    """여러 텍스트의 임베딩을 한 번의 요청으로 생성합니다."""
+    with span("embed_documents", texts=len(texts)):
+        return get_embeddings().embed_documents(texts, call=embedding_call(get_policy('embedding.batch').call, 'documents'))
+
+async def aembed_query(text):
+    """쿼리 임베딩을 비동기로 생성합니다."""
+    with span("embed_query", chars=len(text), mode="async"):
+        return await get_embeddings().aembed_query(text, call=embedding_call(get_policy('embedding').acall, 'query'))
+
+def index_call(index_name, operation):
+    """인덱스 요청 수와 응답에 보고된 읽기 단위(`usage.read_units`)를 기록하는 함수를 만듭니다."""
+    def record(args, kwargs, response):
+        index_requests.inc(index=index_name, operation=operation)
+        usage = getattr(response, 'usage', None)
+        read_units = usage.get('read_units') if isinstance(usage, dict) else getattr(usage, 'read_units', None)
+        if read_units:
+            index_read_units.inc(read_units, index=index_name, operation=operation)
+    return record
+
+def query_index(index_name, **kwargs):
+    """인덱스 검색을 실행하고 결과 수와 전송 크기를 기록합니다."""
+    with span("index.query", index=index_name, top_k=kwargs.get('top_k'), filtered=bool(kwargs.get('filter'))) as current:
+        results = get_policy(f"index:{index_name}").call(metered(get_index(index_name).query, index_call(index_name, 'query')), **kwargs)
+        current.set(matches=len(results.matches))
+        if is_tracing():
+            current.set(payload_bytes=estimate_payload_bytes(results.matches))
+        return results
+
+def fetch_from_index(index_name, ids):
+    """ID로 인덱스의 벡터와 메타데이터를 조회합니다."""
+    with span("index.fetch", index=index_name, ids=len(ids)) as current:
+        response = get_policy(f"index:{index_name}").call(metered(get_index(index_name).fetch, index_call(index_name, 'fetch')), ids=ids)
+        current.set(vectors=len(response.vectors))
+        if is_tracing():
+            current.set(payload_bytes=estimate_payload_bytes(response.vectors.values()))
+        return response
+
+def message_content(message):
+    """LLM 메시지 객체 또는 `(역할, 내용)` 튜플의 내용을 반환합니다."""
+    if isinstance(message, tuple):
+        return message[1]
+    return getattr(message, 'content', message)
+
+def llm_call(chat_model, operation):
+    """LLM 호출 수와 입력/출력 토큰(응답의 `usage_metadata`, 없으면 추정)을 기록하는 함수를 만듭니다."""
+    model = getattr(chat_model, 'model_name', None) or chat_model.__class__.__name__
+
+    def record(args, kwargs, response):
+        llm_requests.inc(operation=operation, model=model)
+        usage = getattr(response, 'usage_metadata', None) or {}
+        input_tokens = usage.get('input_tokens')
+        if input_tokens is None:
+            input_tokens = sum(count_tokens(message_content(message)) for message in args[0])
+        llm_tokens.inc(input_tokens, operation=operation, model=model, direction='input')
+        if response is not None:
+            output_tokens = usage.get('output_tokens')
+            if output_tokens is None:
+                output_tokens = count_tokens(getattr(response, 'content', ''))
+            llm_tokens.inc(output_tokens, operation=operation, model=model, direction='output')
+    return record
+
+def invoke_llm(messages, operation="chat"):
+    """LLM을 호출합니다. `operation`은 호출 수/토큰 지표를 구분하는 이름입니다."""
+    chat_model = get_llm()
+    with span("llm.invoke", model=getattr(chat_model, 'model_name', None), operation=operation):
+        return get_policy('llm').call(metered(chat_model.invoke, llm_call(chat_model, operation)), messages)
+
+async def ainvoke_llm(messages, operation="chat"):
+    """LLM을 비동기로 호출합니다."""
+    chat_model = get_llm()
+    with span("llm.invoke", model=getattr(chat_model, 'model_name', None), operation=operation, mode="async"):
+        return await get_policy('llm').acall(metered(chat_model.ainvoke, llm_call(chat_model, operation)), messages)
+
+def get_keyword_index():
+    """상품 키워드 색인을 반환합니다. 처음 호출될 때 한 번만 만듭니다."""
+    global _keyword_index
+    if _keyword_index is None:
+        if get_engine().has_local_records:
+            records = get_index(PRODUCTS_INDEX_NAME).records()
+        elif PRODUCTS_CATALOG_PATH and os.path.exists(PRODUCTS_CATALOG_PATH):
+            records = load_records_jsonl(PRODUCTS_CATALOG_PATH)
+        else:
+            return None
+        _keyword_index = KeywordIndex.build(records)
+    return _keyword_index
+
+def get_brand_directory():
+    """브랜드 디렉터리를 반환합니다. 비어 있거나 오래되었으면 변경분만 반영합니다."""
+    updated_at = brand_directory.updated_at
+    if updated_at is not None and time.time() - updated_at < BRAND_DIRECTORY_REFRESH_SECONDS:
+        return brand_directory
+    
+    # 처음 불러올 때만 기다리고, 갱신 중에는 기존 디렉터리를 그대로 사용
+    if not _brand_directory_lock.acquire(blocking=updated_at is None):
+        return brand_directory
+    
     try:
-        # 임베딩 생성
-        query_embedding = embeddings.embed_query(query)
-        
-        # 인덱스 가져오기
-        index = pc.Index(PRODUCTS_INDEX_NAME)
-        
-        # 검색 실행
-        results = index.query(
-            vector=query_embedding,
-            top_k=top_k * 3,  # 더 많은 결과를 가져와서 필터링
-            include_metadata=True
+        if brand_directory.updated_at == updated_at:
+            if BRANDS_CATALOG_PATH and os.path.exists(BRANDS_CATALOG_PATH):
+                records = load_records_jsonl(BRANDS_CATALOG_PATH)
+            else:
+                records = load_brand_records(get_index(BRANDS_INDEX_NAME))
+            brand_directory.sync(records)
+    except Exception as e:
+        print(f"브랜드 디렉터리를 불러오는 중 오류가 발생했습니다: {str(e)}")
+        brand_directory.updated_at = time.time()
+    finally:
+        _brand_directory_lock.release()
+    
+    return brand_directory
+
+def brand_graph_source_version(directory):
+    """브랜드 그래프가 반영한 카탈로그를 구분하는 버전입니다.
+
+    브랜드 레코드 내용과 인덱스가 제공하는 변경 버전으로 만든 해시라 프로세스를 다시 시작해도 같으며,
+    그래프 파일에 함께 저장되어 디스크의 그래프를 그대로 쓸 수 있는지 판단합니다.
+    """
+    global _brand_graph_source_version
+    index_version = get_engine().index_version(BRANDS_INDEX_NAME)
+    key = (id(directory), directory.version, index_version)
+    cached = _brand_graph_source_version
+    if cached is None or cached[0] != key:
+        cached = _brand_graph_source_version = (key, catalog_fingerprint(directory.items(), index_version[1]))
+    return cached[1]
+
+def rebuild_brand_graph(blocking=True, full=False):
+    """브랜드 디렉터리와 브랜드 벡터로 유사도 그래프를 증분 재구성하고 통계를 반환합니다."""
+    directory = get_brand_directory()
+    source_version = brand_graph_source_version(directory)
+
+    def embed_texts(texts):
+        embeddings = []
+        for start in range(0, len(texts), BATCH_EMBED_SIZE):
+            embeddings.extend(embed_documents(texts[start:start + BATCH_EMBED_SIZE]))
+        return embeddings
+
+    with span("brand_graph.rebuild", brands=len(directory)) as current:
+        stats = brand_graph_store.rebuild(
+            directory.items(),
+            lambda ids: load_brand_vectors(lambda batch: fetch_from_index(BRANDS_INDEX_NAME, batch), ids),
+            embed_texts,
+            source_version=source_version,
+            blocking=blocking,
+            full=full
         )
+        if stats:
+            current.set(**{key: value for key, value in stats.items() if key != 'seconds'})
+        return stats
+
+def _rebuild_brand_graph_in_background(source_version):
+    global _brand_graph_requested_version
+    try:
+        if rebuild_brand_graph(blocking=False) is None:
+            # 다른 재구성이 진행 중이라 건너뛰었으면 다음 조회 때 다시 요청합니다.
+            with _brand_graph_schedule_lock:
+                if _brand_graph_requested_version == source_version:
+                    _brand_graph_requested_version = None
+    except Exception as e:
+        print(f"브랜드 그래프를 만드는 중 오류가 발생했습니다: {str(e)}")
+
+def get_brand_graph():
+    """브랜드 유사도 그래프를 반환합니다. (없으면 None)
+
+    브랜드 카탈로그가 바뀌었으면 기존 그래프를 그대로 반환하면서 백그라운드에서 증분 재구성을 시작합니다.
+    """
+    global _brand_graph_requested_version
+    graph = brand_graph_store.get()
+    if not BRAND_GRAPH_AUTO_BUILD:
+        return graph
+
+    directory = get_brand_directory()
+    if not len(directory):
+        return graph
+    source_version = brand_graph_source_version(directory)
+    if brand_graph_store.is_current(source_version) or _brand_graph_requested_version == source_version:
+        return graph
+    with _brand_graph_schedule_lock:
+        # 같은 카탈로그 버전에 대해서는 한 번만 요청합니다. (실패해도 검색 경로로 대체)
+        # 다른 재구성이 진행 중이면 요청하지 않고 다음 조회 때 다시 확인합니다.
+        if _brand_graph_requested_version == source_version or brand_graph_store.rebuilding:
+            return graph
+        # 요청 추적 컨텍스트와 분리해 실행합니다.
+        get_executor().submit(_rebuild_brand_graph_in_background, source_version)
+        _brand_graph_requested_version = source_version
+    return graph
+
+def fetch_vector_scores(index_name, query_embedding, ids):
+    """ID로 벡터를 조회해 쿼리와의 코사인 유사도와 메타데이터를 반환합니다."""
+    response = fetch_from_index(index_name, ids)
+    
+    query_vector = np.asarray(query_embedding, dtype=np.float32)
+    query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+    
+    scored = {}
+    for vector_id, vector in response.vectors.items():
+        values = np.asarray(vector.values, dtype=np.float32)
+        norm = np.linalg.norm(values) or 1.0
+        scored[vector_id] = (float(values @ query_vector / norm), vector.metadata or {})
+    
+    return scored
+
+@traced("fusion")
+def score_candidates(query, candidates, keyword_index, keyword_scores=None, top_k=None):
+    """후보 상품의 벡터 유사도와 키워드 점수를 결합해 점수 순으로 상위 결과를 반환합니다."""
+    candidate_ids = list(candidates)
+    if not candidate_ids:
+        return []
+    
+    # 후보 점수를 배열로 모아 한 번에 계산
+    raw_vector_scores = np.fromiter((candidates[item_id][0] for item_id in candidate_ids), dtype=np.float32, count=len(candidate_ids))
+    search_weights = np.fromiter(
+        (float(candidates[item_id][1].get('search_weight', 1.0)) for item_id in candidate_ids),
+        dtype=np.float32,
+        count=len(candidate_ids)
+    )
+    
+    current_span().add('candidates', len(candidate_ids))
+    
+    # 검색 가중치 적용
+    vector_scores = raw_vector_scores * search_weights
+    keyword_match_scores = keyword_index.score(query, candidate_ids, scores=keyword_scores) * search_weights
+    
+    # 결합 점수 계산 (기본: 벡터 유사도 + 키워드 매칭 * 0.1)
+    combined_scores = fuse_scores(
+        [vector_scores, keyword_match_scores],
+        [VECTOR_SCORE_WEIGHT, KEYWORD_SCORE_WEIGHT],
+        strategy=FUSION_STRATEGY
+    )
+    
+    # 상위 결과만 결과 객체로 변환 (메타데이터는 표시 필드만 남긴 공유 레코드)
+    search_results = []
+    for position in top_k_indices(combined_scores, top_k):
+        item_id = candidate_ids[position]
+        search_results.append(ProductHit(
+            item_id,
+            score=float(combined_scores[position]),
+            vector_score=float(vector_scores[position]),
+            keyword_score=float(keyword_match_scores[position]),
+            metadata=product_records.intern(candidates[item_id][1])
+        ))
+    
+    return search_results
+
+def initial_candidate_window(top_k, bounded=True):
+    """(처음 후보 수, 최대 후보 수)를 반환합니다.
+
+    적응형 검색을 끄거나, 점수 상한을 계산할 수 없으면(linear 외 결합 방식, 키워드 색인 없음)
+    처음부터 최대 후보 수를 사용합니다.
+    """
+    max_window = top_k * CANDIDATE_WINDOW_MAX_FACTOR
+    if not ADAPTIVE_RETRIEVAL or not bounded or FUSION_STRATEGY != "linear":
+        return max_window, max_window
+    return min(top_k + CANDIDATE_WINDOW_MARGIN, max_window), max_window
+
+def collect_candidates(query, query_embedding, window, filter, keyword_index, keyword_scores, candidates, two_stage=False):
+    """벡터 검색과 키워드 색인에서 `window`개씩 후보를 모아 `candidates`에 추가합니다.
+
+    창 밖 상품의 점수 상한을 계산할 수 있도록 (벡터 유사도 상한, 키워드 점수 상한)을 반환합니다.
+    더 찾을 상품이 없으면 해당 상한은 None입니다.
+    `two_stage`이면 인덱스에서 ID와 점수만 받고, 메타데이터는 키워드 색인에 저장된 것을 사용합니다.
+    """
+    query_options = {'filter': filter} if filter else {}
+    results = query_index(
+        PRODUCTS_INDEX_NAME,
+        vector=query_embedding,
+        top_k=window,
+        include_metadata=not two_stage,
+        **query_options
+    )
+    
+    # 벡터 검색 후보: id -> (벡터 유사도, 메타데이터)
+    for item in results.matches:
+        if two_stage:
+            candidates[item.id] = (item.score, keyword_index.get_metadata(item.id) or {})
+        elif hasattr(item, 'metadata'):
+            candidates[item.id] = (item.score, item.metadata or {})
+    dense_bound = results.matches[-1].score if len(results.matches) >= window else None
+    
+    # 키워드 색인 후보 추가 (벡터 검색에서 누락된 상품도 키워드로 찾음)
+    keyword_bound = None
+    if keyword_index is not None:
+        with span("keyword.search") as keyword_span:
+            if filter:
+                # 필터에 맞지 않는 상품을 빼고도 후보 수가 유지되도록 넉넉히 찾음
+                scanned = keyword_index.search(query, top_k=window * 4, scores=keyword_scores)
+                eligible = [hit for hit in scanned if matches_filter(hit[2], filter)]
+                keyword_hits = eligible[:window]
+                if len(eligible) > window:
+                    keyword_bound = eligible[window][1]
+                elif len(scanned) >= window * 4:
+                    keyword_bound = scanned[-1][1]
+            else:
+                scanned = keyword_hits = keyword_index.search(query, top_k=window, scores=keyword_scores)
+                if len(scanned) >= window:
+                    keyword_bound = scanned[-1][1]
+            missing_ids = [hit_id for hit_id, _, _ in keyword_hits if hit_id not in candidates]
+            keyword_span.set(hits=len(keyword_hits), keyword_only=len(missing_ids))
+        if missing_ids:
+            candidates.update(fetch_vector_scores(PRODUCTS_INDEX_NAME, query_embedding, missing_ids))
+    
+    return dense_bound, keyword_bound
+
+def is_top_k_settled(search_results, top_k, candidates, dense_bound, keyword_bound):
+    """창 밖의 어떤 상품도 현재 상위 k개에 들어올 수 없으면 True를 반환합니다. (linear 결합 기준)
+
+    창 밖 상품의 벡터 유사도는 마지막 벡터 검색 결과 이하이고, 키워드 점수는 마지막 키워드 후보 이하이므로
+    `검색 가중치 최대값 * (벡터 가중치 * 벡터 상한 + 키워드 가중치 * 키워드 상한)`이 점수 상한입니다.
+    """
+    # 벡터 검색 결과가 창보다 적으면 조건에 맞는 모든 상품이 이미 후보에 있음
+    if dense_bound is None:
+        return True
+    if len(search_results) < top_k:
+        return False
+    
+    weight_bound = max(
+        [SEARCH_WEIGHT_MAX] + [float(metadata.get('search_weight', 1.0)) for _, metadata in candidates.values()]
+    )
+    score_bound = weight_bound * (
+        VECTOR_SCORE_WEIGHT * max(dense_bound or 0.0, 0.0) + KEYWORD_SCORE_WEIGHT * (keyword_bound or 0.0)
+    )
+    return search_results[top_k - 1]['score'] >= score_bound
+
+def record_retrieval(event, window):
+    """적응형 후보 검색 통계를 기록합니다."""
+    with _retrieval_stats_lock:
+        if event == 'widened':
+            retrieval_stats['widenings'] += 1
+            return
+        retrieval_stats['searches'] += 1
+        retrieval_stats[event] += 1
+        retrieval_stats['total_window'] += window
+
+def get_retrieval_stats():
+    """후보 창 확장 횟수와 조기 종료 비율을 반환합니다."""
+    with _retrieval_stats_lock:
+        stats = dict(retrieval_stats)
+    searches = stats['searches']
+    stats['widen_rate'] = stats['widenings'] / searches if searches else 0.0
+    stats['settled_rate'] = stats['settled'] / searches if searches else 0.0
+    stats['avg_window'] = stats.pop('total_window') / searches if searches else 0.0
+    return stats
+
+def reset_retrieval_stats():
+    """후보 검색 통계를 초기화합니다."""
+    with _retrieval_stats_lock:
+        for name in retrieval_stats:
+            retrieval_stats[name] = 0
+
+def semantic_cache_key(query, filter=None):
+    """의미 캐시 항목을 재사용할 수 있는 범위입니다.
+
+    인덱스 버전과 필터 외에, 쿼리에서 추출한 조건(가격, 국가, 카테고리, 성별, 연령)과 브랜드가 같아야
+    합니다. ("여성용 가죽 가방"과 "남성용 가죽 가방"처럼 임베딩이 가까워도 조건이 다른 쿼리를 구분)
+    """
+    constraints = parse_query(query).to_dict()
+    constraints.pop('matched', None)
+    constraints['brands'] = sorted({brand_span.canonical for brand_span in match_brands_in_query(query)})
+    return (
+        get_engine().index_version(PRODUCTS_INDEX_NAME),
+        json.dumps(filter, sort_keys=True, ensure_ascii=False) if filter else None,
+        json.dumps(constraints, sort_keys=True, ensure_ascii=False)
+    )
+
+@traced("search_products")
+def search_products(query, top_k=5, query_embedding=None, filter=None):
+    """상품 DB에서 상품을 검색합니다. 임베딩을 미리 계산했으면 `query_embedding`으로 전달합니다.
+
+    `filter`(메타데이터 필터)가 있으면 조건에 맞는 상품만 인덱스에서 검색하고,
+    결과가 `top_k`개보다 적으면 필터 없이 검색한 결과로 나머지를 채웁니다.
+    """
+    try:
+        # 임베딩 생성
+        if query_embedding is None:
+            query_embedding = embed_query(query)
         
-        # 결과 처리 및 필터링
-        search_results = []
-        
-        # 쿼리에서 키워드 추출
-        keywords = query.lower().split()
+        # 의미가 거의 같은 쿼리를 이전에 검색했으면 그 결과 후보를 재사용 (같은 필터와 쿼리 조건일 때만)
+        semantic_key = semantic_cache_key(query, filter) if semantic_cache.max_entries > 0 else None
+        if semantic_key is not None:
+            with span("semantic_cache.get") as cache_span:
+                cached_results, similarity = semantic_cache.get(query_embedding, top_k, semantic_key)
+                cache_span.set(hit=cached_results is not None, similarity=similarity)
+            if cached_results is not None:
+                return cached_results.to_hits()
         
-        for item in results.matches:
-            if hasattr(item, 'metadata'):
-                # 메타데이터에서 필요한 정보 추출
-                product_name = item.metadata.get('product_name', '').lower()
-                brand = item.metadata.get('brand', '').lower()
-                description = item.metadata.get('description', '').lower()
-                
-                # 키워드 매칭 점수 계산
-                keyword_match_score = 0
-                for keyword in keywords:
-                    if keyword in product_name:
-                        keyword_match_score += 5  # 제품명에 키워드가 있으면 가중치 높게
-                    if keyword in brand:
-                        keyword_match_score += 3  # 브랜드에 키워드가 있으면 중간 가중치
-                    if keyword in description:
-                        keyword_match_score += 1  # 설명에 키워드가 있으면 낮은 가중치
-                
-                # 검색 가중치 가져오기 (기본값 1.0)
-                search_weight = float(item.metadata.get('search_weight', 1.0))
+        # 후보 창을 작게 시작해, 창 밖의 상품이 상위 결과에 들어올 수 있을 때만 넓힘
+        keyword_index = get_keyword_index()
+        keyword_scores = keyword_index.score_all(query) if keyword_index is not None else None
+        window, max_window = initial_candidate_window(top_k, bounded=keyword_index is not None)
+        two_stage = RETRIEVAL_MODE == "two_stage" and keyword_index is not None
+        candidates = {}
+        with span("retrieve", window=window, two_stage=two_stage) as retrieve_span:
+            while True:
+                dense_bound, keyword_bound = collect_candidates(
+                    query, query_embedding, window, filter, keyword_index, keyword_scores, candidates, two_stage
+                )
+                if keyword_index is None:
+                    # 색인이 없으면 벡터 검색 후보만으로 임시 색인을 만들어 점수를 계산
+                    scoring_index = KeywordIndex.build(
+                        (item_id, metadata) for item_id, (_, metadata) in candidates.items()
+                    )
+                else:
+                    scoring_index = keyword_index
                 
-                # 검색 가중치 적용
-                keyword_match_score *= search_weight
+                # 결합 점수로 상위 결과 계산
+                search_results = score_candidates(query, candidates, scoring_index, keyword_scores, top_k=top_k)
                 
-                # 결합 점수 계산 (벡터 유사도 + 키워드 매칭)
-                vector_score = item.score * search_weight
-                combined_score = vector_score + (keyword_match_score * 0.1)
+                if is_top_k_settled(search_results, top_k, candidates, dense_bound, keyword_bound):
+                    record_retrieval('settled', window)
+                    break
+                if window >= max_window:
+                    record_retrieval('max_window', window)
+                    break
                 
-                search_results.append({
-                    'id': item.id,
-                    'score': combined_score,
-                    'vector_score': vector_score,
-                    'keyword_score': keyword_match_score,
-                    'metadata': item.metadata
-                })
+                window = min(window * CANDIDATE_WINDOW_GROWTH, max_window)
+                record_retrieval('widened', window)
+                retrieve_span.add('widenings')
+            retrieve_span.set(final_window=window, candidates=len(candidates))
+        
+        if two_stage:
+            hydrate_results(search_results)
         
-        # 결합 점수로 정렬
-        search_results.sort(key=lambda x: x['score'], reverse=True)
+        # 조건에 맞는 상품이 부족하면 필터 없이 검색한 결과로 채움
+        if filter and len(search_results) < top_k:
+            current_span().set(filter_fallback=True)
+            found_ids = {result['id'] for result in search_results}
+            for result in search_products(query, top_k=top_k, query_embedding=query_embedding):
+                if len(search_results) >= top_k:
+                    break
+                if result['id'] not in found_ids:
+                    search_results.append(result)
         
-        # 상위 결과만 반환
-        return search_results[:top_k]
+        if search_results and semantic_key is not None:
+            semantic_cache.put(query_embedding, top_k, ResultPage.from_hits(search_results), semantic_key)
+        return search_results
     
     except Exception as e:
         print(f"상품 검색 중 오류가 발생했습니다: {str(e)}")
+        # 임베딩/인덱스 호출이 실패하면 키워드 색인만으로 순위를 매긴 결과로 대체
+        return search_products_by_keywords(query, top_k=top_k, filter=filter)
+
+def hydrate_results(search_results):
+    """2단계 검색에서 살아남은 상위 결과의 표시용 메타데이터를 채웁니다.
+
+    `TWO_STAGE_METADATA_SOURCE`가 "fetch"이면 모든 결과를, "local"이면 로컬 저장소에 없던 결과만
+    한 번의 `fetch`로 가져옵니다.
+    """
+    if TWO_STAGE_METADATA_SOURCE == "fetch":
+        ids = [result['id'] for result in search_results]
+    else:
+        ids = [result['id'] for result in search_results if not result['metadata']]
+    
+    with span("hydrate", results=len(search_results), source=TWO_STAGE_METADATA_SOURCE, fetched=len(ids)):
+        if not ids:
+            return search_results
+        vectors = fetch_from_index(PRODUCTS_INDEX_NAME, ids).vectors
+        for result in search_results:
+            vector = vectors.get(result['id'])
+            if vector is not None and vector.metadata:
+                result['metadata'] = product_records.intern(vector.metadata)
+    return search_results
+
+def search_products_by_keywords(query, top_k=5, filter=None):
+    """키워드 색인만으로 상품을 검색합니다. (외부 호출이 실패했을 때의 대체 결과)
+
+    결과에는 `'degraded': True`가 표시되며, 키워드 색인이 없으면 빈 목록을 반환합니다.
+    """
+    try:
+        keyword_index = get_keyword_index()
+    except Exception as e:
+        print(f"키워드 색인을 불러오는 중 오류가 발생했습니다: {str(e)}")
+        return []
+    if keyword_index is None:
         return []
 
+    with span("keyword.search", degraded=True) as keyword_span:
+        hits = keyword_index.search(query, top_k=top_k * 4 if filter else top_k)
+        if filter:
+            hits = [hit for hit in hits if matches_filter(hit[2], filter)][:top_k] or hits[:top_k]
+        search_results = []
+        for item_id, keyword_score, metadata in hits:
+            keyword_score *= float(metadata.get('search_weight', 1.0))
+            search_results.append(ProductHit(
+                item_id,
+                score=KEYWORD_SCORE_WEIGHT * keyword_score,
+                vector_score=0.0,
+                keyword_score=keyword_score,
+                metadata=product_records.intern(metadata),
+                degraded=True
+            ))
+        keyword_span.set(hits=len(search_results))
+    return search_results
+
+def build_query_filter(query):
+    """쿼리에서 가격/국가/카테고리/성별/연령 조건을 추출해 상품 인덱스 메타데이터 필터로 만듭니다.
+
+    상품 메타데이터에 있는 필드(`PRODUCT_FILTER_FIELDS`)에 대한 조건만 만들며,
+    국가는 브랜드 디렉터리에서 해당 국가 브랜드를 찾아 브랜드 `$in` 조건으로 바꿉니다.
+    조건이 없으면 None을 반환합니다.
+    """
+    with span("query.parse") as parse_span:
+        parsed = parse_query(query)
+        if not parsed:
+            return None
+        
+        conditions = []
+        if 'price' in PRODUCT_FILTER_FIELDS and (parsed.price_min is not None or parsed.price_max is not None):
+            price_condition = {}
+            if parsed.price_min is not None:
+                price_condition['$gte'] = parsed.price_min
+            if parsed.price_max is not None:
+                price_condition['$lte'] = parsed.price_max
+            conditions.append({'price': price_condition})
+        
+        if parsed.countries and 'brand' in PRODUCT_FILTER_FIELDS:
+            country_brands = brands_from_countries(parsed.countries, get_brand_directory())
+            if country_brands:
+                filter_values, _ = brand_filter_values(country_brands)
+                conditions.append({'brand': {'$in': filter_values}})
+        
+        for field, values in (('category', parsed.categories), ('gender', parsed.genders), ('age_group', parsed.age_groups)):
+            if values and field in PRODUCT_FILTER_FIELDS:
+                conditions.append({field: {'$in': values}})
+        
+        query_filter = combine_filters(conditions)
+        parse_span.set(parsed=parsed.to_dict(), filter=query_filter)
+        return query_filter
+
+def brand_filter_values(brands):
+    """브랜드 필터에 넣을 이름 목록과, 정규화된 이름 -> 쿼리 브랜드 매핑을 만듭니다."""
+    directory = get_brand_directory()
+    filter_values = []
+    owners = {}
+    
+    for brand in brands:
+        # 상품 메타데이터의 브랜드 표기가 다를 수 있으므로 영문/한글/별칭을 모두 포함
+        names = [brand]
+        brand_info = directory.lookup(brand)
+        if brand_info is not None:
+            names.extend(name for name, _ in brand_names(brand_info))
+        
+        for name in names:
+            if name not in filter_values:
+                filter_values.append(name)
+            owners.setdefault(normalize_brand_name(name), brand)
+    
+    return filter_values, owners
+
+@traced("search_products_by_brands")
+def search_products_by_brands(product_type, brands, per_brand=2):
+    """여러 브랜드의 상품을 한 번의 필터 검색으로 가져와 브랜드별로 per_brand개씩 반환합니다.
+
+    한 번의 검색은 전체에서 가까운 상품만 가져오므로 점수가 낮은 브랜드는 후보가 모자랄 수 있습니다.
+    후보가 `per_brand`개보다 적은 브랜드만 브랜드 필터로 다시 검색해 할당량을 채웁니다.
+    """
+    try:
+        # 임베딩 생성 (상품 유형만 한 번 임베딩)
+        query_embedding = embed_query(product_type)
+        
+        # 브랜드 필터로 한 번에 검색 (2단계 검색이면 ID와 점수만 받고 메타데이터는 로컬 저장소에서 읽음)
+        keyword_index = get_keyword_index()
+        two_stage = RETRIEVAL_MODE == "two_stage" and keyword_index is not None
+        grouped = {brand: {} for brand in brands}
+        
+        def collect(query_brands, top_k):
+            # 후보를 쿼리 브랜드별로 분류
+            filter_values, owners = brand_filter_values(query_brands)
+            results = query_index(
+                PRODUCTS_INDEX_NAME,
+                vector=query_embedding,
+                top_k=top_k,
+                include_metadata=not two_stage,
+                filter={'brand': {'$in': filter_values}}
+            )
+            for item in results.matches:
+                metadata = (keyword_index.get_metadata(item.id) if two_stage else item.metadata) or {}
+                brand = owners.get(normalize_brand_name(metadata.get('brand', '')))
+                if brand is not None:
+                    grouped[brand][item.id] = (item.score, metadata)
+        
+        collect(brands, per_brand * len(brands) * 3)
+        
+        # 할당량이 모자란 브랜드만 브랜드별로 다시 검색 (병렬 실행)
+        short_brands = [brand for brand in brands if len(grouped[brand]) < per_brand]
+        if short_brands:
+            run_parallel(
+                lambda brand: collect([brand], per_brand * 3),
+                short_brands,
+                max_workers=MAX_CONCURRENCY,
+                timeout=CALL_TIMEOUT_SECONDS
+            )
+        
+        # 브랜드별 할당량만큼 선택
+        search_results = []
+        for brand, candidates in grouped.items():
+            if not candidates:
+                continue
+            
+            brand_keyword_index = keyword_index
+            if brand_keyword_index is None:
+                brand_keyword_index = KeywordIndex.build(
+                    (item_id, metadata) for item_id, (_, metadata) in candidates.items()
+                )
+            
+            brand_results = score_candidates(f"{brand} {product_type}", candidates, brand_keyword_index, top_k=per_brand)
+            
+            for result in brand_results:
+                result['query_brand'] = brand
+                search_results.append(result)
+        
+        if two_stage:
+            hydrate_results(search_results)
+        return search_results
+    
+    except Exception as e:
+        print(f"브랜드별 상품 검색 중 오류가 발생했습니다: {str(e)}")
+        return []
+
+@traced("search_brands")
 def search_brands(query, top_k=5):
     """브랜드 DB에서 브랜드를 검색합니다."""
     try:
         # 임베딩 생성
-        query_embedding = embeddings.embed_query(query)
-        
-        # 인덱스 가져오기
-        index = pc.Index(BRANDS_INDEX_NAME)
+        query_embedding = embed_query(query)
         
         # 검색 실행
-        results = index.query(
+        results = query_index(
+            BRANDS_INDEX_NAME,
             vector=query_embedding,
             top_k=top_k,
             include_metadata=True
@@ -124,8 +1004,21 @@ def search_brands(query, top_k=5):
         print(f"브랜드 검색 중 오류가 발생했습니다: {str(e)}")
         return []
 
+@traced("get_similar_brands")
 def get_similar_brands(brand_name, top_k=3):
-    """특정 브랜드와 유사한 브랜드를 찾습니다."""
+    """특정 브랜드와 유사한 브랜드를 찾습니다.
+
+    미리 만든 브랜드 그래프에 있는 브랜드이면 배열 조회로 바로 반환하고,
+    그래프가 없거나 그래프에 없는 브랜드일 때만 벡터 검색으로 찾습니다.
+    """
+    graph = get_brand_graph()
+    if graph is not None:
+        similar_brands = graph.similar_brands(brand_name, top_k)
+        if similar_brands is not None:
+            current_span().set(source="graph")
+            return similar_brands
+    current_span().set(source="search")
+    
     try:
         # 브랜드 검색
         query = f"{brand_name} 브랜드"
@@ -163,8 +1056,69 @@ def get_similar_brands(brand_name, top_k=3):
         print(f"유사 브랜드 검색 중 오류가 발생했습니다: {str(e)}")
         return []
 
-def enrich_product_results_with_brand_info(product_results):
-    """상품 검색 결과에 브랜드 정보를 추가합니다."""
+def find_unknown_brand_names(product_results, directory):
+    """브랜드 디렉터리에 없는 브랜드 이름을 중복 없이 모읍니다."""
+    names = []
+    for product in product_results:
+        brand_name = product['metadata'].get('brand', '')
+        if brand_name and directory.lookup(brand_name) is None and brand_name not in names:
+            names.append(brand_name)
+    return names
+
+def resolve_brand_info(brand_name, directory, fallback_matches=None):
+    """브랜드 디렉터리에서 먼저 찾고, 없을 때만 벡터 검색 결과를 사용합니다.
+
+    반환값은 표시 필드만 남긴 공유 레코드이므로 같은 브랜드의 상품들이 하나의 객체를 참조합니다.
+    """
+    brand_info = directory.lookup(brand_name)
+    if brand_info is None and fallback_matches:
+        brand_info = fallback_matches[0]['metadata']
+    if brand_info is None:
+        brand_info = {'brand_name_en': brand_name}
+    return brand_records.intern(brand_info)
+
+def iter_brand_info(product_results):
+    """상품별 브랜드 정보를 `(상품 위치, 브랜드 정보)`로 준비되는 대로 반환하는 제너레이터입니다.
+
+    디렉터리에 있는 브랜드는 바로 반환하고, 없는 브랜드는 병렬로 검색해 끝나는 순서대로 반환합니다.
+    """
+    directory = get_brand_directory()
+    pending = {}
+    for position, product in enumerate(product_results):
+        brand_name = product['metadata'].get('brand', '')
+        if not brand_name:
+            continue
+        if directory.lookup(brand_name) is not None:
+            yield position, resolve_brand_info(brand_name, directory)
+        else:
+            pending.setdefault(brand_name, []).append(position)
+    
+    if not pending:
+        return
+    
+    futures = {submit(search_brands, brand_name, 1): brand_name for brand_name in pending}
+    remaining = set(pending)
+    try:
+        for future in as_completed(futures, timeout=CALL_TIMEOUT_SECONDS):
+            brand_name = futures[future]
+            remaining.discard(brand_name)
+            try:
+                fallback_matches = future.result()
+            except Exception as e:
+                print(f"브랜드 검색 중 오류가 발생했습니다: {str(e)}")
+                fallback_matches = []
+            brand_info = resolve_brand_info(brand_name, directory, fallback_matches)
+            for position in pending[brand_name]:
+                yield position, brand_info
+    except FutureTimeoutError:
+        print(f"브랜드 검색이 시간 내에 끝나지 않았습니다: {sorted(remaining)}")
+        for brand_name in remaining:
+            brand_info = resolve_brand_info(brand_name, directory)
+            for position in pending[brand_name]:
+                yield position, brand_info
+
+def attach_brand_info(product_results, directory, fallback_results):
+    """브랜드 디렉터리와 벡터 검색 결과로 상품에 브랜드 정보를 붙입니다."""
     enriched_results = []
     
     for product in product_results:
@@ -175,93 +1129,421 @@ def enrich_product_results_with_brand_info(product_results):
         brand_name = product['metadata'].get('brand', '')
         
         if brand_name:
-            # 브랜드 정보 검색
-            brand_results = search_brands(brand_name, top_k=1)
-            
-            if brand_results:
-                # 브랜드 정보 추가
-                enriched_product['brand_info'] = brand_results[0]['metadata']
-            else:
-                enriched_product['brand_info'] = {'brand_name_en': brand_name}
+            # 브랜드 정보 추가
+            enriched_product['brand_info'] = resolve_brand_info(brand_name, directory, fallback_results.get(brand_name))
         
         enriched_results.append(enriched_product)
     
     return enriched_results
 
+@traced("enrich_results")
+def enrich_product_results_with_brand_info(product_results):
+    """상품 검색 결과에 브랜드 정보를 추가합니다."""
+    directory = get_brand_directory()
+    
+    # 디렉터리에 없는 브랜드만 벡터 검색 (병렬 실행)
+    unknown_names = find_unknown_brand_names(product_results, directory)
+    current_span().set(results=len(product_results), fallback_lookups=len(unknown_names))
+    fallback_results = dict(zip(unknown_names, run_parallel(
+        lambda brand_name: search_brands(brand_name, top_k=1),
+        unknown_names,
+        max_workers=MAX_CONCURRENCY,
+        timeout=CALL_TIMEOUT_SECONDS,
+        default=[]
+    )))
+    
+    return attach_brand_info(product_results, directory, fallback_results)
+
+@traced("enrich_results")
+async def aenrich_product_results_with_brand_info(product_results):
+    """`enrich_product_results_with_brand_info`의 비동기 버전입니다."""
+    directory = get_brand_directory()
+    
+    unknown_names = find_unknown_brand_names(product_results, directory)
+    current_span().set(results=len(product_results), fallback_lookups=len(unknown_names))
+    fallback_results = dict(zip(unknown_names, await gather_limited(
+        [lambda brand_name=brand_name: run_in_thread(search_brands, brand_name, 1) for brand_name in unknown_names],
+        max_concurrency=MAX_CONCURRENCY,
+        timeout=CALL_TIMEOUT_SECONDS,
+        default=[]
+    )))
+    
+    return attach_brand_info(product_results, directory, fallback_results)
+
+def get_brand_matcher():
+    """브랜드 디렉터리의 이름과 별칭으로 만든 브랜드 매처를 반환합니다."""
+    global _brand_matcher, _brand_matcher_version
+    directory = get_brand_directory()
+    if _brand_matcher is None or _brand_matcher_version != directory.version:
+        _brand_matcher = BrandMatcher.from_directory(directory)
+        _brand_matcher_version = directory.version
+    return _brand_matcher
+
 def is_brand_centric_query(query):
     """쿼리가 브랜드 중심인지 확인합니다."""
-    # 브랜드 중심 쿼리 패턴
-    brand_centric_patterns = [
-        "와 비슷한", "와 같은", "와 유사한", "스타일의", "같은 스타일", 
-        "like", "similar to", "same as", "style of", "similar brand"
-    ]
-    
-    # 패턴 확인
-    for pattern in brand_centric_patterns:
-        if pattern in query.lower():
-            return True
+    for _ in _brand_centric_automaton.iter_matches(query.lower()):
+        return True
     
     return False
 
-def extract_brand_from_query(query):
-    """쿼리에서 브랜드 이름을 추출합니다."""
-    # LLM을 사용하여 브랜드 이름 추출
-    prompt = ChatPromptTemplate.from_template(
-        """다음 쿼리에서 브랜드 이름을 추출해주세요. 브랜드 이름만 반환하세요.
+def match_brands_in_query(query):
+    """브랜드 사전으로 쿼리에 등장하는 브랜드 위치와 대표 이름을 찾습니다."""
+    try:
+        with span("brand.match") as match_span:
+            brand_spans = get_brand_matcher().find(query)
+            match_span.set(matches=len(brand_spans))
+            return brand_spans
+    except Exception as e:
+        print(f"브랜드 매칭 중 오류가 발생했습니다: {str(e)}")
+        return []
+
+BRAND_EXTRACTION_PROMPT = """다음 쿼리에서 브랜드 이름을 추출해주세요. 브랜드 이름만 반환하세요.
         
         쿼리: {query}
         
         브랜드 이름:"""
-    )
-    
-    messages = prompt.format_messages(query=query)
-    response = llm.invoke(messages)
+
+def build_brand_extraction_messages(query):
+    """브랜드 추출 프롬프트 메시지를 만듭니다.
+
+    langchain 채팅 모델이 받는 `(역할, 내용)` 형식이라 프롬프트 템플릿(langchain) 없이도 만들 수 있습니다.
+    """
+    return [("human", BRAND_EXTRACTION_PROMPT.format(query=query))]
+
+@traced("extract_brand_with_llm")
+def extract_brand_with_llm(query):
+    """LLM을 사용하여 쿼리에서 브랜드 이름을 추출합니다."""
+    messages = build_brand_extraction_messages(query)
+    try:
+        response = invoke_llm(messages, operation="brand_extraction")
+    except Exception as e:
+        # LLM을 사용할 수 없으면 일반 검색으로 처리
+        print(f"브랜드 추출 중 오류가 발생했습니다: {str(e)}")
+        return None
     
     # 응답에서 브랜드 이름 추출
     brand_name = response.content.strip()
     
     return brand_name
 
+@traced("extract_brand_with_llm")
+async def aextract_brand_with_llm(query):
+    """`extract_brand_with_llm`의 비동기 버전입니다."""
+    messages = build_brand_extraction_messages(query)
+    try:
+        response = await ainvoke_llm(messages, operation="brand_extraction")
+    except Exception as e:
+        print(f"브랜드 추출 중 오류가 발생했습니다: {str(e)}")
+        return None
+    
+    return response.content.strip()
+
+def extract_brand_from_query(query):
+    """쿼리에서 브랜드 이름을 추출합니다."""
+    # 브랜드 사전에서 먼저 찾고, 찾지 못한 경우에만 LLM 사용
+    brand_spans = match_brands_in_query(query)
+    if brand_spans:
+        return brand_spans[0].canonical
+    
+    return extract_brand_with_llm(query)
+
+def extract_product_type(query, brand_name, brand_spans=()):
+    """쿼리에서 브랜드 이름과 브랜드 관련 표현을 지워 상품 유형만 남깁니다."""
+    lowered = query.lower()
+    
+    if brand_spans:
+        spans = [(span.start, span.end) for span in brand_spans if span.canonical == brand_name]
+    else:
+        # LLM이 추출한 브랜드 이름은 쿼리에 그대로 등장하는 위치를 모두 지움
+        spans = []
+        start = query.find(brand_name) if brand_name else -1
+        while start >= 0:
+            spans.append((start, start + len(brand_name)))
+            start = query.find(brand_name, start + len(brand_name))
+    
+    spans.extend((start, end) for start, end, _ in _brand_phrase_automaton.iter_matches(lowered))
+    
+    return remove_spans(query, spans)
+
+@traced("search_products_per_brand")
+def search_products_per_brand(product_type, brands):
+    """브랜드마다 따로 상품을 검색합니다. (필터 검색 결과가 없을 때 사용, 병렬 실행)"""
+    per_brand_results = run_parallel(
+        lambda brand: search_products(f"{brand} {product_type}", top_k=2),  # 각 브랜드당 2개씩
+        brands,
+        max_workers=MAX_CONCURRENCY,
+        timeout=CALL_TIMEOUT_SECONDS,
+        default=[]
+    )
+    
+    all_results = []
+    for brand, results in zip(brands, per_brand_results):
+        for result in results:
+            result['query_brand'] = brand
+            all_results.append(result)
+    
+    return all_results
+
+def get_result_versions():
+    """결과 캐시 항목의 유효성을 판단할 상품/브랜드 인덱스 버전을 반환합니다."""
+    engine = get_engine()
+    return (
+        engine.index_version(PRODUCTS_INDEX_NAME),
+        engine.index_version(BRANDS_INDEX_NAME),
+        brand_directory.version
+    )
+
+def get_cached_results(query, top_k):
+    """결과 캐시에서 검색 결과를 찾습니다. 없으면 None을 반환합니다."""
+    with span("result_cache.get") as cache_span:
+        search_results = result_cache.get(make_result_key(query, top_k), get_result_versions())
+        cache_span.set(hit=search_results is not None)
+    if search_results is not None:
+        search_results['results'] = search_results['results'].to_hits()
+    return search_results
+
+def cache_results(query, top_k, search_results):
+    """검색 결과를 결과 캐시에 저장합니다. 결과가 비어 있거나 대체 결과이면(오류 가능성) 저장하지 않습니다."""
+    results = search_results.get('results')
+    if results and not any(result.get('degraded') for result in results):
+        # 결과는 열 단위 페이지로 압축해 저장합니다. (메타데이터와 브랜드 정보는 참조만 보관)
+        result_cache.put(make_result_key(query, top_k), dict(search_results, results=ResultPage.from_hits(results)), get_result_versions())
+
+def record_search_metrics(search_results, seconds, source):
+    """검색 요청 하나의 결과 유형과 처리 시간을 지표에 기록합니다.
+
+    `source`는 "search" 또는 "cache"이며, 처리 시간을 따로 잴 수 없으면 `seconds`에 None을 넘깁니다.
+    """
+    query_type = search_results.get('query_type', 'unknown')
+    degraded = any(result.get('degraded') for result in search_results.get('results', []))
+    search_requests.inc(query_type=query_type, source=source, degraded='true' if degraded else 'false')
+    if seconds is not None:
+        search_latency.observe(seconds, query_type=query_type, source=source)
+    if METRICS_FILE:
+        write_metrics_file()
+
+def write_metrics_file(force=False):
+    """`METRICS_FILE`에 지표를 씁니다. `METRICS_FILE_INTERVAL_SECONDS`보다 자주 쓰지는 않습니다."""
+    global _metrics_file_written_at
+    now = time.time()
+    if not force and now - _metrics_file_written_at < METRICS_FILE_INTERVAL_SECONDS:
+        return
+    _metrics_file_written_at = now
+    try:
+        metrics.write_textfile(METRICS_FILE.format(pid=os.getpid()))
+    except OSError as e:
+        print(f"지표 파일을 쓰는 중 오류가 발생했습니다: {str(e)}")
+
+def collect_cache_metrics():
+    """임베딩/결과/의미 캐시의 조회 수와 적중률을 지표로 변환합니다."""
+    caches = {
+        'result': result_cache.get_stats(),
+        'semantic': semantic_cache.get_stats()
+    }
+    if _engine is not None:
+        try:
+            caches['embedding'] = get_embeddings().cache.get_stats()
+        except Exception as e:
+            print(f"임베딩 캐시 통계를 가져오지 못했습니다: {str(e)}")
+
+    lookups = []
+    hit_ratios = []
+    for cache_name, stats in sorted(caches.items()):
+        for stat, result in (('hits', 'hit'), ('disk_hits', 'disk_hit'), ('misses', 'miss')):
+            if stat in stats:
+                lookups.append(({'cache': cache_name, 'result': result}, stats[stat]))
+        hit_ratios.append(({'cache': cache_name}, stats['hit_rate']))
+    return [
+        ("search_cache_lookups_total", "counter", "캐시 조회 수 (적중/디스크 적중/실패)", lookups),
+        ("search_cache_hit_ratio", "gauge", "캐시 적중률", hit_ratios)
+    ]
+
+metrics.add_collector(collect_cache_metrics)
+
+def get_metrics_text():
+    """모든 지표를 Prometheus 텍스트 형식으로 반환합니다."""
+    return metrics.render()
+
 def hybrid_search(query, top_k=5):
-    """하이브리드 검색을 수행합니다."""
+    """하이브리드 검색을 수행합니다. 결과의 'trace'에 단계별 실행 시간이 기록됩니다.
+
+    같은 쿼리를 다시 검색하면 인덱스가 바뀌지 않은 동안 결과 캐시에서 바로 반환합니다.
+    외부 호출은 모두 요청 마감 시간(`SEARCH_DEADLINE_SECONDS`) 안에서 재시도/헤징됩니다.
+    """
+    with start_trace("hybrid_search", query=query, top_k=top_k) as trace, deadline(SEARCH_DEADLINE_SECONDS):
+        search_results = get_cached_results(query, top_k)
+        source = "cache"
+        if search_results is None:
+            search_results = run_hybrid_search(query, top_k)
+            cache_results(query, top_k, search_results)
+            source = "search"
+    
+    search_results['trace'] = trace.to_dict()
+    record_search_metrics(search_results, trace.root.duration_ms / 1000, source)
+    return search_results
+
+def retrieve_hybrid_search(query, top_k=5):
+    """하이브리드 검색의 검색/순위 결정 단계입니다. 결과에는 아직 브랜드 정보가 없습니다."""
     # 브랜드 중심 쿼리인지 확인
     if is_brand_centric_query(query):
-        # 브랜드 이름 추출
-        brand_name = extract_brand_from_query(query)
+        # 브랜드 이름 추출 (브랜드 사전에서 찾지 못하면 LLM 사용)
+        brand_spans = match_brands_in_query(query)
+        brand_name = brand_spans[0].canonical if brand_spans else extract_brand_with_llm(query)
         
         if brand_name:
             print(f"브랜드 중심 쿼리 감지: '{brand_name}'와(과) 유사한 브랜드 검색")
             
+            # 쿼리에서 브랜드 관련 부분 제외
+            product_type = extract_product_type(query, brand_name, brand_spans)
+            
+            if not product_type:
+                product_type = "제품"  # 기본값
+            
+            # 유사 브랜드를 찾는 동안 상품 유형 임베딩을 미리 계산 (임베딩 캐시에 저장됨)
+            embedding_future = submit(embed_query, product_type)
+            
             # 유사 브랜드 검색
             similar_brands = get_similar_brands(brand_name, top_k=3)
             
             if similar_brands:
-                # 유사 브랜드의 상품 검색
-                all_results = []
-                
                 # 원래 브랜드 포함
                 all_brands = [brand_name] + similar_brands
                 
-                # 쿼리에서 브랜드 관련 부분 제외
-                product_type = query.replace(brand_name, "").replace("와 비슷한", "").replace("와 같은", "").replace("와 유사한", "").replace("스타일의", "").replace("같은 스타일", "").strip()
+                try:
+                    embedding_future.result(timeout=CALL_TIMEOUT_SECONDS)
+                except Exception as e:
+                    print(f"상품 유형 임베딩 중 오류가 발생했습니다: {str(e)}")
                 
-                if not product_type:
-                    product_type = "제품"  # 기본값
+                # 모든 브랜드를 한 번의 필터 검색으로 조회 (각 브랜드당 2개씩)
+                all_results = search_products_by_brands(product_type, all_brands, per_brand=2)
                 
-                # 각 브랜드별로 검색
-                for brand in all_brands:
-                    brand_query = f"{brand} {product_type}"
-                    results = search_products(brand_query, top_k=2)  # 각 브랜드당 2개씩
-                    
-                    for result in results:
-                        result['query_brand'] = brand
-                        all_results.append(result)
+                # 필터 검색 결과가 없으면 브랜드별로 검색
+                if not all_results:
+                    all_results = search_products_per_brand(product_type, all_brands)
                 
                 # 점수로 정렬
                 all_results.sort(key=lambda x: x['score'], reverse=True)
                 
-                # 브랜드 정보 추가
-                enriched_results = enrich_product_results_with_brand_info(all_results[:top_k])
+                return {
+                    'query_type': 'brand_centric',
+                    'original_brand': brand_name,
+                    'similar_brands': similar_brands,
+                    'results': all_results[:top_k]
+                }
+    
+    # 일반 검색: 쿼리 조건을 필터로 적용해 상품 DB 검색
+    return {
+        'query_type': 'general',
+        'results': search_products(query, top_k=top_k, filter=build_query_filter(query))
+    }
+
+def run_hybrid_search(query, top_k=5):
+    """하이브리드 검색을 수행합니다."""
+    # 1단계: 검색 및 순위 결정
+    search_results = retrieve_hybrid_search(query, top_k)
+    
+    # 2단계: 브랜드 정보로 결과 보강
+    search_results['results'] = enrich_product_results_with_brand_info(search_results['results'])
+    return search_results
+
+def hybrid_search_stream(query, top_k=5):
+    """하이브리드 검색 결과를 단계별로 반환하는 제너레이터입니다.
+
+    다음 이벤트 딕셔너리를 순서대로 반환합니다.
+    - `{'type': 'results', 'search_results': ...}`: 검색/순위 결정이 끝난 결과 (브랜드 정보 없음)
+    - `{'type': 'brand_info', 'position': i, 'brand_info': ...}`: i번째 상품의 브랜드 정보
+    - `{'type': 'done', 'search_results': ...}`: 브랜드 정보와 'trace'가 포함된 최종 결과
+    결과 캐시에 있으면 브랜드 정보가 포함된 결과와 'done'만 바로 반환합니다.
+    """
+    # 제너레이터는 yield 사이에 호출한 쪽의 컨텍스트로 돌아가고 다른 컨텍스트에서 재개될 수도 있으므로,
+    # 추적 span(contextvars)은 이 검색 전용 컨텍스트에만 설정하고 각 단계를 그 안에서 실행합니다.
+    context = contextvars.copy_context()
+    trace_scope = ExitStack()
+    trace = context.run(trace_scope.enter_context, start_trace("hybrid_search", query=query, top_k=top_k, stream=True))
+    try:
+        search_results = context.run(get_cached_results, query, top_k)
+        source = "cache" if search_results is not None else "search"
+        if search_results is not None:
+            yield {'type': 'results', 'search_results': search_results}
+        else:
+            def retrieve():
+                with deadline(SEARCH_DEADLINE_SECONDS):
+                    return retrieve_hybrid_search(query, top_k)
+
+            search_results = context.run(retrieve)
+            yield {'type': 'results', 'search_results': search_results}
+            
+            # 브랜드 정보는 준비되는 대로 전달하고, 최종 결과에는 복사본에 붙임
+            enriched_results = [product.copy() for product in search_results['results']]
+            enrich_scope = ExitStack()
+            context.run(enrich_scope.enter_context, span("enrich_results", results=len(enriched_results)))
+            brand_infos = context.run(iter_brand_info, enriched_results)
+            try:
+                for position, brand_info in iter(lambda: context.run(next, brand_infos, None), None):
+                    enriched_results[position]['brand_info'] = brand_info
+                    yield {'type': 'brand_info', 'position': position, 'brand_info': brand_info}
+            finally:
+                context.run(brand_infos.close)
+                context.run(enrich_scope.close)
+            
+            search_results = dict(search_results, results=enriched_results)
+            context.run(cache_results, query, top_k, search_results)
+    finally:
+        context.run(trace_scope.close)
+    
+    search_results['trace'] = trace.to_dict()
+    record_search_metrics(search_results, trace.root.duration_ms / 1000, source)
+    yield {'type': 'done', 'search_results': search_results}
+
+async def ahybrid_search(query, top_k=5):
+    """`hybrid_search`의 비동기 버전입니다.
+
+    임베딩과 LLM은 비동기 API를 사용하고, 동기 인덱스 클라이언트 호출은 공유 스레드 풀에서 실행합니다.
+    """
+    with start_trace("ahybrid_search", query=query, top_k=top_k) as trace, deadline(SEARCH_DEADLINE_SECONDS):
+        search_results = get_cached_results(query, top_k)
+        source = "cache"
+        if search_results is None:
+            search_results = await arun_hybrid_search(query, top_k)
+            cache_results(query, top_k, search_results)
+            source = "search"
+    
+    search_results['trace'] = trace.to_dict()
+    record_search_metrics(search_results, trace.root.duration_ms / 1000, source)
+    return search_results
+
+async def arun_hybrid_search(query, top_k=5):
+    """하이브리드 검색을 비동기로 수행합니다."""
+    # 브랜드 중심 쿼리인지 확인
+    if is_brand_centric_query(query):
+        # 브랜드 이름 추출 (브랜드 사전에서 찾지 못하면 LLM 사용)
+        brand_spans = match_brands_in_query(query)
+        brand_name = brand_spans[0].canonical if brand_spans else await aextract_brand_with_llm(query)
+        
+        if brand_name:
+            print(f"브랜드 중심 쿼리 감지: '{brand_name}'와(과) 유사한 브랜드 검색")
+            
+            product_type = extract_product_type(query, brand_name, brand_spans) or "제품"
+            
+            # 유사 브랜드 검색과 상품 유형 임베딩을 동시에 실행
+            similar_brands, _ = await gather_limited(
+                [
+                    lambda: run_in_thread(get_similar_brands, brand_name, 3),
+                    lambda: aembed_query(product_type)
+                ],
+                max_concurrency=MAX_CONCURRENCY,
+                timeout=CALL_TIMEOUT_SECONDS
+            )
+            
+            if similar_brands:
+                all_brands = [brand_name] + similar_brands
+                
+                all_results = await run_in_thread(search_products_by_brands, product_type, all_brands, 2)
+                if not all_results:
+                    all_results = await run_in_thread(search_products_per_brand, product_type, all_brands)
+                
+                all_results.sort(key=lambda x: x['score'], reverse=True)
+                enriched_results = await aenrich_product_results_with_brand_info(all_results[:top_k])
                 
                 return {
                     'query_type': 'brand_centric',
@@ -270,18 +1552,152 @@ def hybrid_search(query, top_k=5):
                     'results': enriched_results
                 }
     
-    # 일반 검색
-    # 1단계: 상품 DB 검색
-    product_results = search_products(query, top_k=top_k)
+    # 일반 검색 (쿼리 임베딩은 비동기로 미리 계산해 캐시에 저장)
+    try:
+        await asyncio.wait_for(aembed_query(query), CALL_TIMEOUT_SECONDS)
+    except Exception as e:
+        print(f"쿼리 임베딩 중 오류가 발생했습니다: {str(e)}")
     
-    # 2단계: 브랜드 정보로 결과 보강
-    enriched_results = enrich_product_results_with_brand_info(product_results)
+    product_results = await run_in_thread(search_products, query, top_k, None, build_query_filter(query))
+    enriched_results = await aenrich_product_results_with_brand_info(product_results)
     
     return {
         'query_type': 'general',
         'results': enriched_results
     }
 
+def enrich_batch_results(product_results, fallback_results):
+    """일괄 검색용 브랜드 정보 보강입니다. 디렉터리에 없는 브랜드의 검색 결과를 배치 전체가 공유합니다."""
+    directory = get_brand_directory()
+    unknown_names = [
+        brand_name for brand_name in find_unknown_brand_names(product_results, directory)
+        if brand_name not in fallback_results
+    ]
+    fallback_results.update(zip(unknown_names, run_parallel(
+        lambda brand_name: search_brands(brand_name, top_k=1),
+        unknown_names,
+        max_workers=MAX_CONCURRENCY,
+        timeout=CALL_TIMEOUT_SECONDS,
+        default=[]
+    )))
+    return attach_brand_info(product_results, directory, fallback_results)
+
+def run_batch_query(query, top_k, query_embedding=None):
+    """일괄 검색의 쿼리 하나를 스레드 풀에서 실행합니다.
+
+    일반 쿼리는 미리 계산한 임베딩으로 상품 검색까지만 하고(브랜드 정보는 배치 전체에서 보강),
+    브랜드 중심 쿼리는 `run_hybrid_search` 전체를 실행합니다.
+    """
+    with start_trace("hybrid_search", query=query, top_k=top_k, batch=True) as trace, deadline(SEARCH_DEADLINE_SECONDS):
+        if query_embedding is None:
+            search_results = run_hybrid_search(query, top_k)
+        else:
+            search_results = {
+                'query_type': 'general',
+                'results': search_products(
+                    query, top_k=top_k, query_embedding=query_embedding, filter=build_query_filter(query)
+                )
+            }
+    return search_results, trace
+
+def hybrid_search_batch(queries, top_k=5, embed_batch_size=BATCH_EMBED_SIZE, max_in_flight=MAX_CONCURRENCY):
+    """여러 쿼리를 한꺼번에 검색하고, 끝나는 순서대로 `(쿼리 위치, 검색 결과)`를 반환하는 제너레이터입니다.
+
+    - 같은 쿼리(정규화 기준)는 한 번만 검색하고 결과를 모든 위치에 돌려줍니다.
+    - 결과 캐시에 있는 쿼리는 바로 반환합니다.
+    - 일반 쿼리는 `embed_batch_size`개씩 `embed_documents`로 임베딩하고,
+      다음 묶음을 임베딩하는 동안 앞 묶음의 인덱스 검색을 스레드 풀에서 실행합니다. (동시에 `max_in_flight`개)
+    - 브랜드 디렉터리에 없는 브랜드의 정보 검색은 배치 전체에서 한 번만 합니다.
+    """
+    queries = list(queries)
+    
+    # 중복 쿼리 묶기: 캐시 키 -> (쿼리, 위치 목록)
+    groups = {}
+    for position, query in enumerate(queries):
+        key = make_result_key(query, top_k)
+        if key in groups:
+            groups[key][1].append(position)
+        else:
+            groups[key] = (query, [position])
+    
+    def deliver(key, search_results):
+        positions = groups[key][1]
+        for i, position in enumerate(positions):
+            yield position, search_results if i == len(positions) - 1 else copy.deepcopy(search_results)
+    
+    # 결과 캐시에 있는 쿼리는 바로 반환
+    general_keys = []
+    brand_keys = []
+    versions = get_result_versions()
+    for key, (query, _) in groups.items():
+        cached = result_cache.get(key, versions)
+        if cached is not None:
+            cached['results'] = cached['results'].to_hits()
+            record_search_metrics(cached, None, "cache")
+            yield from deliver(key, cached)
+        elif is_brand_centric_query(query):
+            brand_keys.append(key)
+        else:
+            general_keys.append(key)
+    
+    in_flight = {}
+    fallback_results = {}
+    
+    def finish(future):
+        key, is_general = in_flight.pop(future)
+        query = groups[key][0]
+        try:
+            search_results, trace = future.result()
+        except Exception as e:
+            print(f"일괄 검색 중 오류가 발생했습니다 ({query}): {str(e)}")
+            return key, {'query_type': 'general', 'results': []}
+        
+        if is_general:
+            search_results['results'] = enrich_batch_results(search_results['results'], fallback_results)
+        cache_results(query, top_k, search_results)
+        search_results['trace'] = trace.to_dict()
+        record_search_metrics(search_results, trace.root.duration_ms / 1000, "search")
+        return key, search_results
+    
+    def drain(block):
+        if not in_flight:
+            return
+        if block:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        else:
+            done = [future for future in in_flight if future.done()]
+        for future in done:
+            yield from deliver(*finish(future))
+    
+    def launch(key, query_embedding=None):
+        while len(in_flight) >= max_in_flight:
+            yield from drain(block=True)
+        future = submit(run_batch_query, groups[key][0], top_k, query_embedding)
+        in_flight[future] = (key, query_embedding is not None)
+    
+    # LLM 호출이 있을 수 있는 브랜드 중심 쿼리를 먼저 시작
+    for key in brand_keys:
+        yield from launch(key)
+    
+    # 일반 쿼리: 묶음 단위로 임베딩하고 검색을 파이프라인으로 실행
+    embed_batch_size = max(1, embed_batch_size)
+    for start in range(0, len(general_keys), embed_batch_size):
+        batch_keys = general_keys[start:start + embed_batch_size]
+        try:
+            embeddings_batch = embed_documents([groups[key][0] for key in batch_keys])
+        except Exception as e:
+            print(f"일괄 임베딩 중 오류가 발생했습니다: {str(e)}")
+            embeddings_batch = [None] * len(batch_keys)
+        
+        # 임베딩하는 동안 끝난 검색 결과를 먼저 반환
+        yield from drain(block=False)
+        for key, query_embedding in zip(batch_keys, embeddings_batch):
+            # 일괄 임베딩에 실패한 쿼리는 쿼리별 검색으로 처리
+            yield from launch(key, query_embedding)
+    
+    while in_flight:
+        yield from drain(block=True)
+
 def print_search_results(search_results):
     """검색 결과를 출력합니다."""
     query_type = search_results['query_type']
@@ -0,0 +1,404 @@
+"""상품/브랜드 카탈로그를 벡터 인덱스에 적재하는 명령행 도구입니다.
+
+CSV 또는 JSONL 파일을 한 줄씩 읽어 레코드마다 내용 해시를 계산하고,
+이전 적재 기록(매니페스트)과 비교해 새로 추가되거나 바뀐 레코드만 임베딩해 업서트합니다.
+메타데이터만 바뀐 레코드는 저장된 벡터를 다시 써서 임베딩 없이 전체 메타데이터로 업서트하고,
+파일에서 사라진 레코드는 인덱스에서 삭제합니다. 같은 ID가 여러 번 나오면 마지막 레코드만 적재합니다.
+
+사용 예:
+    python ingest.py products catalog/products.jsonl
+    python ingest.py brands catalog/brands.csv --workers 8 --embed-batch-size 512
+    python ingest.py products catalog/products.csv --dry-run
+"""
+import os
+import csv
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 카탈로그 종류별 설정 (인덱스 이름, 임베딩할 텍스트 필드)
+CATALOGS = {
+    'products': {
+        'index_name': "sivillage-products",
+        'text_fields': ['brand', 'product_name', 'description']
+    },
+    'brands': {
+        'index_name': "sivillage-brands",
+        'text_fields': ['brand_name_en', 'brand_name_ko', 'main_category', 'sub_category',
+                        'brand_description', 'target_customers']
+    }
+}
+
+MANIFEST_DIR = os.getenv("INGEST_MANIFEST_DIR", ".cache/ingest")
+DEFAULT_NUMERIC_FIELDS = "price,search_weight"
+
+
+def read_records(path, id_field="id", numeric_fields=()):
+    """CSV/JSONL 파일에서 (ID, 메타데이터)를 하나씩 읽는 제너레이터입니다.
+
+    JSONL은 `{"id": ..., "metadata": {...}}` 형식과 필드가 한 단계로 펼쳐진 형식을 모두 지원합니다.
+    CSV의 `numeric_fields` 열은 숫자로 변환하고, 빈 칸은 메타데이터에서 제외합니다.
+    """
+    if path.endswith('.csv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as file:
+            for row in csv.DictReader(file):
+                record_id = row.pop(id_field, None)
+                if not record_id:
+                    continue
+                metadata = {}
+                for field, value in row.items():
+                    if value is None or value == '':
+                        continue
+                    if field in numeric_fields:
+                        try:
+                            value = float(value)
+                            value = int(value) if value.is_integer() else value
+                        except ValueError:
+                            pass
+                    metadata[field] = value
+                yield str(record_id), metadata
+        return
+
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'metadata' in record:
+                yield str(record[id_field]), record['metadata'] or {}
+            else:
+                record_id = record.pop(id_field)
+                yield str(record_id), record
+
+
+def last_positions(records):
+    """ID별로 마지막으로 나온 레코드의 위치를 반환합니다. (같은 ID는 마지막 레코드를 적재)"""
+    positions = {}
+    for position, (record_id, _) in enumerate(records):
+        positions[record_id] = position
+    return positions
+
+
+def embedding_text(metadata, text_fields):
+    """임베딩할 텍스트를 만듭니다."""
+    return " ".join(str(metadata[field]) for field in text_fields if metadata.get(field))
+
+
+def content_hashes(metadata, text, model):
+    """(임베딩 텍스트 해시, 메타데이터 해시)를 계산합니다. 모델이 바뀌면 텍스트 해시도 바뀝니다."""
+    text_hash = hashlib.sha1(f"{model}\n{text}".encode('utf-8')).hexdigest()
+    metadata_hash = hashlib.sha1(json.dumps(metadata, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return text_hash, metadata_hash
+
+
+class Manifest:
+    """인덱스에 적재된 레코드의 내용 해시 기록입니다. (ID -> [텍스트 해시, 메타데이터 해시])"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def set(self, record_id, hashes):
+        with self._lock:
+            self.entries[record_id] = list(hashes)
+
+    def remove(self, record_ids):
+        with self._lock:
+            for record_id in record_ids:
+                self.entries.pop(record_id, None)
+
+    def save(self):
+        """임시 파일에 쓴 뒤 교체합니다."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file)
+            os.replace(tmp_path, self.path)
+
+
+class IngestStats:
+    """적재 진행 상황과 처리량을 기록하고 주기적으로 출력합니다."""
+
+    def __init__(self, name, progress_seconds=5.0):
+        self.name = name
+        self.progress_seconds = progress_seconds
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+        self.counts = {
+            'read': 0,
+            'duplicate': 0,
+            'unchanged': 0,
+            'embedded': 0,
+            'metadata_updated': 0,
+            'deleted': 0,
+            'failed': 0,
+            'embed_requests': 0
+        }
+        self.seconds = {'embed': 0.0, 'upsert': 0.0}
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counts[name] += value
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.seconds[name] += seconds
+
+    def report(self, force=False):
+        """마지막 출력 후 `progress_seconds`가 지났으면 진행 상황을 출력합니다."""
+        now = time.perf_counter()
+        if not force and now - self._last_report < self.progress_seconds:
+            return
+        self._last_report = now
+        summary = self.summary()
+        print(
+            f"[{self.name}] 읽음 {summary['read']}, 중복 {summary['duplicate']}, 변경 없음 {summary['unchanged']}, "
+            f"임베딩 {summary['embedded']}, 메타데이터 갱신 {summary['metadata_updated']}, "
+            f"삭제 {summary['deleted']}, 실패 {summary['failed']} "
+            f"({summary['rows_per_second']} rows/s, 임베딩 {summary['embedded_per_second']} rows/s)",
+            file=sys.stderr
+        )
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            summary = dict(self.counts)
+            summary.update({f"{name}_seconds": round(value, 3) for name, value in self.seconds.items()})
+        summary['elapsed_seconds'] = round(elapsed, 3)
+        summary['rows_per_second'] = round(summary['read'] / elapsed, 1) if elapsed else None
+        summary['embedded_per_second'] = round(summary['embedded'] / elapsed, 1) if elapsed else None
+        return summary
+
+
+def list_index_ids(index):
+    """인덱스에 저장된 모든 ID를 반환합니다. (로컬 인덱스는 records(), Pinecone은 list())"""
+    if hasattr(index, 'records'):
+        return [record_id for record_id, _ in index.records()]
+    ids = []
+    for id_batch in index.list():
+        ids.extend(id_batch)
+    return ids
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def ingest(kind, path, index=None, embedding_model=None, manifest_path=None, id_field="id",
+           numeric_fields=(), embed_batch_size=256, upsert_batch_size=100, workers=4,
+           full=False, delete=True, dry_run=False, progress_seconds=5.0):
+    """카탈로그 파일을 인덱스에 증분 적재하고 통계를 반환합니다.
+
+    `index`와 `embedding_model`을 주지 않으면 hybrid_search의 검색 엔진 설정(VECTOR_BACKEND 등)을 사용합니다.
+    `full=True`이면 매니페스트를 무시하고 모든 레코드를 다시 임베딩하며, 파일에 없는 인덱스 레코드를 삭제합니다.
+    """
+    catalog = CATALOGS[kind]
+    index_name = catalog['index_name']
+
+    search_module = None
+    if index is None or embedding_model is None:
+        import hybrid_search as search_module
+        engine = search_module.get_engine()
+        index = index or engine.index(index_name)
+        # 쿼리 임베딩 캐시를 거치지 않고 모델을 직접 사용
+        embeddings = engine.embeddings
+        embedding_model = embedding_model or getattr(embeddings, 'embeddings', embeddings)
+    model_name = getattr(embedding_model, 'model', None) or embedding_model.__class__.__name__
+
+    manifest = Manifest(manifest_path or os.path.join(MANIFEST_DIR, f"{index_name}.json"))
+    previous = {} if full else dict(manifest.entries)
+    stats = IngestStats(kind, progress_seconds)
+
+    # 같은 ID가 여러 배치에 나뉘어 동시에 적재되지 않도록 먼저 ID별 마지막 위치를 구합니다.
+    latest = last_positions(read_records(path, id_field, numeric_fields))
+    pending = []
+    pending_metadata = []
+    in_flight = set()
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest")
+
+    def embed_and_upsert(batch):
+        # batch: [(ID, 메타데이터, 텍스트, 해시)]
+        try:
+            started = time.perf_counter()
+            vectors = embedding_model.embed_documents([text for _, _, text, _ in batch])
+            stats.add_time('embed', time.perf_counter() - started)
+            stats.add('embed_requests')
+
+            started = time.perf_counter()
+            for upsert_batch in chunked(list(zip(batch, vectors)), upsert_batch_size):
+                index.upsert(vectors=[
+                    {'id': record_id, 'values': vector, 'metadata': metadata}
+                    for (record_id, metadata, _, _), vector in upsert_batch
+                ])
+                for (record_id, _, _, hashes), _ in upsert_batch:
+                    manifest.set(record_id, hashes)
+                stats.add('embedded', len(upsert_batch))
+            stats.add_time('upsert', time.perf_counter() - started)
+        except Exception as e:
+            print(f"[{kind}] 임베딩/업서트 중 오류가 발생했습니다: {str(e)}", file=sys.stderr)
+            stats.add('failed', len(batch))
+
+    def update_metadata(batch):
+        # batch: [(ID, 메타데이터, 텍스트, 해시)]
+        # update(set_metadata=...)는 기존 메타데이터에 병합되어 지운 필드가 남으므로,
+        # 저장된 벡터를 읽어 전체 메타데이터와 함께 다시 업서트합니다.
+        try:
+            started = time.perf_counter()
+            stored = index.fetch(ids=[record_id for record_id, _, _, _ in batch]).vectors
+            found = [item for item in batch if item[0] in stored]
+            if found:
+                index.upsert(vectors=[
+                    {'id': record_id, 'values': list(stored[record_id].values), 'metadata': metadata}
+                    for record_id, metadata, _, _ in found
+                ])
+                for record_id, _, _, hashes in found:
+                    manifest.set(record_id, hashes)
+                stats.add('metadata_updated', len(found))
+            stats.add_time('upsert', time.perf_counter() - started)
+        except Exception as e:
+            print(f"[{kind}] 메타데이터 갱신 중 오류가 발생했습니다: {str(e)}", file=sys.stderr)
+            stats.add('failed', len(batch))
+            return
+        # 인덱스에 벡터가 없으면 (매니페스트와 어긋난 경우) 다시 임베딩
+        missing = [item for item in batch if item[0] not in stored]
+        if missing:
+            embed_and_upsert(missing)
+
+    def submit(func, *args):
+        # 동시에 실행되는 작업 수를 작업자 수의 두 배로 제한해 메모리 사용량을 묶어 둠
+        while len(in_flight) >= workers * 2:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            in_flight.difference_update(done)
+        in_flight.add(executor.submit(func, *args))
+
+    def flush():
+        if pending and not dry_run:
+            submit(embed_and_upsert, list(pending))
+        pending.clear()
+
+    def flush_metadata():
+        if pending_metadata and not dry_run:
+            submit(update_metadata, list(pending_metadata))
+        pending_metadata.clear()
+
+    try:
+        for position, (record_id, metadata) in enumerate(read_records(path, id_field, numeric_fields)):
+            stats.add('read')
+            if latest.get(record_id) != position:
+                stats.add('duplicate')
+                continue
+            text = embedding_text(metadata, catalog['text_fields'])
+            hashes = content_hashes(metadata, text, model_name)
+            old = previous.get(record_id)
+
+            if old == list(hashes):
+                stats.add('unchanged')
+            elif old is not None and old[0] == hashes[0]:
+                # 텍스트가 같으면 임베딩은 그대로 두고 메타데이터만 갱신
+                pending_metadata.append((record_id, metadata, text, hashes))
+                if dry_run:
+                    stats.add('metadata_updated')
+                if len(pending_metadata) >= upsert_batch_size:
+                    flush_metadata()
+            else:
+                pending.append((record_id, metadata, text, hashes))
+                if dry_run:
+                    stats.add('embedded')
+                if len(pending) >= embed_batch_size:
+                    flush()
+            stats.report()
+        flush()
+        flush_metadata()
+
+        wait(in_flight)
+        in_flight.clear()
+
+        # 파일에서 사라진 레코드 삭제
+        if delete:
+            known_ids = list_index_ids(index) if full else list(manifest.entries)
+            removed = [record_id for record_id in known_ids if record_id not in latest]
+            for delete_batch in chunked(removed, upsert_batch_size):
+                if not dry_run:
+                    try:
+                        index.delete(ids=delete_batch)
+                        manifest.remove(delete_batch)
+                    except Exception as e:
+                        print(f"[{kind}] 삭제 중 오류가 발생했습니다: {str(e)}", file=sys.stderr)
+                        stats.add('failed', len(delete_batch))
+                        continue
+                stats.add('deleted', len(delete_batch))
+    finally:
+        executor.shutdown(wait=True)
+        if not dry_run:
+            manifest.save()
+            if hasattr(index, 'save'):
+                index.save()
+
+    # 같은 프로세스의 검색 캐시와 키워드 색인을 새 카탈로그 기준으로 다시 만듦
+    if search_module is not None and not dry_run:
+        search_module.invalidate_catalog(index_name)
+        # 브랜드가 바뀌었으면 저장된 유사 브랜드 그래프(BRAND_GRAPH_DIR)도 바뀐 부분만 다시 계산
+        changed = stats.counts['embedded'] + stats.counts['metadata_updated'] + stats.counts['deleted']
+        if kind == 'brands' and changed and search_module.BRAND_GRAPH_DIR:
+            try:
+                graph_stats = search_module.rebuild_brand_graph()
+                print(f"[{kind}] 브랜드 그래프 갱신: {graph_stats}", file=sys.stderr)
+            except Exception as e:
+                print(f"[{kind}] 브랜드 그래프 갱신 중 오류가 발생했습니다: {str(e)}", file=sys.stderr)
+
+    stats.report(force=True)
+    summary = stats.summary()
+    summary.update({'kind': kind, 'index': index_name, 'path': path, 'dry_run': dry_run})
+    return summary
+
+
+def main():
+    """명령행 인자를 읽어 카탈로그를 적재합니다."""
+    parser = argparse.ArgumentParser(description="상품/브랜드 카탈로그 증분 적재")
+    parser.add_argument("kind", choices=sorted(CATALOGS), help="카탈로그 종류")
+    parser.add_argument("path", help="CSV 또는 JSONL 파일 경로")
+    parser.add_argument("--id-field", default="id", help="레코드 ID 필드 이름")
+    parser.add_argument("--numeric-fields", default=DEFAULT_NUMERIC_FIELDS, help="CSV에서 숫자로 변환할 필드 (쉼표로 구분)")
+    parser.add_argument("--embed-batch-size", type=int, default=256, help="embed_documents 한 번에 보낼 레코드 수")
+    parser.add_argument("--upsert-batch-size", type=int, default=100, help="업서트/삭제 한 번에 보낼 레코드 수")
+    parser.add_argument("--workers", type=int, default=4, help="동시에 실행할 임베딩/업서트 작업 수")
+    parser.add_argument("--manifest", default=None, help="매니페스트 파일 경로 (기본: .cache/ingest/<인덱스>.json)")
+    parser.add_argument("--full", action="store_true", help="매니페스트를 무시하고 전체를 다시 적재")
+    parser.add_argument("--no-delete", action="store_true", help="파일에 없는 레코드를 삭제하지 않음")
+    parser.add_argument("--dry-run", action="store_true", help="변경 내용만 계산하고 인덱스는 수정하지 않음")
+    parser.add_argument("--progress-seconds", type=float, default=5.0, help="진행 상황 출력 간격 (초)")
+    args = parser.parse_args()
+
+    summary = ingest(
+        args.kind,
+        args.path,
+        manifest_path=args.manifest,
+        id_field=args.id_field,
+        numeric_fields={field.strip() for field in args.numeric_fields.split(",") if field.strip()},
+        embed_batch_size=args.embed_batch_size,
+        upsert_batch_size=args.upsert_batch_size,
+        workers=args.workers,
+        full=args.full,
+        delete=not args.no_delete,
+        dry_run=args.dry_run,
+        progress_seconds=args.progress_seconds
+    )
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
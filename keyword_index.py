@@ -0,0 +1,174 @@
+import re
+import json
+import math
+
+import numpy as np
+
+# 필드별 가중치 (제품명 > 브랜드 > 설명)
+FIELD_WEIGHTS = {
+    'product_name': 5.0,
+    'brand': 3.0,
+    'description': 1.0
+}
+
+# BM25 파라미터
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+WORD_PATTERN = re.compile(r"\w+")
+HANGUL_PATTERN = re.compile(r"[가-힣]")
+
+
+def tokenize(text):
+    """텍스트를 소문자 단어와 한글 문자 bigram 토큰으로 분리합니다.
+
+    한글 단어는 조사나 어미가 붙어도 매칭되도록 단어 전체와 함께
+    두 글자씩 자른 bigram을 토큰으로 추가합니다. ("여성용" -> 여성용, 여성, 성용)
+    """
+    tokens = []
+    for word in WORD_PATTERN.findall(str(text).lower()):
+        tokens.append(word)
+        if len(word) > 2 and HANGUL_PATTERN.search(word):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def query_token_weights(query):
+    """쿼리 토큰별 가중치를 계산합니다.
+
+    한 단어에서 나온 bigram들이 중복으로 점수를 받지 않도록
+    단어 전체 토큰과 bigram 토큰이 가중치를 절반씩 나눠 가집니다.
+    """
+    weights = {}
+    for word in WORD_PATTERN.findall(str(query).lower()):
+        if len(word) > 2 and HANGUL_PATTERN.search(word):
+            bigrams = [word[i:i + 2] for i in range(len(word) - 1)]
+            weights[word] = weights.get(word, 0.0) + 0.5
+            for bigram in bigrams:
+                weights[bigram] = weights.get(bigram, 0.0) + 0.5 / len(bigrams)
+        else:
+            weights[word] = weights.get(word, 0.0) + 1.0
+    return weights
+
+
+class KeywordIndex:
+    """상품 메타데이터에 대한 필드별 역색인과 BM25 점수 계산기입니다.
+
+    색인 시점에 각 posting의 BM25 tf 항을 미리 계산해 두므로,
+    쿼리 시에는 토큰별 posting 배열을 점수 배열에 더하기만 하면 됩니다.
+    """
+
+    def __init__(self, fields=None):
+        self.fields = dict(fields or FIELD_WEIGHTS)
+        self.ids = []
+        self.metadata = []
+        self.positions = {}
+        # field -> token -> (문서 위치 배열, 미리 계산한 BM25 tf 항 배열)
+        self.postings = {field: {} for field in self.fields}
+        # field -> token -> 정규화된 idf
+        self.idf = {field: {} for field in self.fields}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, records, fields=None):
+        """(ID, 메타데이터) 쌍 목록으로 색인을 만듭니다."""
+        index = cls(fields)
+        raw_postings = {field: {} for field in index.fields}
+        lengths = {field: [] for field in index.fields}
+
+        for position, (record_id, metadata) in enumerate(records):
+            metadata = metadata or {}
+            index.ids.append(record_id)
+            index.metadata.append(metadata)
+            index.positions[record_id] = position
+
+            for field in index.fields:
+                tokens = tokenize(metadata.get(field, ''))
+                lengths[field].append(len(tokens))
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    raw_postings[field].setdefault(token, []).append((position, count))
+
+        total = len(index.ids)
+        if total == 0:
+            return index
+
+        # 가장 희귀한 토큰의 idf가 1이 되도록 정규화해 기존 키워드 가중치(5/3/1)와 범위를 맞춥니다.
+        max_idf = math.log(1 + (total - 1 + 0.5) / 1.5)
+
+        for field in index.fields:
+            doc_lengths = np.asarray(lengths[field], dtype=np.float32)
+            average_length = float(doc_lengths.mean()) or 1.0
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / average_length)
+
+            for token, entries in raw_postings[field].items():
+                positions = np.fromiter((entry[0] for entry in entries), dtype=np.int32, count=len(entries))
+                tf = np.fromiter((entry[1] for entry in entries), dtype=np.float32, count=len(entries))
+                term_scores = tf * (BM25_K1 + 1) / (tf + length_norm[positions])
+                index.postings[field][token] = (positions, term_scores)
+
+                doc_freq = len(entries)
+                idf = math.log(1 + (total - doc_freq + 0.5) / (doc_freq + 0.5))
+                index.idf[field][token] = idf / max_idf if max_idf > 0 else 1.0
+
+        return index
+
+    def get_metadata(self, record_id):
+        """ID의 메타데이터를 반환합니다. 색인에 없으면 None입니다."""
+        position = self.positions.get(record_id)
+        return None if position is None else self.metadata[position]
+
+    def score_all(self, query):
+        """모든 문서에 대한 키워드 점수 배열을 계산합니다."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for token, token_weight in query_token_weights(query).items():
+            for field, field_weight in self.fields.items():
+                posting = self.postings[field].get(token)
+                if posting is None:
+                    continue
+                positions, term_scores = posting
+                scores[positions] += (field_weight * token_weight * self.idf[field][token]) * term_scores
+        return scores
+
+    def score(self, query, ids, scores=None):
+        """주어진 ID들의 키워드 점수를 반환합니다. 색인에 없는 ID는 0점입니다."""
+        if scores is None:
+            scores = self.score_all(query)
+        result = np.zeros(len(ids), dtype=np.float32)
+        for i, record_id in enumerate(ids):
+            position = self.positions.get(record_id)
+            if position is not None:
+                result[i] = scores[position]
+        return result
+
+    def search(self, query, top_k=10, scores=None):
+        """키워드 점수가 높은 문서를 (ID, 점수, 메타데이터) 목록으로 반환합니다."""
+        if scores is None:
+            scores = self.score_all(query)
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        return [
+            (self.ids[position], float(scores[position]), self.metadata[position])
+            for position in candidates
+        ]
+
+
+def load_records_jsonl(path):
+    """`{"id": ..., "metadata": {...}}` 형식의 JSONL 파일에서 레코드를 읽습니다."""
+    records = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            records.append((record['id'], record.get('metadata', {})))
+    return records
@@ -0,0 +1,194 @@
+import re
+
+from brand_directory import normalize_brand_name
+
+# 가격대 표현 -> (최소 가격, 최대 가격) (원, None은 제한 없음)
+PRICE_TIERS = {
+    '중저가': (None, 150000),
+    '저가': (None, 50000),
+    '저렴한': (None, 50000),
+    '중가': (50000, 300000),
+    '고가': (300000, None),
+    '프리미엄 가격': (300000, None),
+}
+
+# 국가 이름 -> 브랜드 원산지 표기에서 찾을 이름 (정규화 후 비교)
+COUNTRIES = {
+    '이탈리아': ['이탈리아', 'italy', 'italia'],
+    '프랑스': ['프랑스', 'france'],
+    '일본': ['일본', 'japan'],
+    '영국': ['영국', 'uk', 'unitedkingdom', 'england', 'britain'],
+    '미국': ['미국', 'usa', 'us', 'unitedstates', 'america'],
+    '독일': ['독일', 'germany'],
+    '스위스': ['스위스', 'switzerland'],
+    '스페인': ['스페인', 'spain'],
+    '스웨덴': ['스웨덴', 'sweden'],
+    '덴마크': ['덴마크', 'denmark'],
+    '한국': ['한국', 'korea', 'southkorea'],
+    '스칸디나비아': ['스웨덴', 'sweden', '덴마크', 'denmark', '노르웨이', 'norway', '핀란드', 'finland'],
+}
+
+# 상품 카테고리 표현 -> 대표 카테고리
+CATEGORIES = {
+    '가방': '가방', '백팩': '가방', '캐리어': '가방', '토트백': '가방',
+    '지갑': '지갑',
+    '신발': '신발', '운동화': '신발', '러닝화': '신발', '샌들': '신발', '슈즈': '신발', '스니커즈': '신발',
+    '시계': '시계', '손목시계': '시계',
+    '향수': '향수',
+    '선글라스': '액세서리', '액세서리': '액세서리', '스카프': '액세서리',
+    '셔츠': '의류', '자켓': '의류', '재킷': '의류', '코트': '의류', '의류': '의류', '정장': '의류',
+    '청바지': '의류', '스포츠웨어': '의류', '아우터': '의류', '아동복': '의류', '여성복': '의류',
+}
+
+# 성별 표현 -> 대표 값
+GENDERS = {
+    '여성': '여성', '여자': '여성', '우먼': '여성',
+    '남성': '남성', '남자': '남성', '맨즈': '남성',
+}
+
+# 연령 표현 -> 연령대
+AGE_WORDS = {
+    '청소년': ['10대'],
+    '대학생': ['20대'],
+}
+
+PRICE_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(만\s*원|천\s*원|원)\s*(이하|미만|이상|초과|까지|부터)?"
+)
+PRICE_RANGE_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(?:만\s*원|만)?\s*[-~]\s*(\d+(?:\.\d+)?)\s*(만\s*원|천\s*원|원)"
+)
+AGE_PATTERN = re.compile(r"(?<!\d)([1-9]0)\s*(?:[-~]\s*([1-9]0)\s*)?대")
+
+PRICE_UNITS = {'만원': 10000, '천원': 1000, '원': 1}
+
+
+def _price_value(number, unit):
+    """숫자와 단위로 원 단위 가격을 계산합니다."""
+    return int(float(number) * PRICE_UNITS[unit.replace(' ', '')])
+
+
+class ParsedQuery:
+    """쿼리에서 추출한 구조화된 조건입니다."""
+
+    def __init__(self, text):
+        self.text = text
+        self.price_min = None
+        self.price_max = None
+        self.countries = []
+        self.categories = []
+        self.genders = []
+        self.age_groups = []
+        self.matched = []
+
+    def __bool__(self):
+        return bool(
+            self.price_min is not None or self.price_max is not None
+            or self.countries or self.categories or self.genders or self.age_groups
+        )
+
+    def to_dict(self):
+        """추출 결과를 딕셔너리로 변환합니다."""
+        return {
+            'price_min': self.price_min,
+            'price_max': self.price_max,
+            'countries': self.countries,
+            'categories': self.categories,
+            'genders': self.genders,
+            'age_groups': self.age_groups,
+            'matched': self.matched
+        }
+
+    def __repr__(self):
+        return f"ParsedQuery({self.to_dict()!r})"
+
+
+def _add(values, value):
+    if value not in values:
+        values.append(value)
+
+
+def parse_query(text):
+    """규칙 기반으로 쿼리에서 가격, 국가, 카테고리, 성별/연령 조건을 추출합니다."""
+    parsed = ParsedQuery(text)
+
+    # 가격 범위 ("10~20만원")
+    match = PRICE_RANGE_PATTERN.search(text)
+    if match:
+        unit = match.group(3)
+        parsed.price_min = _price_value(match.group(1), unit)
+        parsed.price_max = _price_value(match.group(2), unit)
+        parsed.matched.append(match.group(0))
+    else:
+        # 가격 상한/하한 ("10만원 이하", "5만원 이상")
+        for match in PRICE_PATTERN.finditer(text):
+            value = _price_value(match.group(1), match.group(2))
+            direction = match.group(3)
+            if direction in ('이하', '미만', '까지'):
+                parsed.price_max = value
+            elif direction in ('이상', '초과', '부터'):
+                parsed.price_min = value
+            else:
+                continue
+            parsed.matched.append(match.group(0))
+
+    # 가격대 표현 ("고가", "중저가") - 숫자로 지정한 가격이 없을 때만
+    if parsed.price_min is None and parsed.price_max is None:
+        for word in sorted(PRICE_TIERS, key=len, reverse=True):
+            if word in text:
+                parsed.price_min, parsed.price_max = PRICE_TIERS[word]
+                parsed.matched.append(word)
+                break
+
+    for country in COUNTRIES:
+        if country in text:
+            _add(parsed.countries, country)
+            parsed.matched.append(country)
+
+    for word, category in CATEGORIES.items():
+        if word in text:
+            _add(parsed.categories, category)
+            parsed.matched.append(word)
+
+    for word, gender in GENDERS.items():
+        if word in text:
+            _add(parsed.genders, gender)
+            parsed.matched.append(word)
+
+    for match in AGE_PATTERN.finditer(text):
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        for age in range(start, end + 10, 10):
+            _add(parsed.age_groups, f"{age}대")
+        parsed.matched.append(match.group(0))
+    for word, age_groups in AGE_WORDS.items():
+        if word in text:
+            for age_group in age_groups:
+                _add(parsed.age_groups, age_group)
+            parsed.matched.append(word)
+
+    return parsed
+
+
+def brands_from_countries(countries, directory):
+    """원산지가 주어진 국가인 브랜드의 영문 이름 목록을 반환합니다."""
+    aliases = {normalize_brand_name(alias) for country in countries for alias in COUNTRIES.get(country, [country])}
+    brands = []
+    for _, metadata in directory.items():
+        origin = normalize_brand_name(metadata.get('country_of_origin', ''))
+        # 짧은 이름(uk, us)은 다른 이름의 일부와 겹치지 않도록 전체가 같을 때만 인정
+        if origin and any(origin == alias or (len(alias) > 2 and alias in origin) for alias in aliases):
+            name = metadata.get('brand_name_en') or metadata.get('brand_name_ko')
+            if name and name not in brands:
+                brands.append(name)
+    return brands
+
+
+def combine_filters(conditions):
+    """필드 조건 목록을 하나의 Pinecone 메타데이터 필터로 합칩니다."""
+    conditions = [condition for condition in conditions if condition]
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {'$and': conditions}
@@ -0,0 +1,466 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+# 외부 호출을 실행하는 전용 스레드 풀 (공유 스레드 풀의 작업이 외부 호출을 기다려도 교착되지 않도록 분리)
+RESILIENCE_MAX_WORKERS = int(os.getenv("RESILIENCE_MAX_WORKERS", "64"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 요청 전체의 마감 시각 (time.monotonic 기준, 없으면 None)
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """요청 마감 시각이 지나 외부 호출을 더 시도할 수 없을 때 발생합니다."""
+
+
+class CircuitOpenError(ConnectionError):
+    """서킷 브레이커가 열려 있어 외부 호출을 바로 거절했을 때 발생합니다."""
+
+
+def get_executor():
+    """외부 호출 전용 스레드 풀을 반환합니다. 처음 호출될 때 만듭니다."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=RESILIENCE_MAX_WORKERS, thread_name_prefix="resilient-call")
+    return _executor
+
+
+@contextmanager
+def deadline(seconds):
+    """이 블록 안의 외부 호출에 마감 시간(초)을 적용합니다.
+
+    이미 더 이른 마감 시각이 있으면 그대로 유지합니다. contextvars로 전달되므로
+    `concurrency.submit`으로 실행한 작업과 비동기 태스크에도 같은 마감 시각이 적용됩니다.
+    `seconds`가 None이거나 0 이하이면 마감 시간을 바꾸지 않습니다.
+    """
+    if not seconds or seconds <= 0:
+        yield _deadline.get()
+        return
+
+    current = _deadline.get()
+    new_deadline = time.monotonic() + seconds
+    if current is not None:
+        new_deadline = min(current, new_deadline)
+    token = _deadline.set(new_deadline)
+    try:
+        yield new_deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """현재 요청의 남은 시간(초)을 반환합니다. 마감 시간이 없으면 None입니다."""
+    current = _deadline.get()
+    if current is None:
+        return None
+    return current - time.monotonic()
+
+
+def error_status(error):
+    """예외에 담긴 HTTP 상태 코드를 반환합니다. 없으면 None입니다.
+
+    openai(`status_code`), httpx(`response.status_code`), pinecone(`status`) 예외를 지원합니다.
+    """
+    for status in (
+        getattr(error, 'status_code', None),
+        getattr(getattr(error, 'response', None), 'status_code', None),
+        getattr(error, 'status', None)
+    ):
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_retryable(error):
+    """다시 시도할 만한 일시적 오류인지 판단합니다. (`ResiliencePolicy`의 기본 `retry_on`)
+
+    제한 시간 초과, 연결 오류, HTTP 429/5xx 응답만 재시도합니다. 클라이언트 라이브러리의 예외는
+    import하지 않고 클래스 이름(…Timeout…, …Connect…)으로 구분합니다.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = error_status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return any(
+        'Timeout' in cls.__name__ or 'Connect' in cls.__name__
+        for cls in type(error).__mro__
+    )
+
+
+class LatencyWindow:
+    """최근 호출 지연 시간(초)을 보관하고 분위수를 계산합니다."""
+
+    def __init__(self, size=256):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def quantile(self, q):
+        with self._lock:
+            if not self._samples:
+                return None
+            samples = np.fromiter(self._samples, dtype=np.float64, count=len(self._samples))
+        return float(np.quantile(samples, q))
+
+
+class CircuitBreaker:
+    """연속 실패가 `failure_threshold`번 이어지면 `reset_seconds` 동안 호출을 바로 거절합니다.
+
+    시간이 지나면 시험 호출 하나만 허용하고(half-open), 성공하면 닫히고 실패하면 다시 열립니다.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.opens = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """호출을 허용하면 True를 반환합니다."""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """성공/실패를 판단할 수 없이 끝난 호출(호출한 쪽의 마감 시간 초과 등)을 알립니다. 상태는 그대로 둡니다."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or (self._opened_at is None and self._failures >= self.failure_threshold > 0):
+                self._opened_at = time.monotonic()
+                self.opens += 1
+            self._trial_in_flight = False
+
+
+class ResiliencePolicy:
+    """외부 호출 하나에 제한 시간, 재시도, 헤징, 서킷 브레이커를 적용합니다.
+
+    - 호출마다 `timeout`과 요청의 남은 시간 중 짧은 쪽을 제한 시간으로 사용합니다.
+    - 최근 지연 시간의 `hedge_quantile` 분위수(기본 p95)가 지나도 응답이 없으면 같은 요청을 한 번 더 보내고
+      먼저 끝난 응답을 사용합니다. (멱등 호출에만 사용)
+    - 실패하면 지수 백오프 + 전체 지터만큼 기다렸다가 최대 `retries`번 다시 시도합니다.
+      `retry_on(예외)`가 False인 오류(잘못된 요청 등)는 재시도하지 않고 바로 발생시키며,
+      서비스가 응답한 것이므로 서킷 브레이커의 실패로 세지 않습니다.
+    - 서킷 브레이커가 열려 있으면 호출하지 않고 `CircuitOpenError`를 발생시킵니다.
+    """
+
+    def __init__(self, name, timeout=10.0, retries=2, backoff_base=0.05, backoff_max=1.0,
+                 hedge=True, hedge_quantile=0.95, hedge_min_delay=0.01, hedge_min_samples=20,
+                 breaker=None, retry_on=is_retryable):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_on = retry_on
+        self.latency = LatencyWindow()
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'attempt_failures': 0,
+            'non_retryable': 0,
+            'retries': 0,
+            'timeouts': 0,
+            'deadline_exceeded': 0,
+            'rejected': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+            'hedge_saved_seconds': 0.0
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.stats[name] += value
+
+    def hedge_delay(self):
+        """헤지 요청을 보내기까지 기다릴 시간(초)입니다. 헤징을 하지 않으면 None입니다."""
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.latency.quantile(self.hedge_quantile), self.hedge_min_delay)
+
+    def _attempt_timeout(self):
+        """이번 시도의 제한 시간을 계산합니다. 요청 마감 시각이 지났으면 `DeadlineExceeded`를 발생시킵니다."""
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            self._count('deadline_exceeded')
+            raise DeadlineExceeded(f"{self.name}: 요청 마감 시간이 지났습니다.")
+        if remaining is None:
+            return self.timeout
+        return min(self.timeout, remaining) if self.timeout else remaining
+
+    def _deadline_limited(self, timeout):
+        """이번 시도의 제한 시간이 정책의 `timeout`보다 요청 마감 시간 때문에 짧아졌는지 여부입니다."""
+        return timeout is not None and (not self.timeout or timeout < self.timeout)
+
+    def _deadline_timeout(self):
+        """`_attempt_timeout`과 같지만, 마감 시각이 지났으면 실패 통계를 더한 뒤 `DeadlineExceeded`를 발생시킵니다."""
+        try:
+            return self._attempt_timeout()
+        except DeadlineExceeded:
+            self._count('failures')
+            raise
+
+    def _backoff(self, attempt):
+        """다음 재시도까지 기다릴 시간(초)입니다. (지수 백오프 + 전체 지터)"""
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _track(self, started):
+        """시도가 끝나면 지연 시간을 기록하는 콜백을 만듭니다."""
+        def record(future):
+            if not future.cancelled() and future.exception() is None:
+                self.latency.add(time.perf_counter() - started)
+        return record
+
+    def _record_saved(self, won_at):
+        """헤지 요청이 이겼을 때, 원래 요청이 끝난 시각과의 차이를 절약한 시간으로 기록합니다."""
+        def record(future):
+            if not future.cancelled():
+                self._count('hedge_saved_seconds', max(time.perf_counter() - won_at, 0.0))
+        return record
+
+    def _start(self, func, args, kwargs):
+        context = contextvars.copy_context()
+        started = time.perf_counter()
+        future = get_executor().submit(context.run, func, *args, **kwargs)
+        future.add_done_callback(self._track(started))
+        return future
+
+    def _attempt(self, func, args, kwargs, timeout):
+        """한 번 시도합니다. 응답이 늦으면 헤지 요청을 보내고 먼저 성공한 결과를 반환합니다."""
+        started = time.perf_counter()
+        ends_at = started + timeout if timeout else None
+        primary = self._start(func, args, kwargs)
+        pending = {primary}
+
+        delay = self.hedge_delay()
+        if delay is not None and (ends_at is None or started + delay < ends_at):
+            done, _ = wait(pending, timeout=delay)
+            if not done:
+                pending.add(self._start(func, args, kwargs))
+                self._count('hedges')
+
+        error = None
+        while pending:
+            wait_seconds = None if ends_at is None else max(ends_at - time.perf_counter(), 0.0)
+            done, pending = wait(pending, timeout=wait_seconds, return_when=FIRST_COMPLETED)
+            if not done:
+                # 아직 시작하지 않은 호출은 취소하고, 스레드에서 실행 중인 호출은 결과를 버립니다.
+                for future in pending:
+                    future.cancel()
+                self._count('timeouts')
+                raise TimeoutError(f"{self.name}: {timeout:.3f}초 안에 응답이 없습니다.")
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count('hedge_wins')
+                        primary.add_done_callback(self._record_saved(time.perf_counter()))
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, func, *args, **kwargs):
+        """`func(*args, **kwargs)`를 정책에 따라 실행하고 결과를 반환합니다."""
+        self._count('calls')
+        # 요청 마감 시각이 이미 지났으면 호출하지 않습니다. (호출한 쪽의 문제이므로 브레이커와 무관)
+        timeout = self._deadline_timeout()
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError(f"{self.name}: 서킷 브레이커가 열려 있습니다.")
+
+        attempt = 0
+        while True:
+            try:
+                result = self._attempt(func, args, kwargs, timeout)
+            except DeadlineExceeded:
+                # 안쪽 호출의 요청 마감 시간 초과도 이 서비스의 실패로 세지 않습니다.
+                self.breaker.release()
+                self._count('failures')
+                raise
+            except Exception as e:
+                if isinstance(e, TimeoutError) and self._deadline_limited(timeout):
+                    # 요청 마감 시간 때문에 짧아진 제한 시간을 넘긴 것은 서비스의 실패로 세지 않습니다.
+                    self.breaker.release()
+                    self._count('failures')
+                    raise
+                if not self.retry_on(e):
+                    # 서비스는 응답했으므로 브레이커에는 성공으로 알립니다. (half-open 시험 호출도 끝냄)
+                    self.breaker.record_success()
+                    self._count('non_retryable')
+                    self._count('failures')
+                    raise
+                self.breaker.record_failure()
+                self._count('attempt_failures')
+                if not self._should_retry(attempt):
+                    self._count('failures')
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                self._count('retries')
+                timeout = self._deadline_timeout()
+                continue
+            self.breaker.record_success()
+            self._count('successes')
+            return result
+
+    def _should_retry(self, attempt):
+        """재시도 횟수, 서킷 상태, 남은 시간을 보고 다시 시도할지 정합니다."""
+        if attempt >= self.retries or self.breaker.state == 'open':
+            return False
+        remaining = remaining_time()
+        return remaining is None or remaining > self.backoff_base
+
+    async def _aattempt(self, func, args, kwargs, timeout):
+        """`_attempt`의 비동기 버전입니다. 진 쪽 요청은 끝날 때까지 두고 절약한 시간을 기록합니다."""
+        started = time.perf_counter()
+        ends_at = started + timeout if timeout else None
+
+        def start():
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            task.add_done_callback(self._track(time.perf_counter()))
+            return task
+
+        primary = start()
+        pending = {primary}
+
+        delay = self.hedge_delay()
+        if delay is not None and (ends_at is None or started + delay < ends_at):
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                pending.add(start())
+                self._count('hedges')
+
+        error = None
+        while pending:
+            wait_seconds = None if ends_at is None else max(ends_at - time.perf_counter(), 0.0)
+            done, pending = await asyncio.wait(pending, timeout=wait_seconds, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                for task in pending:
+                    task.cancel()
+                self._count('timeouts')
+                raise TimeoutError(f"{self.name}: {timeout:.3f}초 안에 응답이 없습니다.")
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        self._count('hedge_wins')
+                        primary.add_done_callback(self._record_saved(time.perf_counter()))
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def acall(self, func, *args, **kwargs):
+        """`call`의 비동기 버전입니다. `func`는 코루틴 함수입니다."""
+        self._count('calls')
+        # 요청 마감 시각이 이미 지났으면 호출하지 않습니다. (호출한 쪽의 문제이므로 브레이커와 무관)
+        timeout = self._deadline_timeout()
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError(f"{self.name}: 서킷 브레이커가 열려 있습니다.")
+
+        attempt = 0
+        while True:
+            try:
+                result = await self._aattempt(func, args, kwargs, timeout)
+            except DeadlineExceeded:
+                # 안쪽 호출의 요청 마감 시간 초과도 이 서비스의 실패로 세지 않습니다.
+                self.breaker.release()
+                self._count('failures')
+                raise
+            except Exception as e:
+                if isinstance(e, TimeoutError) and self._deadline_limited(timeout):
+                    # 요청 마감 시간 때문에 짧아진 제한 시간을 넘긴 것은 서비스의 실패로 세지 않습니다.
+                    self.breaker.release()
+                    self._count('failures')
+                    raise
+                if not self.retry_on(e):
+                    # 서비스는 응답했으므로 브레이커에는 성공으로 알립니다. (half-open 시험 호출도 끝냄)
+                    self.breaker.record_success()
+                    self._count('non_retryable')
+                    self._count('failures')
+                    raise
+                self.breaker.record_failure()
+                self._count('attempt_failures')
+                if not self._should_retry(attempt):
+                    self._count('failures')
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                self._count('retries')
+                timeout = self._deadline_timeout()
+                continue
+            self.breaker.record_success()
+            self._count('successes')
+            return result
+
+    def get_stats(self):
+        """호출/재시도/헤징 통계와 현재 지연 시간 분위수, 서킷 상태를 반환합니다."""
+        with self._lock:
+            stats = dict(self.stats)
+        saved = stats.pop('hedge_saved_seconds')
+        stats['hedge_saved_ms'] = round(saved * 1000, 3)
+        stats['hedge_win_rate'] = stats['hedge_wins'] / stats['hedges'] if stats['hedges'] else 0.0
+        p50 = self.latency.quantile(0.5)
+        p95 = self.latency.quantile(self.hedge_quantile)
+        stats['latency_p50_ms'] = round(p50 * 1000, 3) if p50 is not None else None
+        stats['latency_p95_ms'] = round(p95 * 1000, 3) if p95 is not None else None
+        stats['circuit'] = self.breaker.state
+        stats['circuit_opens'] = self.breaker.opens
+        return stats
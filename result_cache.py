@@ -0,0 +1,113 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+from embedding_cache import normalize_text
+from result_model import deep_sizeof
+
+
+def make_result_key(query, top_k):
+    """정규화된 쿼리와 top_k로 결과 캐시 키를 만듭니다."""
+    return (normalize_text(query).lower(), int(top_k))
+
+
+class ResultCache:
+    """검색 결과 전체를 저장하는 TTL + LRU 캐시입니다.
+
+    항목은 저장할 때의 인덱스 버전과 함께 보관되며, 조회할 때 버전이 다르면
+    (카탈로그가 다시 적재되었으면) 만료된 것으로 보고 버립니다.
+    `max_entries`가 0이면 캐시를 사용하지 않습니다.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'expirations': 0,
+            'stale': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'writes': 0
+        }
+
+    def get(self, key, versions=None):
+        """캐시된 결과의 복사본을 반환합니다. 없거나 만료되었으면 None을 반환합니다."""
+        if self.max_entries <= 0:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            stored_at, stored_versions, value = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            if stored_versions != versions:
+                del self._entries[key]
+                self.stats['stale'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+
+        # 호출한 쪽에서 결과를 수정해도 캐시가 바뀌지 않도록 복사해서 반환합니다.
+        return copy.deepcopy(value)
+
+    def put(self, key, value, versions=None):
+        """결과를 저장하고, 용량을 넘으면 가장 오래 사용되지 않은 항목을 제거합니다."""
+        if self.max_entries <= 0:
+            return
+
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.time(), versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+            self.stats['writes'] += 1
+
+    def invalidate(self):
+        """모든 항목을 제거합니다. (카탈로그 재적재 시)"""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self.stats['invalidations'] += 1
+        return removed
+
+    def __len__(self):
+        return len(self._entries)
+
+    def memory_usage(self):
+        """캐시된 결과가 차지하는 메모리(바이트)를 대략 계산합니다. 항목 사이에 공유된 레코드는 한 번만 셉니다.
+
+        모든 항목을 순회하므로 통계 보고용으로만 사용합니다.
+        """
+        with self._lock:
+            values = [value for _, _, value in self._entries.values()]
+        seen = set()
+        total = sum(deep_sizeof(value, seen) for value in values)
+        return {
+            'memory_bytes': total,
+            'bytes_per_entry': total / len(values) if values else 0.0
+        }
+
+    def get_stats(self):
+        """캐시 적중/실패/제거 통계를 반환합니다."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,274 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 화면(app.py, print_search_results)에 표시하는 필드만 결과에 남깁니다.
+PRODUCT_DISPLAY_FIELDS = ('product_name', 'brand', 'price', 'image_url', 'product_url')
+BRAND_DISPLAY_FIELDS = (
+    'brand_name_en', 'brand_name_ko', 'country_of_origin', 'main_category', 'sub_category',
+    'price_range', 'brand_description', 'target_customers'
+)
+
+
+class FrozenRecord(dict):
+    """읽기 전용 메타데이터 딕셔너리입니다.
+
+    여러 결과와 캐시 항목이 같은 객체를 참조로 공유하므로 수정할 수 없고,
+    `copy.deepcopy`도 새 객체를 만들지 않고 자기 자신을 반환합니다.
+    일반 딕셔너리와 같이 읽을 수 있고 JSON으로 그대로 직렬화됩니다.
+    """
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenRecord는 수정할 수 없습니다. copy()로 복사한 뒤 수정하세요.")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = __ior__ = _readonly
+
+    def copy(self):
+        """수정 가능한 일반 딕셔너리 복사본을 반환합니다."""
+        return dict(self)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenRecord, (dict(self),))
+
+
+class RecordInterner:
+    """표시 필드만 남긴 메타데이터를 내용별로 하나의 `FrozenRecord`로 공유합니다.
+
+    같은 내용의 레코드는 세션, 결과 캐시 항목과 관계없이 같은 객체를 참조합니다.
+    `fields`가 비어 있으면 모든 필드를 남깁니다. 최근 사용한 `max_entries`개까지 보관합니다.
+    """
+
+    def __init__(self, fields=(), max_entries=100000):
+        self.fields = tuple(fields)
+        self.max_entries = max_entries
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'unhashable': 0}
+
+    def project(self, metadata):
+        """표시 필드만 남긴 (필드, 값) 튜플을 만듭니다."""
+        if self.fields:
+            return tuple((field, metadata[field]) for field in self.fields if field in metadata)
+        return tuple(sorted(metadata.items()))
+
+    def intern(self, metadata):
+        """메타데이터의 공유 레코드를 반환합니다."""
+        if metadata is None:
+            return None
+        if isinstance(metadata, FrozenRecord) and (not self.fields or set(metadata) <= set(self.fields)):
+            return metadata
+
+        items = self.project(metadata)
+        try:
+            hash(items)
+        except TypeError:
+            # 목록 등 해시할 수 없는 값이 있으면 공유하지 않고 읽기 전용 사본만 만듭니다.
+            self.stats['unhashable'] += 1
+            return FrozenRecord(items)
+
+        with self._lock:
+            record = self._records.get(items)
+            if record is not None:
+                self._records.move_to_end(items)
+                self.stats['hits'] += 1
+                return record
+            record = FrozenRecord(items)
+            self._records[items] = record
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+            self.stats['misses'] += 1
+            return record
+
+    def __len__(self):
+        return len(self._records)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['records'] = len(self._records)
+        return stats
+
+
+class ProductHit:
+    """상품 검색 결과 하나입니다.
+
+    슬롯 객체라 결과마다 딕셔너리를 만들지 않으며, `metadata`와 `brand_info`는 공유 레코드를 참조합니다.
+    기존 결과 딕셔너리처럼 `result['score']`, `'brand_info' in result`, `result.get(...)`, `result.copy()`로
+    사용할 수 있습니다. 선택 필드(brand_info, query_brand, degraded)는 값이 있을 때만 키로 보입니다.
+    """
+    __slots__ = ('id', 'score', 'vector_score', 'keyword_score', 'metadata', 'brand_info', 'query_brand', 'degraded')
+
+    OPTIONAL_FIELDS = ('brand_info', 'query_brand', 'degraded')
+
+    def __init__(self, id, score=0.0, vector_score=0.0, keyword_score=0.0, metadata=None,
+                 brand_info=None, query_brand=None, degraded=None):
+        self.id = id
+        self.score = score
+        self.vector_score = vector_score
+        self.keyword_score = keyword_score
+        self.metadata = metadata if metadata is not None else FrozenRecord()
+        self.brand_info = brand_info
+        self.query_brand = query_brand
+        self.degraded = degraded
+
+    def keys(self):
+        return [field for field in self.__slots__ if field not in self.OPTIONAL_FIELDS or getattr(self, field) is not None]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __contains__(self, key):
+        return key in self.__slots__ and (key not in self.OPTIONAL_FIELDS or getattr(self, key) is not None)
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(f"ProductHit에 없는 필드입니다: {key}")
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self else default
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def copy(self):
+        """얕은 복사본을 반환합니다. 공유 레코드는 그대로 참조합니다."""
+        return ProductHit(
+            self.id, self.score, self.vector_score, self.keyword_score, self.metadata,
+            self.brand_info, self.query_brand, self.degraded
+        )
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        # 공유 레코드(FrozenRecord)는 복사하지 않습니다.
+        import copy
+        hit = self.copy()
+        if not isinstance(hit.metadata, FrozenRecord):
+            hit.metadata = copy.deepcopy(hit.metadata, memo)
+        if hit.brand_info is not None and not isinstance(hit.brand_info, FrozenRecord):
+            hit.brand_info = copy.deepcopy(hit.brand_info, memo)
+        return hit
+
+    def __reduce__(self):
+        return (ProductHit, tuple(getattr(self, field) for field in self.__slots__))
+
+    def __eq__(self, other):
+        if isinstance(other, ProductHit):
+            return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def to_dict(self):
+        """일반 딕셔너리로 변환합니다. (JSON 응답 등)"""
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"ProductHit({self.to_dict()!r})"
+
+
+class ResultPage:
+    """캐시에 저장하는 상품 검색 결과 목록입니다.
+
+    결과마다 객체를 두지 않고 열(column)별로 저장합니다. 점수는 하나의 배열에, 메타데이터와 브랜드 정보는
+    공유 레코드의 참조 튜플에 담기며, 모든 결과에 없는 선택 필드는 저장하지 않습니다.
+    수정할 수 없으므로 `copy.deepcopy`는 자기 자신을 반환하고, `to_hits()`로 새 `ProductHit` 목록을 만듭니다.
+    """
+    __slots__ = ('ids', 'scores', 'metadata', 'brand_info', 'query_brand', 'degraded')
+
+    def __init__(self, ids, scores, metadata, brand_info=None, query_brand=None, degraded=None):
+        self.ids = ids
+        self.scores = scores
+        self.metadata = metadata
+        self.brand_info = brand_info
+        self.query_brand = query_brand
+        self.degraded = degraded
+
+    @classmethod
+    def from_hits(cls, hits):
+        """결과 목록(ProductHit 또는 결과 딕셔너리)으로 페이지를 만듭니다."""
+        hits = list(hits)
+        scores = np.array(
+            [(hit['score'], hit.get('vector_score', 0.0), hit.get('keyword_score', 0.0)) for hit in hits],
+            dtype=np.float64
+        ).reshape(len(hits), 3)
+        columns = {}
+        for field in ProductHit.OPTIONAL_FIELDS:
+            values = tuple(hit.get(field) for hit in hits)
+            columns[field] = values if any(value is not None for value in values) else None
+        return cls(
+            tuple(hit['id'] for hit in hits),
+            scores,
+            tuple(hit.get('metadata') for hit in hits),
+            **columns
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        """슬라이스는 같은 배열을 참조하는 페이지를, 정수는 해당 위치의 `ProductHit`을 반환합니다."""
+        if isinstance(index, slice):
+            return ResultPage(*(
+                None if column is None else column[index]
+                for column in (self.ids, self.scores, self.metadata, self.brand_info, self.query_brand, self.degraded)
+            ))
+        score, vector_score, keyword_score = self.scores[index].tolist()
+        return ProductHit(
+            self.ids[index], score, vector_score, keyword_score, self.metadata[index],
+            *(None if column is None else column[index] for column in (self.brand_info, self.query_brand, self.degraded))
+        )
+
+    def to_hits(self):
+        """새 `ProductHit` 목록을 반환합니다. 호출한 쪽에서 자유롭게 수정할 수 있습니다."""
+        return [self[position] for position in range(len(self.ids))]
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def to_jsonable(value):
+    """`json.dumps(default=...)`에 넘길 변환 함수입니다. ProductHit을 딕셔너리로 바꿉니다."""
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    return str(value)
+
+
+def deep_sizeof(value, seen=None):
+    """객체가 참조하는 전체 메모리(바이트)를 대략 계산합니다. 여러 번 참조된 객체는 한 번만 셉니다."""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in value)
+    elif hasattr(value, '__slots__'):
+        size += sum(deep_sizeof(getattr(value, field, None), seen) for field in value.__slots__)
+    return size
@@ -1 +1,20 @@
-streamlit run app.py
+#!/bin/sh
+# 사용법: ./run.sh [app|server|ingest|brand-graph|benchmark|test] [인자...]
+# 인자가 없으면 Streamlit 앱을 실행합니다. 각 도구의 옵션은 README.md의 "실행 방법과 설정"을 참고하세요.
+set -e
+
+command="${1:-app}"
+[ $# -gt 0 ] && shift
+
+case "$command" in
+    app) exec streamlit run app.py "$@" ;;
+    server) exec python server.py "$@" ;;
+    ingest) exec python ingest.py "$@" ;;
+    brand-graph) exec python brand_graph.py "$@" ;;
+    benchmark) exec python benchmark.py "$@" ;;
+    test) exec python -m pytest -q tests "$@" ;;
+    *)
+        echo "알 수 없는 명령입니다: $command (app, server, ingest, brand-graph, benchmark, test)" >&2
+        exit 1
+        ;;
+esac
@@ -0,0 +1,224 @@
+import os
+import time
+import asyncio
+import threading
+
+from vector_store import LocalVectorIndex
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+
+# HTTP 연결 풀 설정 (OpenAI는 httpx, Pinecone은 urllib3 스레드 풀 사용)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "16"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+PINECONE_POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "8"))
+
+
+def get_secret(name):
+    """Streamlit secrets 또는 환경 변수에서 설정 값을 읽습니다. 없으면 None을 반환합니다."""
+    try:
+        import streamlit as st
+        return st.secrets[name]
+    except Exception:
+        return os.getenv(name)
+
+
+class SearchEngine:
+    """검색에 필요한 외부 클라이언트와 인덱스 핸들을 소유하는 리소스 객체입니다.
+
+    클라이언트는 처음 사용할 때 생성되며(langchain/pinecone import도 이때 수행),
+    인덱스 핸들과 HTTP 연결 풀은 엔진이 살아 있는 동안 재사용됩니다.
+    Streamlit에서는 `st.cache_resource`로 하나의 엔진을 모든 세션이 공유합니다.
+    """
+
+    def __init__(self, vector_backend="pinecone", local_index_dir="local_index",
+                 embedding_cache_path=None, embedding_cache_size=10000, embedding_cache_disk_entries=None,
+                 llm_model="gpt-4o", llm_temperature=0.2,
+                 embedding_model=None, chat_model=None, index_factory=None):
+        self.vector_backend = vector_backend
+        self.local_index_dir = local_index_dir
+        self.embedding_cache_path = embedding_cache_path
+        self.embedding_cache_size = embedding_cache_size
+        self.embedding_cache_disk_entries = embedding_cache_disk_entries
+        self.llm_model = llm_model
+        self.llm_temperature = llm_temperature
+        self.created_at = time.time()
+
+        self._embeddings = self._cached(embedding_model) if embedding_model is not None else None
+        self._llm = chat_model
+        self._index_factory = index_factory
+        self._pinecone = None
+        self._http_client = None
+        self._async_http_client = None
+        self._indexes = {}
+        self._index_generations = {}
+        self._lock = threading.RLock()
+
+    def _http_clients(self):
+        """OpenAI 클라이언트가 공유할 httpx 연결 풀을 반환합니다."""
+        if self._http_client is None:
+            import httpx
+            limits = httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS
+            )
+            self._http_client = httpx.Client(limits=limits, timeout=HTTP_TIMEOUT_SECONDS)
+            self._async_http_client = httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT_SECONDS)
+        return self._http_client, self._async_http_client
+
+    def _openai_options(self):
+        """OpenAI 기반 langchain 모델 생성 인자를 만듭니다."""
+        http_client, async_http_client = self._http_clients()
+        options = {'http_client': http_client, 'http_async_client': async_http_client}
+        api_key = get_secret("OPENAI_API_KEY")
+        if api_key:
+            options['api_key'] = api_key
+        return options
+
+    @property
+    def embeddings(self):
+        """캐시가 적용된 임베딩 모델입니다."""
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    from langchain_openai import OpenAIEmbeddings
+
+                    self._embeddings = self._cached(OpenAIEmbeddings(**self._openai_options()))
+        return self._embeddings
+
+    def _cached(self, embedding_model):
+        """임베딩 모델을 `CachedEmbeddings`로 감쌉니다. 이미 감싼 모델은 그대로 반환합니다.
+
+        검색 경로는 `embed_query(text, call=...)`처럼 캐시 래퍼의 인자를 사용하므로
+        주입된 모델도 항상 래퍼를 거치게 합니다.
+        """
+        if isinstance(embedding_model, CachedEmbeddings):
+            return embedding_model
+        cache = EmbeddingCache(
+            self.embedding_cache_path,
+            max_entries=self.embedding_cache_size,
+            max_disk_entries=self.embedding_cache_disk_entries
+        )
+        cache.warm_up()
+        return CachedEmbeddings(embedding_model, cache)
+
+    @property
+    def llm(self):
+        """브랜드 추출에 사용하는 LLM입니다."""
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    from langchain_openai import ChatOpenAI
+
+                    self._llm = ChatOpenAI(
+                        temperature=self.llm_temperature,
+                        model=self.llm_model,
+                        **self._openai_options()
+                    )
+        return self._llm
+
+    @property
+    def pinecone(self):
+        """Pinecone 클라이언트입니다."""
+        if self._pinecone is None:
+            with self._lock:
+                if self._pinecone is None:
+                    from pinecone import Pinecone
+
+                    self._pinecone = Pinecone(api_key=get_secret("PINECONE_API_KEY"), pool_threads=PINECONE_POOL_THREADS)
+        return self._pinecone
+
+    def index(self, index_name):
+        """인덱스 핸들을 반환합니다. 한 번 만든 핸들은 캐시해 재사용합니다."""
+        handle = self._indexes.get(index_name)
+        if handle is not None:
+            return handle
+
+        with self._lock:
+            handle = self._indexes.get(index_name)
+            if handle is None:
+                if self._index_factory is not None:
+                    handle = self._index_factory(index_name)
+                elif self.vector_backend == "local":
+                    handle = LocalVectorIndex.load(os.path.join(self.local_index_dir, index_name))
+                else:
+                    handle = self.pinecone.Index(index_name, pool_threads=PINECONE_POOL_THREADS)
+                self._indexes[index_name] = handle
+        return handle
+
+    def index_version(self, index_name):
+        """인덱스 내용의 버전을 반환합니다.
+
+        명시적 무효화 횟수와, 인덱스가 제공하는 경우 인덱스 자체의 변경 버전을 합친 값입니다.
+        Pinecone처럼 변경 버전을 알 수 없는 인덱스는 `invalidate_index`로만 바뀝니다.
+        """
+        handle = self._indexes.get(index_name)
+        return (self._index_generations.get(index_name, 0), getattr(handle, 'version', None))
+
+    def invalidate_index(self, index_name=None):
+        """카탈로그가 다시 적재되었음을 알립니다. 이름이 없으면 모든 인덱스를 무효화합니다."""
+        with self._lock:
+            names = [index_name] if index_name else set(self._indexes) | set(self._index_generations)
+            for name in names:
+                self._index_generations[name] = self._index_generations.get(name, 0) + 1
+
+    @property
+    def has_local_records(self):
+        """인덱스가 전체 레코드를 직접 제공하는지(로컬/주입된 인덱스) 여부입니다."""
+        return self.vector_backend == "local" or self._index_factory is not None
+
+    def configure(self, embedding_model=None, chat_model=None, index_factory=None):
+        """임베딩 모델, LLM, 인덱스 백엔드를 교체합니다. 임베딩 모델은 캐시 래퍼로 감싸서 사용합니다."""
+        with self._lock:
+            if embedding_model is not None:
+                self._embeddings = self._cached(embedding_model)
+            if chat_model is not None:
+                self._llm = chat_model
+            if index_factory is not None:
+                self._index_factory = index_factory
+                self._indexes = {}
+
+    def status(self):
+        """어떤 리소스가 생성되었는지 반환합니다."""
+        return {
+            'vector_backend': self.vector_backend,
+            'embeddings': self._embeddings is not None,
+            'llm': self._llm is not None,
+            'pinecone': self._pinecone is not None,
+            'indexes': sorted(self._indexes),
+            'index_versions': {name: self.index_version(name) for name in sorted(self._indexes)},
+            'uptime_seconds': round(time.time() - self.created_at, 3)
+        }
+
+    def _release(self):
+        # 연결 풀 참조를 떼어 내고 임베딩 캐시의 대기 중인 쓰기를 기록합니다. 닫을 비동기 클라이언트를 반환합니다.
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+            async_http_client, self._async_http_client = self._async_http_client, None
+            cache = getattr(self._embeddings, 'cache', None)
+        if cache is not None:
+            cache.flush()
+        return async_http_client
+
+    def close(self):
+        """HTTP 연결 풀을 닫습니다.
+
+        이벤트 루프 안에서 호출하면 비동기 연결 풀은 그 루프에서 닫히도록 예약만 하므로,
+        비동기 코드에서는 `aclose()`를 사용하세요.
+        """
+        async_http_client = self._release()
+        if async_http_client is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(async_http_client.aclose())
+        else:
+            loop.create_task(async_http_client.aclose())
+
+    async def aclose(self):
+        """HTTP 연결 풀을 닫습니다. (비동기 연결 풀은 현재 이벤트 루프에서 닫을 때까지 기다림)"""
+        async_http_client = self._release()
+        if async_http_client is not None:
+            await async_http_client.aclose()
@@ -0,0 +1,132 @@
+import copy
+import time
+import threading
+
+import numpy as np
+
+
+class SemanticCache:
+    """의미가 거의 같은 쿼리의 검색 후보를 재사용하는 캐시입니다.
+
+    이전에 처리한 쿼리 벡터를 고정 크기 float32 행렬에 정규화해 보관하고,
+    새 쿼리 벡터와의 코사인 유사도가 `threshold` 이상인 가장 가까운 항목의 값을 반환합니다.
+    항목 수가 수천 개 수준이므로 행렬 곱 한 번으로 최근접 항목을 찾으며,
+    메모리는 `max_entries * 차원 * 4` 바이트로 제한됩니다. 가득 차면 가장 오래 사용되지 않은 항목을 교체합니다.
+    `max_entries`가 0이면 캐시를 사용하지 않습니다.
+    """
+
+    def __init__(self, max_entries=1000, threshold=0.98, ttl_seconds=600):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._vectors = None
+        self._values = [None] * max(max_entries, 0)
+        self._last_used = np.zeros(max(max_entries, 0), dtype=np.float64)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'evictions': 0,
+            'writes': 0,
+            'similarity_sum': 0.0
+        }
+
+    @staticmethod
+    def _prepare(vector):
+        """코사인 유사도 계산을 위해 벡터를 정규화합니다."""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _nearest(self, vector, top_k, versions):
+        """조건(top_k, 버전, TTL)에 맞는 가장 가까운 항목의 위치와 유사도를 찾습니다."""
+        similarities = self._vectors[:self._size] @ vector
+        now = time.time()
+        for position in np.argsort(-similarities, kind='stable'):
+            similarity = float(similarities[position])
+            if similarity < self.threshold:
+                break
+            stored_at, stored_top_k, stored_versions, _ = self._values[position]
+            if stored_versions != versions or (self.ttl_seconds and now - stored_at > self.ttl_seconds):
+                # 인덱스가 바뀌었거나 만료된 항목은 다음 교체 대상이 되도록 표시
+                self._last_used[position] = 0
+                self.stats['stale'] += 1
+                continue
+            if stored_top_k >= top_k:
+                return int(position), similarity
+        return None, None
+
+    def get(self, vector, top_k, versions=None):
+        """가장 가까운 쿼리의 값(상위 `top_k`개)과 유사도를 반환합니다. 없으면 (None, None)입니다."""
+        if self.max_entries <= 0:
+            return None, None
+
+        vector = self._prepare(vector)
+        with self._lock:
+            if self._size == 0 or self._vectors.shape[1] != len(vector):
+                self.stats['misses'] += 1
+                return None, None
+
+            position, similarity = self._nearest(vector, top_k, versions)
+            if position is None:
+                self.stats['misses'] += 1
+                return None, None
+
+            self._last_used[position] = time.time()
+            self.stats['hits'] += 1
+            self.stats['similarity_sum'] += similarity
+            value = self._values[position][3]
+
+        return copy.deepcopy(value[:top_k]), similarity
+
+    def put(self, vector, top_k, value, versions=None):
+        """쿼리 벡터와 값을 저장합니다."""
+        if self.max_entries <= 0:
+            return
+
+        vector = self._prepare(vector)
+        value = copy.deepcopy(value)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._values = [None] * self.max_entries
+                self._last_used[:] = 0
+                self._size = 0
+
+            if self._size < self.max_entries:
+                position = self._size
+                self._size += 1
+            else:
+                position = int(np.argmin(self._last_used))
+                self.stats['evictions'] += 1
+
+            self._vectors[position] = vector
+            self._values[position] = (time.time(), top_k, versions, value)
+            self._last_used[position] = time.time()
+            self.stats['writes'] += 1
+
+    def invalidate(self):
+        """모든 항목을 제거합니다."""
+        with self._lock:
+            removed = self._size
+            self._size = 0
+            self._values = [None] * max(self.max_entries, 0)
+            self._last_used[:] = 0
+        return removed
+
+    def __len__(self):
+        return self._size
+
+    def get_stats(self):
+        """캐시 적중률, 평균 적중 유사도, 메모리 사용량을 반환합니다."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = self._size
+            stats['memory_bytes'] = int(self._vectors.nbytes) if self._vectors is not None else 0
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['avg_hit_similarity'] = stats['similarity_sum'] / stats['hits'] if stats['hits'] else None
+        del stats['similarity_sum']
+        return stats
@@ -0,0 +1,354 @@
+"""hybrid_search를 HTTP로 제공하는 asyncio 서비스입니다.
+
+HTTP 처리(요청 파싱, keep-alive, chunked 본문, 크기 제한)는 `aiohttp.web`이 맡고,
+여러 워커 프로세스가 SO_REUSEPORT로 같은 포트를 나눠 받습니다.
+같은 요청(정규화한 쿼리와 top_k 기준)이 처리 중이면 새로 실행하지 않고 진행 중인 결과를 함께 받습니다.
+
+엔드포인트:
+    GET  /health
+    GET  /metrics         Prometheus 텍스트 형식 지표 (이 워커 프로세스의 값)
+    GET  /search?q=<쿼리>&top_k=5[&trace=1]
+    GET  /similar-brands?brand=<브랜드>&top_k=3
+    POST /enrich          {"results": [{"metadata": {"brand": ...}}, ...]}
+
+사용 예:
+    python server.py --port 8080 --workers 4
+    python server.py --stub --stub-latency 50,150   # 가짜 백엔드 (외부 서비스 없이 테스트)
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import multiprocessing
+
+from aiohttp import web
+
+import hybrid_search
+from concurrency import run_in_thread
+from result_cache import make_result_key
+from result_model import to_jsonable
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+# 서버 설정
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+# 워커 하나에서 동시에 실행할 검색 파이프라인 수 (넘으면 대기)
+SERVER_MAX_IN_FLIGHT = int(os.getenv("SERVER_MAX_IN_FLIGHT", "64"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("SERVER_REQUEST_TIMEOUT", "30"))
+KEEP_ALIVE_SECONDS = float(os.getenv("SERVER_KEEP_ALIVE_SECONDS", "15"))
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 4 * 1024 * 1024
+MAX_TOP_K = 50
+# /enrich 요청 하나에 넣을 수 있는 최대 상품 수
+MAX_ENRICH_RESULTS = int(os.getenv("SERVER_MAX_ENRICH_RESULTS", "100"))
+JSON_CONTENT_TYPE = "application/json"
+
+
+class HttpError(Exception):
+    """HTTP 오류 응답으로 변환되는 예외입니다."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SingleFlight:
+    """같은 키의 작업이 실행 중이면 새로 실행하지 않고 진행 중인 작업의 결과를 함께 받습니다.
+
+    먼저 들어온 요청만 작업을 실행하고, 나머지는 같은 Task를 기다립니다.
+    기다리던 요청이 취소되거나 시간이 초과되어도 공유 작업은 계속 실행됩니다. (`asyncio.shield`)
+    이벤트 루프(워커 프로세스) 하나 안에서만 합쳐집니다.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.stats = {'executions': 0, 'coalesced': 0}
+
+    async def run(self, key, func):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self.stats['executions'] += 1
+        else:
+            self.stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['in_flight'] = len(self._tasks)
+        requests = stats['executions'] + stats['coalesced']
+        stats['coalesced_rate'] = stats['coalesced'] / requests if requests else 0.0
+        return stats
+
+
+def encode_json(payload):
+    """응답 본문을 JSON 바이트로 변환합니다."""
+    return json.dumps(payload, ensure_ascii=False, default=to_jsonable).encode('utf-8')
+
+
+def json_response(body, status=200):
+    """인코딩된 JSON 바이트로 응답을 만듭니다."""
+    return web.Response(body=body, status=status, content_type=JSON_CONTENT_TYPE, charset='utf-8')
+
+
+def error_response(status, message):
+    return json_response(encode_json({'error': message}), status)
+
+
+def _int_param(params, name, default, maximum=None):
+    value = params.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HttpError(400, f"{name}은(는) 정수여야 합니다.")
+    if value < 1 or (maximum is not None and value > maximum):
+        raise HttpError(400, f"{name}은(는) 1 이상 {maximum} 이하여야 합니다.")
+    return value
+
+
+def _text_param(params, name):
+    value = (params.get(name) or '').strip()
+    if not value:
+        raise HttpError(400, f"{name} 파라미터가 필요합니다.")
+    return value
+
+
+def _enrich_results(payload):
+    """/enrich 요청 본문에서 상품 목록을 꺼내 형식을 검사합니다."""
+    results = payload.get('results') if isinstance(payload, dict) else payload
+    if not isinstance(results, list):
+        raise HttpError(400, "results는 상품 객체의 목록이어야 합니다.")
+    if len(results) > MAX_ENRICH_RESULTS:
+        raise HttpError(400, f"results는 {MAX_ENRICH_RESULTS}개 이하여야 합니다.")
+    for position, result in enumerate(results):
+        if not isinstance(result, dict):
+            raise HttpError(400, f"results[{position}]는 객체여야 합니다.")
+        metadata = result.setdefault('metadata', {})
+        if not isinstance(metadata, dict):
+            raise HttpError(400, f"results[{position}].metadata는 객체여야 합니다.")
+        if not isinstance(metadata.get('brand', ''), str):
+            raise HttpError(400, f"results[{position}].metadata.brand는 문자열이어야 합니다.")
+    return results
+
+
+class SearchService:
+    """요청 경로를 검색 함수에 연결하고 워커의 요청 통계를 관리합니다."""
+
+    def __init__(self, max_in_flight=SERVER_MAX_IN_FLIGHT, request_timeout=REQUEST_TIMEOUT_SECONDS):
+        self.request_timeout = request_timeout
+        self.single_flight = SingleFlight()
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.started_at = time.time()
+        self.stats = {'requests': 0, 'errors': 0, 'timeouts': 0}
+
+    def make_app(self):
+        """라우트와 오류 처리 미들웨어를 등록한 aiohttp 애플리케이션을 만듭니다."""
+        app = web.Application(middlewares=[self.error_middleware], client_max_size=MAX_BODY_BYTES)
+        app.router.add_get('/health', self.health, allow_head=False)
+        app.router.add_get('/metrics', self.metrics, allow_head=False)
+        app.router.add_get('/search', self.search, allow_head=False)
+        app.router.add_get('/similar-brands', self.similar_brands, allow_head=False)
+        app.router.add_post('/enrich', self.enrich)
+        return app
+
+    @web.middleware
+    async def error_middleware(self, request, handler):
+        """요청 수/제한 시간을 관리하고, 모든 오류를 JSON 오류 응답으로 바꿉니다.
+
+        예상하지 못한 예외의 내용은 로그에만 남기고 응답에는 넣지 않습니다.
+        """
+        self.stats['requests'] += 1
+        try:
+            return await asyncio.wait_for(handler(request), self.request_timeout)
+        except HttpError as e:
+            return error_response(e.status, e.message)
+        except web.HTTPException as e:
+            # 라우팅(404/405), 본문 크기 제한(413) 등 aiohttp가 만든 오류
+            return error_response(e.status, e.reason)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            return error_response(504, "요청 처리 시간이 초과되었습니다.")
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"요청 처리 중 오류가 발생했습니다: {request.method} {request.path}: {str(e)}", file=sys.stderr)
+            return error_response(500, "요청을 처리하는 중 서버 오류가 발생했습니다.")
+
+    async def _run_pipeline(self, coroutine_function):
+        # 워커 하나에서 동시에 실행되는 파이프라인 수를 제한합니다.
+        async with self._semaphore:
+            return await coroutine_function()
+
+    async def health(self, request):
+        return json_response(encode_json({
+            'status': 'ok',
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'requests': dict(self.stats),
+            'single_flight': self.single_flight.get_stats(),
+            'result_cache': hybrid_search.result_cache.get_stats(),
+            'engine': hybrid_search.get_engine().status()
+        }))
+
+    async def metrics(self, request):
+        return web.Response(
+            body=hybrid_search.get_metrics_text().encode('utf-8'),
+            headers={'Content-Type': METRICS_CONTENT_TYPE}
+        )
+
+    async def search(self, request):
+        params = request.query
+        query = _text_param(params, 'q')
+        top_k = _int_param(params, 'top_k', 5, MAX_TOP_K)
+        include_trace = params.get('trace', '0') in ('1', 'true')
+
+        async def execute():
+            search_results = await self._run_pipeline(lambda: hybrid_search.ahybrid_search(query, top_k))
+            if not include_trace:
+                search_results.pop('trace', None)
+            # 합쳐진 요청이 같은 바이트를 그대로 쓰도록 인코딩까지 한 번만 합니다.
+            return encode_json(search_results)
+
+        return json_response(
+            await self.single_flight.run(('search', include_trace) + make_result_key(query, top_k), execute)
+        )
+
+    async def similar_brands(self, request):
+        params = request.query
+        brand = _text_param(params, 'brand')
+        top_k = _int_param(params, 'top_k', 3, MAX_TOP_K)
+
+        async def execute():
+            similar = await self._run_pipeline(lambda: run_in_thread(hybrid_search.get_similar_brands, brand, top_k))
+            return encode_json({'brand': brand, 'similar_brands': similar})
+
+        return json_response(
+            await self.single_flight.run(('similar-brands',) + make_result_key(brand, top_k), execute)
+        )
+
+    async def enrich(self, request):
+        body = await request.read()
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise HttpError(400, "요청 본문이 올바른 JSON이 아닙니다.")
+        results = _enrich_results(payload)
+
+        enriched = await self._run_pipeline(lambda: hybrid_search.aenrich_product_results_with_brand_info(results))
+        return json_response(encode_json({'results': enriched}))
+
+
+async def serve(host, port, reuse_port=False, ready=None):
+    """워커 하나의 서버를 실행합니다. SIGTERM/SIGINT를 받으면 종료합니다."""
+    service = SearchService()
+    runner = web.AppRunner(
+        service.make_app(),
+        access_log=None,
+        keepalive_timeout=KEEP_ALIVE_SECONDS,
+        handle_signals=False,
+        max_line_size=MAX_HEADER_BYTES,
+        max_field_size=MAX_HEADER_BYTES
+    )
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, reuse_port=reuse_port or None)
+    await site.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signal_number, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    address = runner.addresses[0]
+    print(f"[worker {os.getpid()}] http://{address[0]}:{address[1]} 에서 요청을 받습니다.", file=sys.stderr)
+    if ready is not None:
+        ready.set()
+
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await hybrid_search.get_engine().aclose()
+    print(f"[worker {os.getpid()}] 종료합니다.", file=sys.stderr)
+
+
+def setup_backends(stub=False, stub_latency="0"):
+    """`stub`이면 벤치마크의 가짜 임베딩/LLM/인덱스로 백엔드를 교체합니다."""
+    if not stub:
+        return
+    import benchmark
+    benchmark.install_fake_backends(
+        embedding_latency=stub_latency,
+        index_latency=stub_latency,
+        llm_latency=stub_latency
+    )
+
+
+def run_worker(host, port, reuse_port, stub, stub_latency, ready=None):
+    """워커 프로세스의 진입점입니다. 백엔드는 프로세스마다 따로 만듭니다."""
+    setup_backends(stub, stub_latency)
+    asyncio.run(serve(host, port, reuse_port=reuse_port, ready=ready))
+
+
+def main():
+    """명령행 인자를 읽어 서버를 실행합니다."""
+    parser = argparse.ArgumentParser(description="hybrid_search HTTP 서비스")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="워커 프로세스 수 (SO_REUSEPORT 필요)")
+    parser.add_argument("--stub", action="store_true", help="외부 서비스 대신 가짜 백엔드 사용")
+    parser.add_argument("--stub-latency", default="0", help="가짜 백엔드 지연 시간 '중앙값,p95' (ms)")
+    args = parser.parse_args()
+
+    workers = max(args.workers, 1)
+    if workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        print("이 플랫폼은 SO_REUSEPORT를 지원하지 않아 워커 1개로 실행합니다.", file=sys.stderr)
+        workers = 1
+
+    if workers == 1:
+        run_worker(args.host, args.port, False, args.stub, args.stub_latency)
+        return
+
+    # 워커마다 같은 포트에 소켓을 열고 커널이 연결을 나눠 줍니다.
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(args.host, args.port, True, args.stub, args.stub_latency),
+            daemon=True
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop_workers(signal_number, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop_workers(signal.SIGINT, None)
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import time
+import threading
+
+from concurrency import run_parallel
+
+
+def test_results_keep_input_order_and_errors_use_default():
+    def work(value):
+        if value == 2:
+            raise RuntimeError("boom")
+        time.sleep(0.01 * (5 - value))
+        return value * 10
+
+    assert run_parallel(work, range(5), max_workers=3, default=-1) == [0, 10, -1, 30, 40]
+
+
+def test_single_item_honours_timeout():
+    started = time.monotonic()
+    assert run_parallel(lambda value: time.sleep(0.5), [1], timeout=0.05, default='late') == ['late']
+    assert time.monotonic() - started < 0.4
+
+
+def test_abandoned_calls_count_towards_max_workers():
+    lock = threading.Lock()
+    live = [0, 0]
+
+    def work(value):
+        with lock:
+            live[0] += 1
+            live[1] = max(live[1], live[0])
+        time.sleep(0.2 if value % 2 else 0.01)
+        with lock:
+            live[0] -= 1
+        return value
+
+    run_parallel(work, range(8), max_workers=2, timeout=0.05)
+    time.sleep(0.3)
+    assert live[1] <= 2
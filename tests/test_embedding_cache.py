@@ -0,0 +1,79 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache, CachedEmbeddings, make_cache_key
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.model = "counting"
+        self.query_calls = 0
+        self.document_calls = []
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_cache_key_normalizes_whitespace():
+    assert make_cache_key("m", "  여성   가방 ") == make_cache_key("m", "여성 가방")
+    assert make_cache_key("m", "가방") != make_cache_key("other", "가방")
+
+
+def test_memory_lru_evicts_oldest():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put('a', [1.0])
+    cache.put('b', [2.0])
+    cache.get('a')
+    cache.put('c', [3.0])
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_disk_cache_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path, flush_entries=100)
+    cache.put('a', [0.5, 0.25])
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    vector = reopened.get('a')
+    np.testing.assert_array_equal(vector, np.asarray([0.5, 0.25], dtype=np.float16))
+    assert reopened.get_stats()['disk_hits'] == 1
+    reopened.close()
+
+
+def test_pending_writes_are_served_after_memory_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=1, flush_entries=100)
+    cache.put('a', [1.0])
+    cache.put('b', [2.0])
+    assert cache.get_stats()['pending_writes'] == 2
+    assert cache.get('a') is not None
+    cache.close()
+
+
+def test_disk_entries_are_capped(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_disk_entries=2, flush_entries=1)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, [1.0])
+    stats = cache.get_stats()
+    assert stats['disk_entries'] == 2
+    assert stats['disk_evictions'] == 1
+    cache.close()
+
+
+def test_cached_embeddings_only_requests_missing_texts():
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, EmbeddingCache())
+
+    assert embeddings.embed_query("가방") == [2.0, 1.0]
+    embeddings.embed_query(" 가방 ")
+    assert model.query_calls == 1
+
+    vectors = embeddings.embed_documents(["가방", "운동화", "가방"])
+    assert vectors == [[2.0, 1.0], [3.0, 1.0], [2.0, 1.0]]
+    assert model.document_calls == [["운동화"]]
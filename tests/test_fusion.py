@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from fusion import fuse_scores, top_k_indices, RRF_K
+
+
+def test_linear_fusion_weights_scores():
+    fused = fuse_scores([[0.5, 0.2], [10.0, 0.0]], [1.0, 0.1], strategy='linear')
+    np.testing.assert_allclose(fused, [1.5, 0.2], rtol=1e-6)
+
+
+def test_minmax_fusion_normalizes_each_retriever():
+    fused = fuse_scores([[0.2, 0.4, 0.6], [3.0, 3.0, 3.0]], [1.0, 1.0], strategy='minmax')
+    # 값이 모두 같은 검색기는 점수를 더하지 않습니다.
+    np.testing.assert_allclose(fused, [0.0, 0.5, 1.0], rtol=1e-6)
+
+
+def test_rrf_fusion_ignores_unmatched_candidates():
+    fused = fuse_scores([[0.9, 0.1], [0.0, 5.0]], [1.0, 1.0], strategy='rrf')
+    np.testing.assert_allclose(fused, [1 / (RRF_K + 1), 1 / (RRF_K + 2) + 1 / (RRF_K + 1)], rtol=1e-6)
+
+
+def test_fuse_scores_rejects_unknown_strategy_and_length_mismatch():
+    with pytest.raises(ValueError):
+        fuse_scores([[1.0]], [1.0], strategy='unknown')
+    with pytest.raises(ValueError):
+        fuse_scores([[1.0, 2.0], [1.0]], [1.0, 1.0])
+
+
+def test_fuse_scores_handles_no_candidates():
+    assert len(fuse_scores([[], []], [1.0, 0.1], strategy='rrf')) == 0
+
+
+@pytest.mark.parametrize("top_k, expected", [(2, [1, 3]), (None, [1, 3, 0, 2]), (10, [1, 3, 0, 2]), (0, [])])
+def test_top_k_indices_orders_by_score(top_k, expected):
+    assert list(top_k_indices([0.3, 0.9, 0.1, 0.5], top_k)) == expected
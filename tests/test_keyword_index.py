@@ -0,0 +1,55 @@
+import numpy as np
+
+from keyword_index import KeywordIndex, tokenize, query_token_weights
+
+
+RECORDS = [
+    ('p1', {'product_name': '여성용 가죽 가방', 'brand': 'Gucci', 'description': '데일리 토트백'}),
+    ('p2', {'product_name': '남성 러닝화', 'brand': 'Nike', 'description': '가벼운 운동화'}),
+    ('p3', {'product_name': '가죽 지갑', 'brand': 'Prada', 'description': '여성 가방과 어울리는 지갑'}),
+]
+
+
+def test_tokenize_adds_hangul_bigrams():
+    assert tokenize("여성용 Bag") == ['여성용', '여성', '성용', 'bag']
+    assert tokenize("가방") == ['가방']
+
+
+def test_query_token_weights_split_word_weight_across_bigrams():
+    weights = query_token_weights("여성용 bag")
+    assert weights['bag'] == 1.0
+    assert weights['여성용'] == 0.5
+    assert weights['여성'] + weights['성용'] == 0.5
+
+
+def test_search_ranks_product_name_matches_first():
+    index = KeywordIndex.build(RECORDS)
+    results = index.search("가죽 가방", top_k=3)
+    assert [record_id for record_id, _, _ in results][:2] == ['p1', 'p3']
+    assert all(score > 0 for _, score, _ in results)
+    assert results[0][2]['brand'] == 'Gucci'
+
+
+def test_search_skips_documents_without_matches():
+    index = KeywordIndex.build(RECORDS)
+    assert [record_id for record_id, _, _ in index.search("nike")] == ['p2']
+    assert index.search("없는단어") == []
+
+
+def test_search_respects_top_k():
+    index = KeywordIndex.build(RECORDS)
+    assert len(index.search("가죽 가방 지갑 여성", top_k=1)) == 1
+
+
+def test_score_returns_zero_for_unknown_ids():
+    index = KeywordIndex.build(RECORDS)
+    scores = index.score("nike", ['p2', 'missing', 'p1'])
+    assert scores[0] > 0
+    np.testing.assert_array_equal(scores[1:], [0.0, 0.0])
+
+
+def test_empty_index():
+    index = KeywordIndex.build([])
+    assert len(index) == 0
+    assert index.search("가방") == []
+    assert index.get_metadata('p1') is None
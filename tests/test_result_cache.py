@@ -0,0 +1,52 @@
+import time
+
+from result_cache import ResultCache, make_result_key
+
+
+def test_result_key_normalizes_query():
+    assert make_result_key(" 여성  가방 ", 5) == make_result_key("여성 가방", "5")
+    assert make_result_key("Nike", 5) == make_result_key("nike", 5)
+
+
+def test_get_returns_copy():
+    cache = ResultCache()
+    cache.put('k', {'results': [1, 2]})
+    value = cache.get('k')
+    value['results'].append(3)
+    assert cache.get('k') == {'results': [1, 2]}
+
+
+def test_version_change_drops_entry():
+    cache = ResultCache()
+    cache.put('k', 'value', versions=(1,))
+    assert cache.get('k', versions=(2,)) is None
+    assert cache.get('k', versions=(1,)) is None
+    assert cache.get_stats()['stale'] == 1
+
+
+def test_ttl_expires_entries(monkeypatch):
+    cache = ResultCache(ttl_seconds=10)
+    cache.put('k', 'value')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+    assert cache.get('k') is None
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_lru_eviction_and_invalidate():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.invalidate() == 2
+    assert len(cache) == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(max_entries=0)
+    cache.put('k', 'value')
+    assert cache.get('k') is None
+    assert len(cache) == 0
@@ -0,0 +1,39 @@
+from semantic_cache import SemanticCache
+
+
+def test_hit_requires_threshold():
+    cache = SemanticCache(max_entries=4, threshold=0.98)
+    cache.put([1.0, 0.0], 5, ['a', 'b', 'c'])
+
+    value, similarity = cache.get([1.0, 0.01], 2)
+    assert value == ['a', 'b']
+    assert similarity > 0.98
+    assert cache.get([1.0, 0.3], 2) == (None, None)
+
+
+def test_scope_and_top_k_must_match():
+    cache = SemanticCache(max_entries=4, threshold=0.9)
+    cache.put([1.0, 0.0], 2, ['a', 'b'], versions=(1, '{"genders": ["여성"]}'))
+
+    assert cache.get([1.0, 0.0], 2, versions=(1, '{"genders": ["남성"]}')) == (None, None)
+    assert cache.get([1.0, 0.0], 5, versions=(1, '{"genders": ["여성"]}')) == (None, None)
+    assert cache.get([1.0, 0.0], 1, versions=(1, '{"genders": ["여성"]}'))[0] == ['a']
+
+
+def test_full_cache_replaces_least_recently_used():
+    cache = SemanticCache(max_entries=2, threshold=0.99)
+    cache.put([1.0, 0.0], 1, ['x'])
+    cache.put([0.0, 1.0], 1, ['y'])
+    cache.get([1.0, 0.0], 1)
+    cache.put([1.0, 1.0], 1, ['z'])
+
+    assert cache.get([0.0, 1.0], 1) == (None, None)
+    assert cache.get([1.0, 0.0], 1)[0] == ['x']
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_disabled_cache():
+    cache = SemanticCache(max_entries=0)
+    cache.put([1.0, 0.0], 1, ['x'])
+    assert cache.get([1.0, 0.0], 1) == (None, None)
+    assert len(cache) == 0
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from vector_store import LocalVectorIndex, matches_filter
+
+
+def unit(values):
+    # 코사인 인덱스는 정규화한 벡터를 저장합니다.
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def make_index(tmp_path, count=4, dimension=3):
+    index = LocalVectorIndex(str(tmp_path / "index"), dimension=dimension)
+    index.upsert(vectors=[
+        {'id': f"p{i}", 'values': [float(i + 1), 1.0, 0.0][:dimension], 'metadata': {'brand': f"b{i % 2}", 'price': i}}
+        for i in range(count)
+    ])
+    return index
+
+
+def test_upsert_dedupes_batch_last_write_wins(tmp_path):
+    index = LocalVectorIndex(str(tmp_path / "index"), dimension=2)
+    index.upsert(vectors=[
+        {'id': 'a', 'values': [1.0, 0.0], 'metadata': {'v': 1}},
+        {'id': 'a', 'values': [0.0, 1.0], 'metadata': {'v': 2}},
+    ])
+    assert len(index) == 1
+    fetched = index.fetch(['a']).vectors['a']
+    assert fetched.metadata == {'v': 2}
+    assert fetched.values == [0.0, 1.0]
+
+
+def test_upsert_rejects_dimension_mismatch_without_changes(tmp_path):
+    index = make_index(tmp_path)
+    with pytest.raises(ValueError):
+        index.upsert(vectors=[{'id': 'new', 'values': [1.0, 2.0]}, {'id': 'p0', 'values': [9.0, 9.0, 9.0]}])
+    assert len(index) == 4
+    np.testing.assert_allclose(index.fetch(['p0']).vectors['p0'].values, unit([1.0, 1.0, 0.0]), rtol=1e-6)
+
+
+def test_delete_all(tmp_path):
+    index = make_index(tmp_path)
+    index.delete(delete_all=True)
+    assert len(index) == 0
+    assert index.query([1.0, 0.0, 0.0], top_k=3).matches == []
+
+
+def test_delete_last_remaining_ids_then_reuse(tmp_path):
+    index = make_index(tmp_path, count=2)
+    index.delete(ids=['p0', 'p1'])
+    assert len(index) == 0
+    index.save()
+
+    reloaded = LocalVectorIndex.load(index.path)
+    assert len(reloaded) == 0
+    reloaded.upsert(vectors=[{'id': 'x', 'values': [1.0, 0.0, 0.0], 'metadata': {}}])
+    assert [match.id for match in reloaded.query([1.0, 0.0, 0.0], top_k=1).matches] == ['x']
+
+
+def test_delete_keeps_remaining_rows(tmp_path):
+    index = make_index(tmp_path)
+    index.delete(ids=['p1', 'missing'])
+    assert [record_id for record_id, _ in index.records()] == ['p0', 'p2', 'p3']
+    np.testing.assert_allclose(index.fetch(['p3']).vectors['p3'].values, unit([4.0, 1.0, 0.0]), rtol=1e-6)
+
+
+@pytest.mark.parametrize("filter, expected", [
+    ({'brand': 'b0'}, {'p0', 'p2'}),
+    ({'brand': {'$eq': 'b1'}}, {'p1', 'p3'}),
+    ({'brand': {'$in': ['b0', 'missing']}}, {'p0', 'p2'}),
+    ({'brand': {'$in': ['missing']}}, set()),
+    ({'price': {'$gte': 2}}, {'p2', 'p3'}),
+    ({'$and': [{'brand': 'b0'}, {'price': {'$lt': 2}}]}, {'p0'}),
+    ({'$or': [{'brand': 'b1'}, {'price': 0}]}, {'p0', 'p1', 'p3'}),
+])
+def test_query_filters(tmp_path, filter, expected):
+    index = make_index(tmp_path)
+    matches = index.query([1.0, 1.0, 0.0], top_k=10, filter=filter, include_metadata=True).matches
+    assert {match.id for match in matches} == expected
+    assert all(matches_filter(match.metadata, filter) for match in matches)
+
+
+def test_filter_with_unhashable_operand_falls_back_to_scan(tmp_path):
+    index = make_index(tmp_path)
+    index.upsert(vectors=[{'id': 'tagged', 'values': [1.0, 0.0, 0.0], 'metadata': {'brand': ['x']}}])
+    assert index.query([1.0, 0.0, 0.0], top_k=10, filter={'brand': {'$in': [['x']]}}).matches == []
+    assert index.query([1.0, 0.0, 0.0], top_k=10, filter={'brand': {'$eq': ['x']}}).matches == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = make_index(tmp_path)
+    index.save()
+    reloaded = LocalVectorIndex.load(index.path)
+    assert len(reloaded) == 4
+    np.testing.assert_allclose(reloaded.fetch(['p2']).vectors['p2'].values, unit([3.0, 1.0, 0.0]), rtol=1e-6)
+    reloaded.upsert(vectors=[{'id': 'p4', 'values': [0.0, 0.0, 1.0], 'metadata': {'brand': 'b0'}}])
+    assert {match.id for match in reloaded.query([0.0, 0.0, 1.0], top_k=10, filter={'brand': 'b0'}).matches} == {'p0', 'p2', 'p4'}
@@ -0,0 +1,159 @@
+import time
+import inspect
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# 현재 실행 중인 span (스레드 풀과 asyncio 작업에도 전달됨)
+_current_span = contextvars.ContextVar("hybrid_search_current_span", default=None)
+
+
+class Span:
+    """추적 구간 하나의 시간, 속성, 하위 구간을 기록합니다."""
+    __slots__ = ('name', 'attributes', 'children', 'started_at', 'ended_at', '_start')
+
+    def __init__(self, name, attributes=None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.started_at = time.time()
+        self.ended_at = None
+        self._start = time.perf_counter()
+
+    @property
+    def duration_ms(self):
+        """구간 실행 시간(ms)입니다. 아직 끝나지 않았으면 현재까지의 시간입니다."""
+        end = self.ended_at if self.ended_at is not None else time.perf_counter()
+        return (end - self._start) * 1000
+
+    def set(self, **attributes):
+        """구간 속성을 설정합니다."""
+        self.attributes.update(attributes)
+
+    def add(self, name, value=1):
+        """숫자 속성을 누적합니다. (호출 수, 바이트 수 등)"""
+        self.attributes[name] = self.attributes.get(name, 0) + value
+
+    def finish(self):
+        """구간을 종료합니다."""
+        if self.ended_at is None:
+            self.ended_at = time.perf_counter()
+
+    def to_dict(self):
+        """구간 트리를 딕셔너리로 변환합니다."""
+        return {
+            'name': self.name,
+            'duration_ms': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'children': [child.to_dict() for child in list(self.children)]
+        }
+
+
+class Trace:
+    """요청 하나의 span 트리입니다."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def summary(self):
+        """구간 이름별 호출 수와 누적 시간, 전송 크기(`payload_bytes` 속성)를 집계합니다."""
+        stages = {}
+        stack = [self.root]
+        while stack:
+            current = stack.pop()
+            stage = stages.setdefault(current.name, {'calls': 0, 'total_ms': 0.0})
+            stage['calls'] += 1
+            stage['total_ms'] += current.duration_ms
+            payload_bytes = current.attributes.get('payload_bytes')
+            if payload_bytes is not None:
+                stage['payload_bytes'] = stage.get('payload_bytes', 0) + payload_bytes
+            stack.extend(current.children)
+        for stage in stages.values():
+            stage['total_ms'] = round(stage['total_ms'], 3)
+        return stages
+
+    def to_dict(self):
+        """추적 결과를 딕셔너리로 변환합니다."""
+        summary = self.summary()
+        return {
+            'total_ms': round(self.root.duration_ms, 3),
+            'payload_bytes': sum(stage.get('payload_bytes', 0) for stage in summary.values()),
+            'spans': self.root.to_dict(),
+            'summary': summary
+        }
+
+
+class _NoopSpan:
+    """추적 중이 아닐 때 사용하는 빈 span입니다."""
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, name, value=1):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def is_tracing():
+    """현재 추적 중인지 확인합니다."""
+    return _current_span.get() is not None
+
+
+def current_span():
+    """현재 span을 반환합니다. 추적 중이 아니면 빈 span을 반환합니다."""
+    return _current_span.get() or NOOP_SPAN
+
+
+@contextmanager
+def start_trace(name, **attributes):
+    """새 요청 추적을 시작합니다. 종료되면 Trace 객체에 결과가 남습니다."""
+    root = Span(name, attributes)
+    trace = Trace(root)
+    token = _current_span.set(root)
+    try:
+        yield trace
+    finally:
+        root.finish()
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    """현재 span 아래에 하위 구간을 기록합니다. 추적 중이 아니면 아무것도 하지 않습니다."""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+
+    child = Span(name, attributes)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.set(error=str(e))
+        raise
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def traced(name):
+    """함수 실행 전체를 하나의 구간으로 기록하는 데코레이터입니다. (비동기 함수 지원)"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
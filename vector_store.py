@@ -0,0 +1,449 @@
+import os
+import json
+import threading
+
+import numpy as np
+
+# FAISS가 설치되어 있으면 사용하고, 없으면 NumPy 행렬 연산으로 검색합니다.
+# 시작 시간을 줄이기 위해 처음 검색할 때 import 합니다.
+_faiss = None
+_faiss_checked = False
+
+
+def get_faiss():
+    """faiss 모듈을 반환합니다. 설치되어 있지 않으면 None을 반환합니다."""
+    global _faiss, _faiss_checked
+    if not _faiss_checked:
+        try:
+            import faiss
+            _faiss = faiss
+        except ImportError:
+            _faiss = None
+        _faiss_checked = True
+    return _faiss
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+
+
+class Match:
+    """Pinecone 검색 결과의 match 항목과 같은 형태의 객체입니다."""
+    __slots__ = ('id', 'score', 'values', 'metadata')
+
+    def __init__(self, id, score, values=None, metadata=None):
+        self.id = id
+        self.score = score
+        self.values = values
+        self.metadata = metadata
+
+
+class QueryResult:
+    """Pinecone QueryResponse와 같은 형태의 검색 결과입니다."""
+    __slots__ = ('matches', 'namespace')
+
+    def __init__(self, matches, namespace=""):
+        self.matches = matches
+        self.namespace = namespace
+
+
+class FetchResult:
+    """Pinecone FetchResponse와 같은 형태의 조회 결과입니다."""
+    __slots__ = ('vectors', 'namespace')
+
+    def __init__(self, vectors, namespace=""):
+        self.vectors = vectors
+        self.namespace = namespace
+
+
+def _normalize(matrix):
+    """코사인 유사도 계산을 위해 벡터를 정규화합니다."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _compare(value, operator, operand):
+    """Pinecone 메타데이터 필터 연산자 하나를 평가합니다."""
+    values = value if isinstance(value, list) else [value]
+    try:
+        if operator == '$eq':
+            return operand in values
+        if operator == '$ne':
+            return operand not in values
+        if operator == '$in':
+            return any(item in operand for item in values)
+        if operator == '$nin':
+            return not any(item in operand for item in values)
+        if operator == '$exists':
+            return (value is not None) == bool(operand)
+        if value is None:
+            return False
+        if operator == '$gt':
+            return value > operand
+        if operator == '$gte':
+            return value >= operand
+        if operator == '$lt':
+            return value < operand
+        if operator == '$lte':
+            return value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"지원하지 않는 필터 연산자입니다: {operator}")
+
+
+def matches_filter(metadata, filter):
+    """메타데이터가 Pinecone 형식의 필터 조건을 만족하는지 확인합니다."""
+    for key, condition in filter.items():
+        if key == '$and':
+            if not all(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not _compare(value, operator, operand):
+                    return False
+    return True
+
+
+class LocalVectorIndex:
+    """프로세스 내에서 동작하는 FAISS/NumPy 기반 벡터 인덱스입니다.
+
+    벡터는 float32 `.npy` 파일로 저장되어 메모리 맵으로 열리고,
+    ID와 메타데이터는 같은 디렉터리의 JSON 파일에 저장됩니다.
+    `query`, `fetch`, `upsert`, `delete`는 Pinecone Index와 같은 형태로 호출할 수 있습니다.
+    """
+
+    def __init__(self, path, dimension=None, metric="cosine"):
+        self.path = path
+        self.dimension = dimension
+        self.metric = metric
+        self._vectors = np.zeros((0, dimension or 0), dtype=np.float32)
+        # 쓰기 가능한 벡터 버퍼 (`_vectors`는 앞부분의 뷰). 용량을 두 배씩 늘려 추가할 때마다 전체를 복사하지 않습니다.
+        # 메모리 맵으로 불러온 직후에는 None이며, 처음 수정할 때 만듭니다.
+        self._buffer = None
+        self._ids = []
+        self._metadata = []
+        self._positions = {}
+        self._faiss_index = None
+        self._field_values = {}
+        self._dirty = False
+        self._lock = threading.RLock()
+        # 내용이 바뀔 때마다 증가합니다. (결과 캐시 무효화에 사용)
+        self.version = 0
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """디스크에 저장된 인덱스를 불러옵니다. 파일이 없으면 빈 인덱스를 반환합니다."""
+        index = cls(path)
+        records_path = os.path.join(path, RECORDS_FILE)
+        vectors_path = os.path.join(path, VECTORS_FILE)
+
+        if not os.path.exists(records_path):
+            return index
+
+        with open(records_path, 'r', encoding='utf-8') as file:
+            records = json.load(file)
+
+        index.metric = records.get('metric', 'cosine')
+        index.version = records.get('version', 0)
+        index._ids = records['ids']
+        index._metadata = records['metadata']
+        index._positions = {vector_id: i for i, vector_id in enumerate(index._ids)}
+        index._vectors = np.load(vectors_path, mmap_mode='r' if mmap else None)
+        index.dimension = index._vectors.shape[1] if index._vectors.ndim == 2 else records.get('dimension')
+        return index
+
+    def save(self):
+        """벡터와 메타데이터를 디스크에 저장합니다. 임시 파일에 쓴 뒤 교체합니다."""
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            vectors_path = os.path.join(self.path, VECTORS_FILE)
+            records_path = os.path.join(self.path, RECORDS_FILE)
+
+            tmp_vectors_path = vectors_path + ".tmp"
+            with open(tmp_vectors_path, 'wb') as file:
+                np.save(file, np.ascontiguousarray(self._vectors, dtype=np.float32))
+
+            tmp_records_path = records_path + ".tmp"
+            with open(tmp_records_path, 'w', encoding='utf-8') as file:
+                json.dump({
+                    'metric': self.metric,
+                    'dimension': self.dimension,
+                    'version': self.version,
+                    'ids': self._ids,
+                    'metadata': self._metadata
+                }, file, ensure_ascii=False)
+
+            os.replace(tmp_vectors_path, vectors_path)
+            os.replace(tmp_records_path, records_path)
+            self._dirty = False
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _prepare(self, values):
+        """저장 및 검색에 사용할 float32 벡터로 변환합니다."""
+        matrix = np.asarray(values, dtype=np.float32)
+        if self.metric == "cosine":
+            matrix = _normalize(matrix)
+        return matrix
+
+    def _search_faiss(self, query_vector, top_k):
+        """FAISS 내적 인덱스로 상위 결과를 찾습니다."""
+        if self._faiss_index is None:
+            faiss_index = get_faiss().IndexFlatIP(self._vectors.shape[1])
+            faiss_index.add(np.ascontiguousarray(self._vectors, dtype=np.float32))
+            self._faiss_index = faiss_index
+        scores, positions = self._faiss_index.search(query_vector.reshape(1, -1), top_k)
+        valid = positions[0] >= 0
+        return positions[0][valid], scores[0][valid]
+
+    def _search_numpy(self, query_vector, top_k):
+        """NumPy 행렬 곱으로 상위 결과를 찾습니다."""
+        scores = self._vectors @ query_vector
+        if top_k < len(scores):
+            positions = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            positions = np.arange(len(scores))
+        positions = positions[np.argsort(-scores[positions], kind='stable')]
+        return positions, scores[positions]
+
+    def _value_positions(self, field):
+        """필드 값 -> 문서 위치 배열 색인을 반환합니다. 처음 사용할 때 만듭니다."""
+        positions = self._field_values.get(field)
+        if positions is None:
+            grouped = {}
+            for position, metadata in enumerate(self._metadata):
+                value = metadata.get(field)
+                for item in (value if isinstance(value, list) else [value]):
+                    try:
+                        grouped.setdefault(item, []).append(position)
+                    except TypeError:
+                        continue
+            positions = {value: np.asarray(items, dtype=np.int64) for value, items in grouped.items()}
+            self._field_values[field] = positions
+        return positions
+
+    def _filter_positions(self, filter):
+        """필터 조건을 만족하는 문서 위치 배열을 반환합니다."""
+        # 단일 필드의 $eq/$in 조건은 필드 값 색인으로 바로 찾습니다.
+        if len(filter) == 1:
+            field, condition = next(iter(filter.items()))
+            if not field.startswith('$'):
+                if not isinstance(condition, dict):
+                    condition = {'$eq': condition}
+                if len(condition) == 1 and next(iter(condition)) in ('$eq', '$in'):
+                    operator, operand = next(iter(condition.items()))
+                    values = operand if operator == '$in' else [operand]
+                    try:
+                        # 해시할 수 없는 값(목록 등)이 있으면 아래의 전체 검사로 처리합니다.
+                        value_set = set(values)
+                    except TypeError:
+                        value_set = None
+                    if value_set is not None:
+                        value_positions = self._value_positions(field)
+                        found = [value_positions[value] for value in value_set if value in value_positions]
+                        if not found:
+                            return np.zeros(0, dtype=np.int64)
+                        return np.unique(np.concatenate(found))
+
+        return np.asarray(
+            [position for position, metadata in enumerate(self._metadata) if matches_filter(metadata, filter)],
+            dtype=np.int64
+        )
+
+    def query(self, vector, top_k=10, include_metadata=False, include_values=False, filter=None, **kwargs):
+        """쿼리 벡터와 가장 가까운 벡터를 검색합니다. `filter`는 Pinecone 메타데이터 필터 형식입니다."""
+        with self._lock:
+            if not self._ids:
+                return QueryResult([])
+
+            query_vector = self._prepare(vector)
+
+            if filter:
+                candidates = self._filter_positions(filter)
+                if len(candidates) == 0:
+                    return QueryResult([])
+                scores = np.asarray(self._vectors[candidates]) @ query_vector
+                top_k = min(top_k, len(candidates))
+                order = np.argpartition(-scores, top_k - 1)[:top_k] if top_k < len(scores) else np.arange(len(scores))
+                order = order[np.argsort(-scores[order], kind='stable')]
+                positions, scores = candidates[order], scores[order]
+            else:
+                top_k = min(top_k, len(self._ids))
+                if get_faiss() is not None:
+                    positions, scores = self._search_faiss(query_vector, top_k)
+                else:
+                    positions, scores = self._search_numpy(query_vector, top_k)
+
+            matches = []
+            for position, score in zip(positions, scores):
+                position = int(position)
+                matches.append(Match(
+                    id=self._ids[position],
+                    score=float(score),
+                    values=self._vectors[position].tolist() if include_values else None,
+                    metadata=self._metadata[position] if include_metadata else None
+                ))
+            return QueryResult(matches)
+
+    def fetch(self, ids, **kwargs):
+        """ID로 벡터와 메타데이터를 조회합니다."""
+        with self._lock:
+            vectors = {}
+            for vector_id in ids:
+                position = self._positions.get(vector_id)
+                if position is None:
+                    continue
+                vectors[vector_id] = Match(
+                    id=vector_id,
+                    score=None,
+                    values=self._vectors[position].tolist(),
+                    metadata=self._metadata[position]
+                )
+            return FetchResult(vectors)
+
+    def upsert(self, vectors, **kwargs):
+        """벡터를 추가하거나 갱신합니다.
+
+        `vectors`는 `(id, values, metadata)` 튜플 또는
+        `{'id', 'values', 'metadata'}` 딕셔너리의 리스트입니다.
+        """
+        # 같은 ID가 여러 번 있으면 마지막 값을 사용합니다.
+        batch = {}
+        for vector in vectors:
+            if isinstance(vector, dict):
+                batch[vector['id']] = (vector['values'], vector.get('metadata') or {})
+            else:
+                batch[vector[0]] = (vector[1], vector[2] if len(vector) > 2 else {})
+
+        if not batch:
+            return {'upserted_count': 0}
+
+        ids = list(batch)
+        new_vectors = self._prepare([values for values, _ in batch.values()])
+        metadata = [meta for _, meta in batch.values()]
+
+        with self._lock:
+            if len(self._ids) == 0:
+                self.dimension = new_vectors.shape[1]
+                self._vectors = np.zeros((0, self.dimension), dtype=np.float32)
+                self._buffer = None
+            elif new_vectors.shape[1] != self.dimension:
+                raise ValueError(f"벡터 차원이 인덱스와 다릅니다: {new_vectors.shape[1]} != {self.dimension}")
+
+            # 새 행과 기존 행을 나눈 뒤, 버퍼에 모두 쓰고 나서 ID/위치/메타데이터를 한 번에 반영합니다.
+            count = len(self._ids)
+            updated = [(self._positions[vector_id], row) for row, vector_id in enumerate(ids) if vector_id in self._positions]
+            appended = [row for row, vector_id in enumerate(ids) if vector_id not in self._positions]
+
+            buffer = self._reserve(len(appended))
+            for position, row in updated:
+                buffer[position] = new_vectors[row]
+            if appended:
+                buffer[count:count + len(appended)] = new_vectors[appended]
+
+            for position, row in updated:
+                self._metadata[position] = metadata[row]
+            for offset, row in enumerate(appended):
+                self._positions[ids[row]] = count + offset
+            self._ids.extend(ids[row] for row in appended)
+            self._metadata.extend(metadata[row] for row in appended)
+            self._vectors = buffer[:count + len(appended)]
+            self._faiss_index = None
+            self._field_values = {}
+            self._dirty = True
+            self.version += 1
+            return {'upserted_count': len(ids)}
+
+    def _reserve(self, extra):
+        """`extra`개 행을 더 쓸 수 있는 버퍼를 반환합니다. 용량이 모자라면 두 배로 늘린 새 버퍼로 옮깁니다."""
+        count = len(self._ids)
+        buffer = self._buffer
+        if buffer is None or buffer.shape[0] < count + extra:
+            capacity = max(count + extra, 2 * (buffer.shape[0] if buffer is not None else count), 64)
+            new_buffer = np.empty((capacity, self.dimension), dtype=np.float32)
+            # 메모리 맵은 읽기 전용이므로 처음 수정할 때 메모리 버퍼로 복사됩니다.
+            new_buffer[:count] = self._vectors[:count]
+            self._buffer = buffer = new_buffer
+        return buffer
+
+    def update(self, id, values=None, set_metadata=None, **kwargs):
+        """벡터 하나의 값 또는 메타데이터를 갱신합니다. `set_metadata`는 기존 메타데이터에 합쳐집니다."""
+        with self._lock:
+            position = self._positions.get(id)
+            if position is None:
+                return {}
+            if values is not None:
+                buffer = self._reserve(0)
+                buffer[position] = self._prepare(values)
+                self._vectors = buffer[:len(self._ids)]
+                self._faiss_index = None
+            if set_metadata:
+                self._metadata[position] = dict(self._metadata[position], **set_metadata)
+                self._field_values = {}
+            self._dirty = True
+            self.version += 1
+            return {}
+
+    def delete(self, ids=None, delete_all=False, **kwargs):
+        """ID에 해당하는 벡터를 삭제합니다."""
+        with self._lock:
+            if delete_all:
+                remove = set(self._ids)
+            else:
+                remove = {vector_id for vector_id in (ids or []) if vector_id in self._positions}
+
+            if not remove:
+                return {}
+
+            keep = [i for i, vector_id in enumerate(self._ids) if vector_id not in remove]
+            self._vectors = np.array(self._vectors[keep], dtype=np.float32).reshape(len(keep), self._vectors.shape[1])
+            self._buffer = None
+            self._ids = [self._ids[i] for i in keep]
+            self._metadata = [self._metadata[i] for i in keep]
+            self._positions = {vector_id: i for i, vector_id in enumerate(self._ids)}
+            self._faiss_index = None
+            self._field_values = {}
+            self._dirty = True
+            self.version += 1
+            return {}
+
+    def records(self):
+        """저장된 모든 (ID, 메타데이터) 쌍을 반환합니다."""
+        with self._lock:
+            return list(zip(self._ids, self._metadata))
+
+    def describe_index_stats(self, **kwargs):
+        """인덱스 통계를 반환합니다."""
+        return {
+            'dimension': self.dimension,
+            'total_vector_count': len(self._ids),
+            'metric': self.metric,
+            'version': self.version
+        }
+
+
+def export_from_pinecone(source_index, path, batch_size=100):
+    """Pinecone 인덱스의 벡터와 메타데이터를 로컬 인덱스로 내보냅니다.
+
+    `source_index.list()`로 ID 목록을 가져오므로 서버리스 인덱스에서 동작합니다.
+    """
+    local_index = LocalVectorIndex(path)
+
+    for id_batch in source_index.list():
+        for start in range(0, len(id_batch), batch_size):
+            response = source_index.fetch(ids=id_batch[start:start + batch_size])
+            local_index.upsert([
+                (vector_id, vector.values, vector.metadata or {})
+                for vector_id, vector in response.vectors.items()
+            ])
+
+    local_index.save()
+    print(f"{len(local_index)}개 벡터를 '{path}'에 저장했습니다.")
+    return local_index